@@ -1,10 +1,12 @@
+import traceback
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime
-from modules import data_loader, ai_parser
-from modules import db_manager, migration, database, models, sync_manager, auth_manager
+from datetime import datetime, timedelta
+from modules import data_loader, ai_parser, portfolio_logic, trade_planner, backtester, analytics, risk_metrics, performance, treemap_style
+from modules import db_manager, migration, database, models, sync_manager, auth_manager, data_access, holdings, price_store, profiler
 import modules.d3_treemap as d3_treemap
 
 # --- Page Config (Must be First) ---
@@ -14,9 +16,12 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# Initialize DB (Old & New)
-db_manager.init_db() 
-database.initialize_sqlite_db() # New SQLAlchemy Init
+# Rerun profiler: spans below are collected per rerun (admin sidebar panel at the end).
+# Export is a per-session choice (checkbox in that panel).
+profiler.start_rerun(export_path=profiler.EXPORT_FILE if st.session_state.get("profiler_export") else None)
+
+# Initialize DB (single versioned store shared by db_manager and SQLAlchemy)
+db_manager.init_db()
 
 # Auto-Sync on Startup (Stage 2)
 with st.spinner("Checking for latest data..."):
@@ -28,39 +33,19 @@ import yaml
 from yaml.loader import SafeLoader
 
 def run_authentication():
-    # 1. Get Password from Secrets
+    # 1. Credentials: per-user hashes from auth_credentials.yaml, else the shared
+    #    secrets password. Hashed once per process (bcrypt is slow), not per rerun.
     try:
         plain_password = st.secrets["general"]["password"]
-    except KeyError:
+    except (KeyError, FileNotFoundError):
+        plain_password = None
+    credentials = auth_manager.get_credentials(plain_password)
+    if credentials is None:
         st.error("Secrets 'general.password' not found.")
-        st.stop()
-        
-    # 2. Hash the password (Runtime hashing)
-    hashed_passwords = [stauth.Hasher().hash(plain_password)]
+        profiler.stop()
     
-    # 3. Construct Config Dictionary (Programmatic)
-    config = {
-        'credentials': {
-            'usernames': {
-                'admin': {
-                    'name': 'Admin',
-                    'password': hashed_passwords[0],
-                    'email': 'admin@example.com' 
-                },
-                'park': { 
-                    'name': '박행자',
-                    'password': hashed_passwords[0],
-                    'email': 'park@example.com'
-                }
-            }
-        },
-        'cookie': {
-            'expiry_days': 30, # Persist for 30 days
-            'key': 'asset_dashboard_signature_key', 
-            'name': 'asset_dashboard_auth'
-        },
-        'pre-authorized': {'emails': []}
-    }
+    # 2. Construct Config Dictionary (Programmatic)
+    config = auth_manager.build_config(credentials)
     
     # 4. Get Authenticator via Manager
     authenticator = auth_manager.get_authenticator(config)
@@ -76,17 +61,13 @@ def run_authentication():
     return authenticator, config
 
 # Execution
-authenticator, auth_config = run_authentication()
+with profiler.span("auth"):
+    authenticator, auth_config = run_authentication()
 
 # Handle Status
 if st.session_state.get("authentication_status"):
     # Logged In
     current_user = st.session_state.get('username')
-    try:
-        # Lookup name from the config object we created
-        target_owner = auth_config['credentials']['usernames'][current_user]['name']
-    except KeyError:
-        target_owner = "Unknown"
     
     # Logout Button in Sidebar
     with st.sidebar:
@@ -95,10 +76,10 @@ if st.session_state.get("authentication_status"):
         
 elif st.session_state.get("authentication_status") is False:
     st.error('Username/password is incorrect')
-    st.stop()
+    profiler.stop()
 elif st.session_state.get("authentication_status") is None:
     st.warning('Please enter your username and password')
-    st.stop()
+    profiler.stop()
 
 # --- Styling ---
 st.markdown("""
@@ -144,61 +125,24 @@ st.markdown("""
     }
 </style>
 """, unsafe_allow_html=True)
-# --- Load Data ---
-data = data_loader.load_data()
 
 # --- Auth & Filtering Logic ---
 # Get current user
 current_user = st.session_state.get('username')
-target_owner = None
 
-# Define User Roles/Permissions
-if current_user == 'park':
-    target_owner = '박행자'
+# Define User Roles/Permissions (role/owner per user in the credentials file)
+# Admin sees all; everyone else only their owner's data, or nothing if none is set.
+is_admin, target_owner = auth_manager.get_access(auth_config['credentials'], current_user)
+if not is_admin:
+    if target_owner is None:
+        st.warning("No owner is assigned to this login yet. Ask the admin to set one.")
+        profiler.stop()
     st.toast(f"Welcome, {target_owner}! (Filtered View)", icon="🔒")
-elif current_user == 'admin':
-    # Admin sees all
-    pass 
-
-# Apply Filters if target_owner is set
-if target_owner and data:
-    # 1. Filter Transactions
-    if 'transactions' in data and not data['transactions'].empty:
-        df_t = data['transactions']
-        if '소유자' in df_t.columns:
-            data['transactions'] = df_t[df_t['소유자'] == target_owner]
-            
-    # 2. Filter History (Columns)
-    if 'history' in data and not data['history'].empty:
-        df_h = data['history']
-        # Always keep Date/Day info
-        keep_cols = [c for c in df_h.columns if c in ['날짜', '요일']]
-        # Add Owner's Portfolio Column
-        # Assuming Owner Name exactly matches Portfolio Name in the sheet columns
-        if target_owner in df_h.columns:
-            keep_cols.append(target_owner)
-        # Add Index Col
-        idx_col = f"{target_owner}_idx"
-        if idx_col in df_h.columns:
-             keep_cols.append(idx_col)
-             
-        data['history'] = df_h[keep_cols]
-        
-    # 3. Filter Temp History (Current Value)
-    if 'temp_history' in data and not data['temp_history'].empty:
-        df_tmp = data['temp_history']
-        # Filter rows where Portfolio/Owner matches
-        # Assuming there is a column that identifies the portfolio
-        # Based on previous code: '포트폴리오' column likely exists
-        port_col = next((c for c in df_tmp.columns if '포트폴리오' in c), None)
-        if port_col:
-            data['temp_history'] = df_tmp[df_tmp[port_col] == target_owner]
-
-    # 4. Filter Inventory (Asset Details) - CRITICAL FIX
-    if 'inventory' in data and not data['inventory'].empty:
-        df_i = data['inventory']
-        if '소유자' in df_i.columns:
-            data['inventory'] = df_i[df_i['소유자'] == target_owner]
+
+# --- Load Data ---
+# Transactions, masters and inventory come from the local DB mirror; sheets are the sync source.
+# A restricted session (target_owner) only ever receives its own rows/columns.
+data = data_access.load_dashboard_data(owner=target_owner)
 
 if data:
     df_hist = data["history"]
@@ -207,7 +151,7 @@ if data:
     df_beta = data["beta_plan"]
 else:
     st.error("Failed to load data")
-    st.stop()
+    profiler.stop()
 # --- Constants & Configuration ---
 # Updated Color Palette (Grouped Logic)
 # Shoho Group (Blue/Cool): Light Blue, Slate/Cornflower
@@ -229,7 +173,7 @@ if target_owner:
 # --- Sidebar Navigation ---
 st.sidebar.header("Menu")
 # Get Options (Owners, etc.)
-txn_options = data_loader.get_transaction_options()
+txn_options = data_loader.get_transaction_options(owner=target_owner)
 owners_list = txn_options.get('owners', [])
 
 # Filter Owners List too
@@ -293,11 +237,11 @@ menu_options = [
 ]
 
 # Admin Only Menu
-if current_user == 'admin' or current_user == 'park': # Allow park to debug too
+if is_admin:
     pass # menu_options.append("Admin: DB Viewer")
 
-# Hide 'Beta Rebalancing' for 'park'
-if target_owner == '박행자':
+# Hide 'Beta Rebalancing' for restricted sessions
+if not is_admin:
     menu_options = [m for m in menu_options if m != "Beta Rebalancing"]
 
 # Robust Page Persistence (Versioned Key)
@@ -376,9 +320,16 @@ st.sidebar.caption("Last Data Date: " + (df_hist['날짜'].iloc[-1].strftime('%Y
 
 if st.sidebar.button("Clear Cache", key="btn_clear_cache"):
     st.cache_data.clear()
-    st.rerun()
+    data_loader.clear_sheet_cache()
+    profiler.rerun()
+
+# Sheet Cache Stats (Admin only): what each rerun actually fetched
+if is_admin:
+    with st.sidebar.expander("Sheet Cache", expanded=False):
+        st.dataframe(data_loader.get_cache_stats(), use_container_width=True, hide_index=True)
 
 # --- Page Routing ---
+page_span = profiler.begin(f"page: {page}")
 if page == "Asset Trend":
     # (Previous Logic...) - Existing logic is embedded in large blocks, need to append
     pass # Placeholder strictly for search match, actual logic below
@@ -387,36 +338,74 @@ if page == "Asset Trend":
 if page == "Admin: DB Viewer":
     st.title("Admin: Database Viewer 🗄️")
     
-    import sqlite3
-    conn = db_manager.get_connection()
-    
     # Tabs
-    tab_browser, tab_sql = st.tabs(["Browse Tables", "Execute SQL"])
+    tab_browser, tab_sql, tab_holdings = st.tabs(["Browse Tables", "Execute SQL", "Holdings"])
     
     with tab_browser:
-        # Get List of Tables
-        tables = pd.read_sql("SELECT name FROM sqlite_master WHERE type='table';", conn)['name'].tolist()
-        views = pd.read_sql("SELECT name FROM sqlite_master WHERE type='view';", conn)['name'].tolist()
+        # Get List of Tables (read-only pooled connection)
+        with database.engine.connect() as conn:
+            tables = pd.read_sql("SELECT name FROM sqlite_master WHERE type='table';", conn)['name'].tolist()
+            views = pd.read_sql("SELECT name FROM sqlite_master WHERE type='view';", conn)['name'].tolist()
         
         selected_table = st.selectbox("Select Table/View", tables + views)
         
         if selected_table:
             st.subheader(f"Data: {selected_table}")
-            df_table = pd.read_sql(f"SELECT * FROM {selected_table}", conn)
+            with database.engine.connect() as conn:
+                df_table = pd.read_sql(f'SELECT * FROM "{selected_table}"', conn)
             st.dataframe(df_table, use_container_width=True)
             st.caption(f"Rows: {len(df_table)}")
             
     with tab_sql:
         st.subheader("Execute SQL Query")
         query = st.text_area("SQL Query", "SELECT * FROM transaction_log ORDER BY date DESC LIMIT 10")
-        if st.button("Run Query"):
+        col_run, col_write = st.columns(2)
+        if col_run.button("Run Query"):
             try:
-                df_sql = pd.read_sql(query, conn)
+                # Read-only pool: query_only rejects anything that would modify the store
+                with database.engine.connect() as conn:
+                    df_sql = pd.read_sql(query, conn)
                 st.dataframe(df_sql, use_container_width=True)
             except Exception as e:
                 st.error(f"Error: {e}")
-                
-    conn.close()
+
+        allow_write = col_write.checkbox("Allow writes", key="admin_sql_allow_write",
+                                         help="Runs the statement on the writer connection and commits it.")
+        if col_write.button("Run Write Statement", disabled=not allow_write):
+            try:
+                with database.write_engine.begin() as wconn:
+                    result = wconn.exec_driver_sql(query)
+                    affected = result.rowcount
+                st.success(f"Query OK: {affected} rows affected.")
+            except Exception as e:
+                st.error(f"Error: {e}")
+
+    with tab_holdings:
+        st.subheader("Materialized Holdings")
+        st.caption("Maintained incrementally during sync; compare against view_asset_inventory or rebuild from transaction_log.")
+        col_chk, col_rebuild = st.columns(2)
+        if col_chk.button("Check Consistency"):
+            db = next(database.get_db())
+            try:
+                df_bad = holdings.check_consistency(db)
+            finally:
+                db.close()
+            if df_bad.empty:
+                st.success("Holdings match view_asset_inventory.")
+            else:
+                st.warning(f"{len(df_bad)} (owner, asset) rows differ.")
+                st.dataframe(df_bad, use_container_width=True)
+        if col_rebuild.button("Rebuild Holdings"):
+            db = next(database.get_db())
+            try:
+                n = holdings.rebuild_holdings(db)
+                db.commit()
+                st.success(f"Rebuilt holdings: {n} rows.")
+            except Exception as e:
+                db.rollback()
+                st.error(f"Error: {e}")
+            finally:
+                db.close()
 
 # Keep existing Main Page Logic below... but wait, structure of app.py is page-linear?
 # Typically: if page == "A": ... elif page == "B": ...
@@ -444,27 +433,11 @@ if page == "Asset Trend":
     st.header("Asset & Index Trend")
     # Frequency Toggle
     freq_option = st.radio("Frequency", ["Daily", "Weekly", "Monthly"], horizontal=True)
-    # Resample Logic
-    df_chart = df_hist.copy()
-    if not df_chart.empty and '날짜' in df_chart.columns:
-        df_chart = df_chart.set_index('날짜')
-        # Preserve the very first data point (Baseline)
-        first_row = df_chart.iloc[[0]].copy()
-        if freq_option == "Weekly":
-            df_resampled = df_chart.resample('W').last().dropna()
-            # Combine first row if it's not effectively the same as the first resampled point
-            if not df_resampled.empty and first_row.index[0] != df_resampled.index[0]:
-                df_chart = pd.concat([first_row, df_resampled]).drop_duplicates().sort_index()
-            else:
-                 df_chart = df_resampled
-        elif freq_option == "Monthly":
-            df_resampled = df_chart.resample('ME').last().dropna()
-            # Combine first row
-            if not df_resampled.empty and first_row.index[0] != df_resampled.index[0]:
-                df_chart = pd.concat([first_row, df_resampled]).drop_duplicates().sort_index()
-            else:
-                 df_chart = df_resampled
-        df_chart = df_chart.reset_index()
+    # Resample Logic (precomputed once per history version)
+    if not df_hist.empty and '날짜' in df_hist.columns:
+        df_chart = analytics.get_history_analytics(df_hist).chart_frame(freq_option)
+    else:
+        df_chart = df_hist.copy()
     tab_asset, tab_idx = st.tabs(["Asset Trend", "Index (100)"])
     # Common Rangebreaks (Hide Weekends only for Daily)
     if freq_option == "Daily":
@@ -542,8 +515,17 @@ elif page == "Portfolio Scorecard":
     df_temp = data.get("temp_history")
     df_hist_local = df_hist.copy() if not df_hist.empty else None
 
+    # Flow-adjusted returns (TWR / XIRR) per portfolio, cached per data version
+    df_perf = None
+    if df_hist_local is not None and '날짜' in df_hist_local.columns:
+        try:
+            df_perf = performance.get_returns_summary(analytics.get_history_analytics(df_hist), owner=target_owner)
+        except Exception as e:
+            traceback.print_exc()
+            st.warning(f"Flow-adjusted returns (TWR/XIRR) unavailable: {e}")
+
     # Standard Streamlit Layout for Scorecard
-    cols = st.columns(len(portfolios))
+    cols = st.columns(max(len(portfolios), 1)) # an owner without a portfolio column has none
 
     for idx, port in enumerate(portfolios):
         with cols[idx]:
@@ -638,6 +620,14 @@ elif page == "Portfolio Scorecard":
             
             if sub_info:
                 st.caption(" | ".join(sub_info))
+
+            # 5. Flow-adjusted returns
+            if df_perf is not None and port in df_perf.index:
+                perf = df_perf.loc[port]
+                flow_info = [f"TWR: {perf['TWR']:+.1%}"]
+                if pd.notna(perf['XIRR']):
+                    flow_info.append(f"XIRR: {perf['XIRR']:+.1%}")
+                st.caption(" | ".join(flow_info))
     
     
     # 5. Definitions Footnote (Using st.info for theme-adaptive visibility)
@@ -648,7 +638,8 @@ elif page == "Portfolio Scorecard":
     # 5. Definitions (Minimalist, Right-aligned, Small - Moved to Bottom)
     st.markdown("""
     <div style="text-align: right; color: #999999; font-size: 11px; margin-top: 5px;">
-    Total Return: 배당/확정손익 제외, 매입 대비 평가수익률 &nbsp;|&nbsp; CAGR: '25.9.22 기준(100) 대비 연환산 상승률
+    Total Return: 배당/확정손익 제외, 매입 대비 평가수익률 &nbsp;|&nbsp; CAGR: '25.9.22 기준(100) 대비 연환산 상승률<br>
+    TWR: 입금/출금 제외 시간가중 누적수익률 &nbsp;|&nbsp; XIRR: 입금/출금 반영 금액가중 연환산 수익률
     </div>
     """, unsafe_allow_html=True)
 # --- Page 3: Asset Inventory ---
@@ -671,7 +662,7 @@ elif page == "Asset Details":
         df_merged = df_asset.rename(columns={target_port_col: '포트폴리오'})
     else:
         st.error(f"'{target_port_col}' 컬럼을 찾을 수 없습니다. (데이터 컬럼: {list(df_asset.columns)})")
-        st.stop()
+        profiler.stop()
     # 3. Filter by Owner (if selected in Sidebar)
     # Assumes '소유자' col exists in df_asset
     if selected_owners and '소유자' in df_merged.columns:
@@ -708,16 +699,12 @@ elif page == "Asset Details":
         '현재가': 'mean', # User requested sheet column
         '화폐': 'first'   # NEW: Capture Currency
     })
-    def get_currency_symbol(curr):
-        s = str(curr).strip().upper()
-        if s in ['USD', '달러', 'DOLLAR']: return '$'
-        return '₩'
-    df_pivot['CurSymbol'] = df_pivot['화폐'].apply(get_currency_symbol)
+    df_pivot['CurSymbol'] = treemap_style.currency_symbols(df_pivot['화폐'])
     # 7. Calculate Derived Metrics (ReturnRate only)
     # ReturnRate
-    df_pivot['ReturnRate'] = 0.0
-    mask_invest = df_pivot['매입금액'] != 0
-    df_pivot.loc[mask_invest, 'ReturnRate'] = (df_pivot.loc[mask_invest, '평가금액'] / df_pivot.loc[mask_invest, '매입금액'] - 1) * 100
+    df_pivot['ReturnRate'] = treemap_style.return_rates(df_pivot['매입금액'], df_pivot['평가금액'])
+    # Tile colors / font sizes / labels for all portfolios at once
+    df_pivot = df_pivot.join(treemap_style.style_pivot(df_pivot))
     # Removed Manual AvgPrice/CurPrice Calc as per User Request
     # Removed Manual AvgPrice/CurPrice Calc as per User Request
     # 8. Render Treemaps & Tables
@@ -727,34 +714,18 @@ elif page == "Asset Details":
     if not unique_ports:
         st.info("데이터가 없습니다.")
     else:
+        # D3 payloads for all portfolios in one pass (cached by pivot content)
+        treemap_payloads = d3_treemap.get_payloads(df_pivot)
         for port in unique_ports:
             st.subheader(port)
             df_p = df_pivot[df_pivot['포트폴리오'] == port].copy()
             if df_p.empty:
                 continue
-            # --- Dynamic Font Size Logic ---
-            min_val = df_p['평가금액'].min()
-            max_val = df_p['평가금액'].max()
-            def get_font_size(val):
-                if max_val == min_val: return 24
-                norm = (val - min_val) / (max_val - min_val)
-                return 14 + (norm * 66) 
-            df_p['TargetFontSize'] = df_p['평가금액'].apply(get_font_size)
             # --- Debug: Show Data ---
             # st.dataframe(df_p) # Uncomment if needed
             # --- Custom Coloring & Structure (go.Treemap) ---
             # User Request: Dark Portfolio Background, Colored Tiles, No Borders, Big Text.
             # Strategy: Pre-calculate Hex colors for all nodes.
-            # Helper to generate color from value (-30 to +30)
-            def get_color_hex(val):
-                # Clamp to range
-                v = max(-30, min(30, val))
-                # Normalize to 0-1 for Red-Yellow-Green (0=Red, 0.5=Yellow, 1=Green)
-                # But typically RdYlGn: 0=Red, 1=Green.
-                # My range: -30(Red) -> 0(Gray/Black?) -> +30(Green).
-                # Plotly 'RdYlGn' is Red(Low) -> Green(High).
-                norm = (v + 30) / 60.0
-                return px.colors.sample_colorscale('RdYlGn', [norm])[0]
             # 1. Prepare Data
             df_p['종목'] = df_p['종목'].astype(str)
             # Root Node
@@ -780,7 +751,7 @@ elif page == "Asset Details":
             child_labels = df_p['종목'].tolist()
             child_parents = [root_id] * len(df_p)
             child_values = df_p['평가금액'].tolist()
-            child_colors = df_p['ReturnRate'].apply(get_color_hex).tolist()
+            child_colors = df_p['Color'].tolist()
             # Columns to pass to tooltips
             # Order MUST match root_custom
             cols_to_hover = ['총평가손익', 'ReturnRate', '매입금액', '보유주수', '평단가', '현재가', '배당수익', '확정손익', 'CurSymbol']
@@ -808,28 +779,18 @@ elif page == "Asset Details":
             )
             # 1. Calculate Adaptive Font Sizes (Python Logic)
             # Scaling up to 180px as per User Request (Extreme Max)
-            total_val = df_p['평가금액'].sum()
-            def calc_font_size_aggressive(val):
-                if total_val == 0: return 20
-                size = (val / total_val) * 450 # Further Increased Boost for 180px
-                return int(max(20, min(180, size))) # Cap at 180px
-            font_sizes = df_p['평가금액'].apply(calc_font_size_aggressive).tolist()
+            font_sizes = df_p['FontSize'].tolist()
             font_sizes = [150] + font_sizes # Root gets Max (Title)
             # 2. Adaptive Text Color (Contrast Check)
             # Yellowish (Near 0%) -> Black Text
             # Strong Red/Green -> White Text
-            def get_text_color(val):
-                if abs(val) < 10: # Neutral/Yellow Zone
-                    return 'black'
-                return 'white'
-            text_colors = df_p['ReturnRate'].apply(get_text_color).tolist()
+            text_colors = df_p['TextColor'].tolist()
             # Root is Dark Grey (#262626) -> White Text
             text_colors = ['white'] + text_colors
             # --- D3.js Treemap ---
             # Helper to generate HTML logic (Finviz Style)
-            if not df_p.empty:
-                html_code = d3_treemap.generate_d3_treemap_v6(df_p, port_name=port)
-                st.components.v1.html(html_code, height=520, scrolling=False)
+            if port in treemap_payloads:
+                d3_treemap.render_treemap(treemap_payloads[port], height=520, key=f"treemap_{port}")
             else:
                 st.info("No data available for visualization.")
             
@@ -846,7 +807,7 @@ elif page == "Transaction Log":
     # Defaulting to AI Input as per User Request (to prevent random switching)
     tab_auto, tab_input, tab_view = st.tabs(["AI Input (Beta) 🤖", "Manual Input", "View Log"])
     # Fetch options dynamically
-    options = data_loader.get_transaction_options()
+    options = data_loader.get_transaction_options(owner=target_owner)
     # --- TAB 1: Manual Input ---
     with tab_input:
         st.caption("Add a new transaction")
@@ -891,7 +852,10 @@ elif page == "Transaction Log":
                     "수량": txn_qty if txn_qty is not None else 0,
                     "비고": txn_note
                 }
-                if data_loader.add_transaction_log(new_row):
+                # Refuse the append if someone else added rows since the form's options were read
+                if data_loader.add_transaction_log(new_row, expected_row_count=options.get("row_count")):
+                    # Pull the new row into the DB mirror the pages read from
+                    migration.migrate_google_sheets_to_sqlite(incremental=True)
                     st.success("Successfully Saved!")
                     st.toast("Transaction added.", icon="✅")
     # --- TAB 2: AI Input ---
@@ -922,10 +886,10 @@ elif page == "Transaction Log":
                                 dfer[c] = None
                         
                         # --- Master Data Parsing & Mapping ---
-                        # Reload data to ensure we have Masters
-                        data = data_loader.load_data()
-                        df_acct_master = data.get('account_master', pd.DataFrame())
-                        df_asset_master = data.get('asset_master', pd.DataFrame())
+                        # Reload Masters only (sheet); accounts scoped to the session's owner
+                        masters = data_loader.load_data(keys=['account_master', 'asset_master']) or {}
+                        df_acct_master = data_access.scope_sheet_frame('account_master', masters.get('account_master', pd.DataFrame()), target_owner)
+                        df_asset_master = masters.get('asset_master', pd.DataFrame())
                         
                         # 1. Owner/Account Mapping (by Account Number)
                         # We assume the first row's account_number applies to all (since it's one screenshot session usually)
@@ -1162,7 +1126,7 @@ elif page == "Transaction Log":
 
             with st.form("ai_input_form"):
                 # Prepare Stock Options from Asset Master
-                data_source = data_loader.load_data()
+                data_source = data_loader.load_data(keys=['asset_master'])
                 valid_stock_names = []
                 if data_source and 'asset_master' in data_source and not data_source['asset_master'].empty:
                      # Assume '종목명' (Stock Name) is the target
@@ -1212,9 +1176,11 @@ elif page == "Transaction Log":
                 submitted = st.form_submit_button("💾 Confirm & Save Selected")
                 
                 if submitted:
-                    # Logic: Load -> Merge/Update -> Overwrite
+                    # Logic: Load -> Merge/Update -> Patch
                     # CRITICAL: Use fresh data!
                     df_current_log = data_loader.get_latest_transaction_log()
+                    # Snapshot as read: the patch step diffs against it to send only changed cells
+                    df_original_log = df_current_log.copy()
                     
                     # Ensure columns exist in current log
                     required_cols = ["날짜", "소유자", "계좌", "종목", "거래구분", "통화", "거래금액", "수량", "비고"]
@@ -1310,11 +1276,12 @@ elif page == "Transaction Log":
                                 df_current_log = pd.concat([df_current_log, pd.DataFrame([new_row])], ignore_index=True)
                                 new_count += 1
 
-                        # Save Full DF
-                        if data_loader.overwrite_transaction_log(df_current_log):
+                        # Save only the diff (changed cells + appended rows, one request)
+                        if data_loader.patch_transaction_log(df_original_log, df_current_log):
+                            migration.migrate_google_sheets_to_sqlite(incremental=True)
                             st.success(f"Processed! (New: {new_count}, Updated: {updates_count})")
                             st.session_state.ai_draft_data = None
-                            st.rerun()
+                            profiler.rerun()
 
     # --- TAB 3: View Log ---
     with tab_view:
@@ -1432,32 +1399,18 @@ elif page == "Beta Rebalancing":
                 if df_beta_calc[col_tgt_w].max() > 1.0:
                     df_beta_calc[col_tgt_w] /= 100
                 # --- CORE LOGIC: Per-Owner Rebalancing ---
-                # 1. Total Equity per Owner
-                owner_equity = df_beta_calc.groupby(col_owner)[col_eval_val].sum()
-                # 2. Map Owner Equity to each row
-                df_beta_calc['OwnerTotal'] = df_beta_calc[col_owner].map(owner_equity)
-                # 3. Target Amount = OwnerTotal * TargetWeight
-                df_beta_calc['TargetAmount'] = df_beta_calc['OwnerTotal'] * df_beta_calc[col_tgt_w]
-                # 4. Diff Amount = Current - Target
-                # If Current > Target, Positive Diff -> SELL
-                # If Current < Target, Negative Diff -> BUY
-                df_beta_calc['DiffAmount'] = df_beta_calc[col_eval_val] - df_beta_calc['TargetAmount']
-                # 5. Diff Weight (for Chart)
-                df_beta_calc['OwnerCurWeight'] = df_beta_calc[col_eval_val] / df_beta_calc['OwnerTotal']
-                df_beta_calc['DiffWeight'] = df_beta_calc['OwnerCurWeight'] - df_beta_calc[col_tgt_w]
-                # 6. Calc Tolerance (Relative Band: Target * 20%)
-                df_beta_calc['Tolerance'] = df_beta_calc[col_tgt_w] * 0.20
-                # Enforce Custom Sort
-                custom_order = ['SPY', 'QQQ', 'GMF', 'VEA', 'BND', 'TIP', 'PDBC', 'GLD', 'VNQ', '달러', '원화']
-                df_beta_calc['SortKey'] = df_beta_calc[col_ticker].apply(
-                    lambda x: custom_order.index(x) if x in custom_order else 999
-                )
-                # Sort by Ticker then Owner
+                # Each owner is a portfolio; relative band = target weight * 20%.
+                # DiffAmount = Current - Target (> 0 SELL, < 0 BUY)
+                df_beta_calc = portfolio_logic.rebalance_portfolios(
+                    df_beta_calc, col_eval_val, col_tgt_w, [col_owner], band=0.20, relative=True
+                ).rename(columns={'PortfolioTotal': 'OwnerTotal', 'CurrentWeight': 'OwnerCurWeight'})
+                # Enforce Custom Sort, then Owner
+                df_beta_calc['SortKey'] = portfolio_logic.order_key(df_beta_calc[col_ticker])
                 df_beta_calc = df_beta_calc.sort_values(['SortKey', col_owner]).reset_index(drop=True)
                 # Total Equity (Global)
                 total_equity = df_beta_calc[col_eval_val].sum()
             # --- TABS ---
-            t_rebal, t_attr, t_corr, t_risk = st.tabs(["Rebalancing", "Attribution", "Correlation", "Signals"])
+            t_rebal, t_attr, t_corr, t_risk, t_bt = st.tabs(["Rebalancing", "Attribution", "Correlation", "Signals", "Backtest"])
             # 1. Rebalancing Tab
             with t_rebal:
                 c1, c2 = st.columns([1.5, 1])
@@ -1472,14 +1425,6 @@ elif page == "Beta Rebalancing":
                         df_beta_calc['Label'] = df_beta_calc[col_ticker] + " (" + df_beta_calc[col_owner] + ")"
                     else:
                         df_beta_calc['Label'] = df_beta_calc[col_ticker]
-                    # Status based on Relative Tolerance
-                    def get_status(row):
-                        w_diff = row['DiffWeight']
-                        tol = row['Tolerance']
-                        if w_diff > tol: return "Over"
-                        elif w_diff < -tol: return "Under"
-                        return "Normal"
-                    df_beta_calc['Status'] = df_beta_calc.apply(get_status, axis=1)
                     fig_diff = px.bar(
                         df_beta_calc,
                         y='Label',
@@ -1509,16 +1454,13 @@ elif page == "Beta Rebalancing":
                 with c2:
                     st.markdown("#### Action Table (Per Account)")
                     st.caption(f"Total Equity: ₩{total_equity:,.0f} (Threshold: Target ±20%)")
-                    def get_action_str(row):
-                        d_amt = row['DiffAmount']
-                        w_diff = row['DiffWeight']
-                        tol = row['Tolerance']
-                        cost = abs(d_amt)
-                        fmt_cost = f"₩{cost:,.0f}"
-                        if w_diff > tol: return f"SELL {fmt_cost}"
-                        elif w_diff < -tol: return f"BUY {fmt_cost}"
-                        return "-"
-                    df_beta_calc['Action'] = df_beta_calc.apply(get_action_str, axis=1)
+                    # "SELL ₩x" / "BUY ₩x" for band breaches, "-" inside the band
+                    fmt_cost = "₩" + df_beta_calc['TradeAmount'].map('{:,.0f}'.format)
+                    df_beta_calc['Action'] = np.select(
+                        [df_beta_calc['Action'] == "SELL", df_beta_calc['Action'] == "BUY"],
+                        ["SELL " + fmt_cost, "BUY " + fmt_cost],
+                        default="-",
+                    )
                     # Highlight Styles
                     def style_action(v):
                         if "SELL" in v: return 'color: #FF5252; font-weight: bold;'
@@ -1539,6 +1481,48 @@ elif page == "Beta Rebalancing":
                     Diff Amount: 평가금액 - 목표금액 | Action: Diff > 0 매도, Diff < 0 매수 | Tolerance: 목표비중의 ±20%
                     </div>
                     """, unsafe_allow_html=True)
+                # Executable order list (integer shares, KRW/USD cash, FX, fees)
+                with st.expander("📋 Order List (Trade Planner)"):
+                    inv_cols = ['포트폴리오 구분', '종목', '보유주수', '현재가', '평가금액', '화폐']
+                    if df_inv is None or df_inv.empty or not all(c in df_inv.columns for c in inv_cols):
+                        st.warning("Inventory columns missing for trade planning.")
+                    else:
+                        plan_accounts, plan_fx = trade_planner.holdings_from_inventory(df_inv)
+                        p1, p2, p3 = st.columns(3)
+                        fee_pct = p1.number_input("Fee (%)", min_value=0.0, value=trade_planner.FEE_RATE * 100, step=0.05)
+                        plan_fx = p2.number_input("USD/KRW", min_value=1.0, value=float(round(plan_fx, 2)))
+                        max_trades = p3.number_input("Max Trades (0 = no limit)", min_value=0, value=0, step=1)
+                        for msg in dict.fromkeys(w for acct in plan_accounts for w in acct['warnings']):
+                            st.warning(msg)
+                        if not plan_accounts:
+                            st.info("No inventory rows for this portfolio.")
+                        # One order list per account (cash and orders can't be pooled across accounts)
+                        for acct in plan_accounts:
+                            label = " · ".join(str(v) for v in (acct['owner'], acct['account']) if v is not None)
+                            if label:
+                                st.markdown(f"##### {label}")
+                            orders, plan = trade_planner.plan_trades(
+                                acct['df'], dict(acct['cash']), plan_fx, fee_rate=fee_pct / 100,
+                                max_trades=int(max_trades) or None,
+                            )
+                            m1, m2, m3 = st.columns(3)
+                            m1.metric("Tracking Error", f"{plan['te_after']:.2%}", f"{plan['te_after'] - plan['te_before']:.2%}", delta_color="inverse")
+                            m2.metric("Trades", plan['trades'])
+                            m3.metric("Fees", f"₩{plan['fees_krw']:,.0f}")
+                            if plan['fx']['KRW->USD'] > 0:
+                                st.caption(f"환전: ₩{plan['fx']['KRW->USD']:,.0f} → USD")
+                            elif plan['fx']['USD->KRW'] > 0:
+                                st.caption(f"환전: ${plan['fx']['USD->KRW']:,.2f} → KRW")
+                            if orders.empty:
+                                st.info("No trades needed.")
+                            else:
+                                st.dataframe(
+                                    orders.style.format({
+                                        'Qty': '{:,.0f}', 'Price': '{:,.2f}', 'Amount': '{:,.2f}', 'AmountKRW': '₩{:,.0f}',
+                                        'Fee': '{:,.2f}', 'WeightBefore': '{:.1%}', 'WeightAfter': '{:.1%}', 'TargetWeight': '{:.1%}',
+                                    }),
+                                    use_container_width=True, hide_index=True,
+                                )
             # 2. Attribution Tab
             with t_attr:
                 st.markdown("#### Profit Contribution by Asset")
@@ -1555,7 +1539,7 @@ elif page == "Beta Rebalancing":
                              # Group by Ticker
                              df_attr = df_attr.groupby(inv_ticker_col, as_index=False)[inv_pl_col].sum()
                              # Sort by custom order
-                             df_attr['SortKey'] = df_attr[inv_ticker_col].apply(lambda x: custom_order.index(x) if x in custom_order else 999)
+                             df_attr['SortKey'] = portfolio_logic.order_key(df_attr[inv_ticker_col])
                              df_attr = df_attr.sort_values('SortKey')
                              df_attr['Color'] = df_attr[inv_pl_col].apply(lambda x: '#66bb6a' if x >= 0 else '#EB5E55')
                              fig_attr = px.bar(
@@ -1588,49 +1572,20 @@ elif page == "Beta Rebalancing":
                 valid_tickers = [t for t in df_beta_calc[col_ticker].unique() if t not in ['달러', '원화', '현금']]
                 if st.button("Generate Correlation Matrix"):
                     with st.spinner(f"Fetching data for {len(valid_tickers)} assets..."):
-                        if yf:
+                        store = price_store.get_price_store() if yf else None
+                        if store:
                             try:
-                                # Try to use curl_cffi session if yfinance requires it
-                                try:
-                                    from curl_cffi import requests as cffi_requests
-                                    # Impersonate Chrome to avoid rate limiting
-                                    session = cffi_requests.Session(impersonate="chrome")
-                                    # curl_cffi session verify=False
-                                    session.verify = False
-                                except ImportError:
-                                    # Fallback to standard requests if curl_cffi missing
-                                    import requests
-                                    from requests.packages.urllib3.exceptions import InsecureRequestWarning
-                                    import warnings
-                                    warnings.simplefilter('ignore', InsecureRequestWarning)
-                                    session = requests.Session()
-                                    session.verify = False
-                                data_frames = []
-                                failed_tickers = []
+                                # Served from the local price cache; only missing dates hit yfinance
+                                end_date = datetime.now().date()
                                 progress_bar = st.progress(0)
-                                for idx, t in enumerate(valid_tickers):
-                                    try:
-                                        # Use Ticker object with session
-                                        ticker_obj = yf.Ticker(t, session=session)
-                                        hist = ticker_obj.history(period="1y", interval="1d")
-                                        if not hist.empty and 'Close' in hist.columns:
-                                            s_close = hist['Close']
-                                            s_close.name = t
-                                            # Remove timezone
-                                            if s_close.index.tz is not None:
-                                                s_close.index = s_close.index.tz_localize(None)
-                                            data_frames.append(s_close)
-                                        else:
-                                            # Sometimes rate limit helps to wait
-                                            failed_tickers.append(t)
-                                    except Exception as e:
-                                        failed_tickers.append(f"{t}")
-                                    progress_bar.progress((idx + 1) / len(valid_tickers))
+                                yf_data, failed_tickers = store.get_closes(
+                                    valid_tickers, end_date - timedelta(days=365), end_date,
+                                    progress=lambda done, total: progress_bar.progress(done / total),
+                                )
                                 progress_bar.empty()
+                                data_frames = list(yf_data.columns)
                                 if data_frames:
-                                    # Merge
-                                    yf_data = pd.concat(data_frames, axis=1)
-                                    corr_matrix = yf_data.corr()
+                                    corr_matrix = price_store.correlation_matrix(yf_data)
                                     # Plot
                                     fig_corr = px.imshow(
                                         corr_matrix,
@@ -1692,6 +1647,48 @@ elif page == "Beta Rebalancing":
                          st.warning("Currently in **Mean Reversion** phase (Negative Correlation). Volatility Expected.")
                      else:
                          st.write("Random Walk phase (No significant correlation).")
+            # 5. Backtest Tab (Rebalancing rules over cached prices)
+            with t_bt:
+                st.markdown("#### Rebalancing Rule Backtest")
+                st.caption(f"Target weights replayed on daily closes from the local price cache. "
+                           f"Current rule: ±{portfolio_logic.TOLERANCE:.0%} band.")
+                b1, b2 = st.columns(2)
+                bt_years = b1.slider("Years", 1, 10, 5)
+                bt_cost = b2.number_input("Cost per Trade (%)", min_value=0.0, value=backtester.COST_RATE * 100, step=0.05)
+                store = price_store.get_price_store() if yf else None
+                if st.button("Run Backtest"):
+                    if not store:
+                        st.error("`yfinance` needed for price history.")
+                    else:
+                        with st.spinner("Loading prices and sweeping band/calendar grid..."):
+                            df_bt, bt_failed, bt_late = backtester.run_backtest(store, years=bt_years, cost_rate=bt_cost / 100, workers=1)
+                        if df_bt.empty:
+                            st.error("No price history available.")
+                        else:
+                            if bt_failed:
+                                st.warning(f"Could not fetch: {', '.join(bt_failed)} (held as cash)")
+                            if bt_late:
+                                st.caption("Held as cash until their first close: " + ", ".join(
+                                    f"{t} ({d:%Y-%m-%d})" for t, d in bt_late.items()))
+                            fig_bt = px.scatter(
+                                df_bt, x='Turnover', y='CAGR', color='Strategy', symbol='Calendar',
+                                hover_data=['Band', 'MDD', 'Rebalances'],
+                                title="CAGR vs Annual Turnover"
+                            )
+                            fig_bt.update_layout(
+                                plot_bgcolor='rgba(0,0,0,0)',
+                                paper_bgcolor='rgba(0,0,0,0)',
+                                xaxis=dict(tickformat=".0%"),
+                                yaxis=dict(tickformat=".1%")
+                            )
+                            st.plotly_chart(fig_bt, use_container_width=True)
+                            st.dataframe(
+                                df_bt.sort_values('CAGR', ascending=False).style.format({
+                                    'Band': '{:.0%}', 'CAGR': '{:.2%}', 'MDD': '{:.2%}',
+                                    'Turnover': '{:.1%}', 'FinalValue': '{:.3f}',
+                                }),
+                                use_container_width=True, hide_index=True,
+                            )
         else:
              st.warning("Beta Portfolio columns not found.")
 # --- Page 6: Historical Analysis ---
@@ -1699,7 +1696,7 @@ elif page == "Beta Rebalancing":
 elif page == "Historical Analysis":
     st.markdown("<h1 style='font-size: 2.5rem; margin-bottom: 30px;'>Historical Analysis</h1>", unsafe_allow_html=True)
     # Create Tabs
-    tab_perf, tab_corr, tab_mdd = st.tabs(["Performance Attribution", "Correlation Matrix", "Drawdown (MDD)"])
+    tab_perf, tab_corr, tab_mdd, tab_risk = st.tabs(["Performance Attribution", "Correlation Matrix", "Drawdown (MDD)", "Rolling Risk"])
     # --- TAB 1: Performance Attribution (Existing Logic) ---
     with tab_perf:
         st.caption("Total Profit = Dividend + Realized Profit")
@@ -1801,13 +1798,11 @@ elif page == "Historical Analysis":
     with tab_corr:
         st.caption("How closely do your portfolios move together? (1.0 = Identical, -1.0 = Opposite)")
         if df_hist is not None and not df_hist.empty:
-            df_hist_calc = df_hist.set_index('날짜').sort_index()
+            hist_analytics = analytics.get_history_analytics(df_hist)
             # Filter numeric columns (portfolios)
-            valid_ports = [p for p in portfolios if p in df_hist_calc.columns]
+            valid_ports = [p for p in portfolios if p in hist_analytics.returns.columns]
             if valid_ports:
-                df_prices = df_hist_calc[valid_ports]
-                df_returns = df_prices.pct_change().dropna()
-                corr_matrix = df_returns.corr()
+                corr_matrix = hist_analytics.correlation(valid_ports)
                 fig_corr = px.imshow(
                     corr_matrix,
                     text_auto=".2f",
@@ -1827,13 +1822,11 @@ elif page == "Historical Analysis":
     with tab_mdd:
         st.caption("Visualizing the decline from the historical peak. How 'deep' did we go?")
         if df_hist is not None and not df_hist.empty:
-            df_hist_calc = df_hist.set_index('날짜').sort_index()
-            valid_ports = [p for p in portfolios if p in df_hist_calc.columns]
+            hist_analytics = analytics.get_history_analytics(df_hist)
+            valid_ports = [p for p in portfolios if p in hist_analytics.drawdown.columns]
             if valid_ports:
-                df_prices = df_hist_calc[valid_ports]
-                # Calculate Drawdown
-                rolling_max = df_prices.cummax()
-                drawdown = (df_prices - rolling_max) / rolling_max
+                # Drawdown from running peak (precomputed)
+                drawdown = hist_analytics.drawdown[valid_ports]
                 # Tidy format
                 df_dd_tidy = drawdown.reset_index().melt(id_vars='날짜', var_name='Portfolio', value_name='Drawdown')
                 fig_dd = go.Figure()
@@ -1859,10 +1852,95 @@ elif page == "Historical Analysis":
                 )
                 st.plotly_chart(fig_dd, use_container_width=True)
                 # Stat Table
-                mdd_max = drawdown.min()
+                mdd_max = hist_analytics.max_drawdown[valid_ports]
                 st.write("Max Drawdown Records")
                 st.dataframe(pd.DataFrame(mdd_max, columns=["Max Drawdown"]).sort_values("Max Drawdown").style.format("{:.2%}"), use_container_width=True)
             else:
                 st.warning("No portfolio data for MDD.")
         else:
             st.warning("No historical data available.")
+    # --- TAB 4: Rolling Risk ---
+    with tab_risk:
+        st.caption("Trailing-window risk per portfolio (annualized from daily values).")
+        if df_hist is not None and not df_hist.empty:
+            hist_analytics = analytics.get_history_analytics(df_hist)
+            valid_ports = [p for p in portfolios if p in hist_analytics.frame.columns]
+            if valid_ports:
+                r1, r2, r3 = st.columns(3)
+                window_label = r1.radio("Window", list(risk_metrics.WINDOWS), index=1, horizontal=True)
+                all_ports = [p for p in ['쇼호 α', '쇼호 β', '조연재', '조이재', '박행자'] if p in hist_analytics.frame.columns]
+                benchmark = r2.selectbox("Benchmark (Beta)", all_ports, index=0)
+                metric_labels = {'volatility': 'Volatility', 'sharpe': 'Sharpe', 'sortino': 'Sortino',
+                                 'calmar': 'Calmar', 'mdd': 'Rolling MDD', 'beta': 'Beta'}
+                metric = r3.selectbox("Metric", list(metric_labels), format_func=metric_labels.get)
+                risk = hist_analytics.risk(valid_ports, risk_metrics.WINDOWS[window_label], benchmark)
+                df_metric = risk[metric]
+                fig_risk = go.Figure()
+                for p in valid_ports:
+                    fig_risk.add_trace(go.Scatter(
+                        x=df_metric.index,
+                        y=df_metric[p],
+                        mode='lines',
+                        name=p,
+                        line=dict(color=PORT_COLORS.get(p, "#FFFFFF"), width=2)
+                    ))
+                pct_metric = metric in ('volatility', 'mdd')
+                fig_risk.update_layout(
+                    template="plotly_dark",
+                    title=f"Rolling {metric_labels[metric]} ({window_label})",
+                    xaxis_title="Date",
+                    yaxis_title=metric_labels[metric],
+                    yaxis_tickformat=".1%" if pct_metric else ".2f",
+                    hovermode="x unified",
+                    plot_bgcolor='rgba(0,0,0,0)',
+                    paper_bgcolor='rgba(0,0,0,0)'
+                )
+                st.plotly_chart(fig_risk, use_container_width=True)
+                st.write("Latest Values")
+                df_latest = risk_metrics.latest_summary(risk).rename(columns=metric_labels)
+                st.dataframe(
+                    df_latest.style.format("{:.2f}").format("{:.1%}", subset=['Volatility', 'Rolling MDD']),
+                    use_container_width=True
+                )
+            else:
+                st.warning("No portfolio data for risk metrics.")
+        else:
+            st.warning("No historical data available.")
+profiler.end(page_span)
+
+# --- Rerun Profiler (Admin only) ---
+rerun_trace = profiler.finish_rerun()
+if is_admin and rerun_trace is not None:
+    with st.sidebar.expander("⏱️ Rerun Profiler", expanded=False):
+        profile_store = profiler.get_store()
+        st.caption(f"This rerun: {rerun_trace.total * 1e3:,.0f} ms")
+        df_spans = rerun_trace.to_frame()
+        if not df_spans.empty:
+            # Flame-style view: one bar per span, offset by its start, stacked by nesting depth
+            fig_flame = go.Figure(go.Bar(
+                x=df_spans['duration'] * 1e3,
+                base=df_spans['start'] * 1e3,
+                y=df_spans['depth'],
+                orientation='h',
+                text=df_spans['span'],
+                textposition='inside',
+                insidetextanchor='start',
+                hovertemplate="%{text}<br>%{x:,.1f} ms (start %{base:,.1f} ms)<extra></extra>",
+                marker=dict(color=df_spans['depth'], colorscale='Blues', line=dict(width=1, color='#0E1117')),
+            ))
+            fig_flame.update_layout(
+                template="plotly_dark",
+                height=60 + 40 * (int(df_spans['depth'].max()) + 1),
+                margin=dict(l=0, r=0, t=10, b=0),
+                xaxis_title="ms",
+                yaxis=dict(autorange='reversed', showticklabels=False),
+                bargap=0.1,
+                plot_bgcolor='rgba(0,0,0,0)',
+                paper_bgcolor='rgba(0,0,0,0)'
+            )
+            st.plotly_chart(fig_flame, use_container_width=True)
+        st.dataframe(profile_store.summary().round(1), use_container_width=True, hide_index=True)
+        # Read by start_rerun on this session's next rerun
+        export = st.checkbox("Export reruns to JSONL", key="profiler_export")
+        if export:
+            st.caption(f"Appending to {profiler.EXPORT_FILE}")
@@ -0,0 +1,72 @@
+"""
+Benchmark: per-rerun credential preparation in run_authentication.
+
+"before" hashes the secrets password with bcrypt on every rerun (as app.py did);
+"after" goes through auth_manager.get_credentials, which hashes once per process
+and then only copies the cached credentials. The authenticator itself is built
+per rerun in both cases (it needs a Streamlit session), so it is not timed here.
+
+Usage:
+    python benchmark_auth.py
+    python benchmark_auth.py --reruns 20
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import streamlit_authenticator as stauth
+
+from modules import auth_manager
+
+
+def rerun_before(plain_password):
+    hashed = stauth.Hasher().hash(plain_password)
+    usernames = {u: dict(info, password=hashed) for u, info in auth_manager.DEFAULT_USERS.items()}
+    return auth_manager.build_config({'usernames': usernames})
+
+
+def rerun_after(plain_password, path):
+    return auth_manager.build_config(auth_manager.get_credentials(plain_password, path=path))
+
+
+def timed(fn, reruns):
+    samples = []
+    for _ in range(reruns):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reruns', type=int, default=10)
+    args = parser.parse_args()
+    password = 'benchmark-password'
+
+    with tempfile.TemporaryDirectory() as tmp:
+        missing = os.path.join(tmp, 'none.yaml')       # shared secrets password
+        per_user = os.path.join(tmp, 'credentials.yaml')
+        auth_manager.save_user('admin', password, path=per_user)
+        auth_manager.save_user('park', password, path=per_user)
+
+        cases = [
+            ("before: hash every rerun", lambda: rerun_before(password)),
+            ("after: secrets password", lambda: rerun_after(password, missing)),
+            ("after: credentials file", lambda: rerun_after(None, per_user)),
+        ]
+        print(f"{'case':<26} | {'first':>9} | {'later (mean)':>12}")
+        print("-" * 54)
+        for label, fn in cases:
+            samples = timed(fn, args.reruns)
+            later = sum(samples[1:]) / max(len(samples) - 1, 1)
+            print(f"{label:<26} | {samples[0] * 1e3:>7.1f}ms | {later * 1e3:>10.3f}ms")
+
+        # Sanity: the cached hash still verifies
+        creds = auth_manager.get_credentials(None, path=per_user)
+        assert stauth.Hasher.check_pw(password, creds['usernames']['park']['password'])
+
+
+if __name__ == '__main__':
+    main()
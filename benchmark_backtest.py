@@ -0,0 +1,59 @@
+"""
+Benchmark: backtest grid sweep in-process vs on a 'spawn' process pool.
+
+Synthetic daily returns for the TARGET_WEIGHTS universe; the band grid is
+widened with --bands so there is enough work to split. Each pool run is checked
+against the in-process result (identical metrics). Process start-up (spawn
+re-imports pandas/NumPy per worker) is included in the pool timings.
+
+Usage:
+    python benchmark_backtest.py
+    python benchmark_backtest.py --years 10 --bands 5 50 200 --workers 4
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from modules import backtester, portfolio_logic
+
+
+def synthetic_returns(years, seed=0):
+    tickers = [t for t in portfolio_logic.TARGET_WEIGHTS if t != 'Cash']
+    rng = np.random.default_rng(seed)
+    n_days = int(years * backtester.TRADING_DAYS)
+    returns = rng.normal(0.0003, 0.012, (n_days, len(tickers)))
+    weights = np.array([portfolio_logic.TARGET_WEIGHTS[t] for t in tickers])
+    return returns, weights, max(0.0, 1.0 - weights.sum())
+
+
+def timed_sweep(returns, weights, cash_weight, bands, workers):
+    t0 = time.perf_counter()
+    df = backtester.sweep(returns, weights, cash_weight, bands=bands, workers=workers)
+    return time.perf_counter() - t0, df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=float, default=10)
+    parser.add_argument('--bands', type=int, nargs='+', default=[5, 50, 200],
+                        help="Band values in the grid (x4 calendar periods = strategies).")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    returns, weights, cash_weight = synthetic_returns(args.years)
+    print(f"{len(returns)} days x {returns.shape[1]} assets, {args.workers} spawn workers")
+    print(f"{'strategies':>10} | {'in-process':>10} | {'pool':>9} | {'speedup':>7} | {'same':>5}")
+    print("-" * 55)
+    for n_bands in args.bands:
+        bands = list(np.linspace(0.0, 0.2, n_bands))
+        seq, df_seq = timed_sweep(returns, weights, cash_weight, bands, 1)
+        par, df_par = timed_sweep(returns, weights, cash_weight, bands, args.workers)
+        same = df_seq.equals(df_par)
+        print(f"{len(df_seq):>10} | {seq:>9.2f}s | {par:>8.2f}s | {seq / par:>6.1f}x | {str(same):>5}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""
+Benchmark: dashboard reads while a sync is writing.
+
+Seeds a temporary store with synthetic transactions, then runs N reader threads
+that repeat dashboard queries while one writer keeps re-syncing alternating
+copies of the data for --seconds. Workloads:
+
+  rerun  what every rerun issues: the transaction_log fingerprint
+         (positions._data_version) and one owner's scoped page
+  full   whole transaction log + inventory view (first load / Admin viewer);
+         dominated by Python row materialization, not by locking
+
+Each profile is run --repeats times; medians of p50/p95/max are reported.
+Compared for two profiles:
+
+  default  plain create_engine, rollback journal (how the app used to connect)
+  tuned    db_manager pragma profile (WAL etc.) with pooled readers and a
+           single dedicated writer connection (database.create_*_engine)
+
+Usage:
+    python benchmark_concurrency.py
+    python benchmark_concurrency.py --readers 4 16 --rows 20000 --workload full
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from benchmark_migration import make_synthetic_data
+from modules import database, db_manager, migration
+
+WORKLOADS = {
+    'rerun': [
+        "SELECT COUNT(*), MAX(id), MAX(synced_at) FROM transaction_log",
+        "SELECT * FROM transaction_log WHERE owner = '박행자' ORDER BY source_row_index, id",
+    ],
+    'full': [
+        "SELECT * FROM transaction_log ORDER BY source_row_index, id",
+        "SELECT * FROM view_asset_inventory",
+    ],
+}
+
+
+def make_engines(profile, db_file):
+    """Returns (read_engine, write_engine) for the given profile."""
+    if profile == 'tuned':
+        return database.create_read_engine(db_file), database.create_write_engine(db_file)
+    engine = create_engine(f"sqlite:///{db_file}", connect_args={"check_same_thread": False})
+    return engine, engine
+
+
+def seed(db_file, data):
+    """Creates the schema (journal mode as it will be benchmarked) and a first full sync."""
+    conn = db_manager.connect(db_file)
+    db_manager.migrate(conn)
+    conn.close()
+    engine = create_engine(f"sqlite:///{db_file}")
+    db = sessionmaker(bind=engine)()
+    migration.sync_dataframes(db, data)
+    db.commit()
+    db.close()
+    engine.dispose()
+
+
+def reader_loop(engine, queries, stop, latencies, errors):
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            with engine.connect() as conn:
+                for sql in queries:
+                    conn.execute(text(sql)).fetchall()
+            latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            errors.append(str(e))
+            time.sleep(0.01)
+
+
+def run(profile, n_readers, data, data_modified, queries, seconds):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, 'bench.db')
+        if profile == 'default':
+            # Baseline: keep the rollback journal and default pragmas
+            saved = db_manager.PRAGMAS
+            db_manager.PRAGMAS = {"journal_mode": "DELETE", "busy_timeout": 5000} # sqlite3 defaults
+            try:
+                seed(db_file, data)
+            finally:
+                db_manager.PRAGMAS = saved
+        else:
+            seed(db_file, data)
+
+        read_engine, write_engine = make_engines(profile, db_file)
+        stop = threading.Event()
+        latencies, errors = [], []
+        threads = [threading.Thread(target=reader_loop, args=(read_engine, queries, stop, latencies, errors))
+                   for _ in range(n_readers)]
+        for t in threads:
+            t.start()
+
+        time.sleep(0.2) # Readers warm up before the syncs start
+        del latencies[:]
+        Session = sessionmaker(bind=write_engine)
+        syncs, start = 0, time.perf_counter()
+        while syncs == 0 or time.perf_counter() - start < seconds:
+            db = Session()
+            migration.sync_dataframes(db, data_modified if syncs % 2 == 0 else data)
+            db.commit()
+            db.close()
+            syncs += 1
+        write_seconds = (time.perf_counter() - start) / syncs
+
+        stop.set()
+        for t in threads:
+            t.join()
+        read_engine.dispose()
+        write_engine.dispose()
+
+    lat = np.array(latencies) * 1000 if latencies else np.array([np.nan])
+    return {
+        'reads': len(latencies),
+        'p50_ms': np.percentile(lat, 50),
+        'p95_ms': np.percentile(lat, 95),
+        'max_ms': lat.max(),
+        'errors': len(errors),
+        'sync_s': write_seconds,
+    }
+
+
+def run_repeated(profile, n_readers, data, data_modified, queries, seconds, repeats):
+    """Median of each statistic over `repeats` runs."""
+    runs = [run(profile, n_readers, data, data_modified, queries, seconds) for _ in range(repeats)]
+    return {k: float(np.median([r[k] for r in runs])) for k in runs[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--rows', type=int, default=20_000)
+    parser.add_argument('--workload', choices=list(WORKLOADS), default='rerun')
+    parser.add_argument('--seconds', type=float, default=5.0, help="Minimum sync time per run.")
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    data = make_synthetic_data(args.rows)
+    # Every row changes, so the sync rewrites the whole transaction_log
+    data_modified = dict(data)
+    df_txn = data['transactions'].copy()
+    df_txn['비고'] = df_txn['비고'] + ' (edited)'
+    data_modified['transactions'] = df_txn
+
+    queries = WORKLOADS[args.workload]
+    print(f"workload={args.workload} rows={args.rows} seconds={args.seconds} repeats={args.repeats} (medians)")
+    print(f"{'profile':>8} | {'readers':>7} | {'reads':>6} | {'p50':>9} | {'p95':>9} | {'max':>9} | {'errors':>6} | {'sync':>7}")
+    print("-" * 82)
+    for n in args.readers:
+        for profile in ('default', 'tuned'):
+            r = run_repeated(profile, n, data, data_modified, queries, args.seconds, args.repeats)
+            print(f"{profile:>8} | {n:>7} | {r['reads']:>6.0f} | {r['p50_ms']:>7.1f}ms | {r['p95_ms']:>7.1f}ms | "
+                  f"{r['max_ms']:>7.1f}ms | {r['errors']:>6.0f} | {r['sync_s']:>6.2f}s")
+
+
+if __name__ == '__main__':
+    main()
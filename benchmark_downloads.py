@@ -0,0 +1,83 @@
+"""
+Benchmark: sequential vs concurrent ticker downloads into the price store.
+
+Uses a stub source that sleeps a fixed latency per request (plus optional
+transient failures, which exercise the per-ticker retry), so no network is
+needed. Each run starts from an empty temporary store, i.e. every ticker
+needs a full one-year download, as on the first Correlation tab click.
+
+Usage:
+    python benchmark_downloads.py
+    python benchmark_downloads.py --tickers 5 20 50 --latency 0.3 --workers 8
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from modules import db_manager, price_store
+
+
+class LatencyPriceSource(price_store.PriceSource):
+    """Synthetic closes after a fixed delay; fails the first try of a share of tickers."""
+
+    def __init__(self, latency, fail_rate=0.0, seed=0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self._rng = random.Random(seed)
+        self._failed_once = set()
+        self._lock = threading.Lock()
+
+    def fetch(self, ticker, start, end):
+        time.sleep(self.latency)
+        with self._lock:
+            if ticker not in self._failed_once and self._rng.random() < self.fail_rate:
+                self._failed_once.add(ticker)
+                raise ConnectionError("simulated transient failure")
+        idx = pd.bdate_range(start, end)
+        return pd.Series(100 + np.arange(len(idx), dtype='float64'), index=idx, name=ticker)
+
+
+def run(n_tickers, workers, latency, fail_rate):
+    tickers = [f"T{i:03d}" for i in range(n_tickers)]
+    end = date.today()
+    start = end - timedelta(days=365)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, 'prices.db')
+        conn = db_manager.connect(db_file)
+        db_manager.migrate(conn)
+        conn.close()
+
+        store = price_store.PriceStore(LatencyPriceSource(latency, fail_rate), db_file,
+                                       max_workers=workers, backoff=0.05)
+        t0 = time.perf_counter()
+        closes, failed = store.get_closes(tickers, start, end)
+        elapsed = time.perf_counter() - t0
+    return elapsed, closes.shape[1], len(failed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickers', type=int, nargs='+', default=[5, 10, 20, 50])
+    parser.add_argument('--latency', type=float, default=0.2, help="Seconds per simulated request.")
+    parser.add_argument('--workers', type=int, default=price_store.DOWNLOAD_WORKERS)
+    parser.add_argument('--fail-rate', type=float, default=0.1,
+                        help="Share of tickers whose first request fails (retried).")
+    args = parser.parse_args()
+
+    print(f"{'tickers':>7} | {'sequential':>10} | {'concurrent':>10} | {'speedup':>7} | {'fetched':>7} | {'failed':>6}")
+    print("-" * 64)
+    for n in args.tickers:
+        seq, _, _ = run(n, 1, args.latency, args.fail_rate)
+        par, fetched, failed = run(n, args.workers, args.latency, args.fail_rate)
+        print(f"{n:>7} | {seq:>9.2f}s | {par:>9.2f}s | {seq / par:>6.1f}x | {fetched:>7} | {failed:>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+Benchmark: per-row ORM migration (legacy) vs bulk preload migration.
+
+Runs both implementations against a fresh temporary SQLite file for each size,
+once cold (empty DB, everything inserted) and once warm (re-sync of the same
+data, which is what auto_sync does on every app start).
+
+Usage:
+    python benchmark_migration.py
+    python benchmark_migration.py --sizes 1000 10000 --skip-legacy-above 10000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from modules import migration, models
+
+
+def make_synthetic_data(n_txn, seed=42):
+    """Builds sheet-shaped frames (masters + n_txn transactions)."""
+    rng = np.random.default_rng(seed)
+    owners = ['쇼호', '조연재', '조이재', '박행자']
+    accounts = [f"계좌{i}" for i in range(12)]
+    assets = ['원화', '달러'] + [f"종목{i}" for i in range(60)]
+    types = ['매수', '매도', '배당금', '입금', '출금']
+
+    df_acct = pd.DataFrame({
+        '계좌번호': [f"1000-{i:04d}" for i in range(len(accounts))],
+        '소유자': [owners[i % len(owners)] for i in range(len(accounts))],
+        '계좌명': accounts,
+        '증권사': '키움',
+        '포트폴리오 구분': '쇼호 α',
+    })
+    df_asset = pd.DataFrame({
+        '종목명': assets,
+        '티커': [f"T{i}" for i in range(len(assets))],
+        '통화': 'KRW',
+    })
+    dates = pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 2000, n_txn), unit='D')
+    df_txn = pd.DataFrame({
+        '날짜': dates.strftime('%Y-%m-%d'),
+        '소유자': rng.choice(owners, n_txn),
+        '계좌': rng.choice(accounts, n_txn),
+        '종목': rng.choice(assets, n_txn),
+        '거래구분': rng.choice(types, n_txn),
+        '통화': '₩',
+        '거래금액': rng.integers(1, 10_000_000, n_txn).astype(float),
+        '수량': rng.integers(1, 500, n_txn).astype(float),
+        '비고': rng.choice(['Settled', 'Pending'], n_txn),
+    })
+    return {'account_master': df_acct, 'asset_master': df_asset, 'transactions': df_txn}
+
+
+def legacy_sync(db, data):
+    """The previous migration loop: one SELECT per master/transaction row."""
+    for _, row in data['account_master'].iterrows():
+        acct_num = str(row.get('계좌번호', '')).strip()
+        if not acct_num: continue
+        acct = db.query(models.Account).filter_by(account_number=acct_num).first()
+        if not acct:
+            acct = models.Account(account_number=acct_num)
+        acct.owner = str(row.get('소유자', '')).strip()
+        acct.account_name = str(row.get('계좌명', '')).strip()
+        acct.broker = str(row.get('증권사', '')) if '증권사' in row else None
+        acct.type = str(row.get('포트폴리오 구분', row.get('계좌구분', ''))).strip() or "General"
+        db.add(acct)
+
+    for _, row in data['asset_master'].iterrows():
+        asset_name = str(row.get('종목명', '')).strip()
+        if not asset_name: continue
+        asset = db.query(models.Asset).filter_by(asset_name=asset_name).first()
+        if not asset:
+            asset = models.Asset(asset_name=asset_name)
+        asset.ticker = str(row.get('티커', '')).strip()
+        asset.currency = str(row.get('통화', 'KRW')).strip()
+        asset.asset_class = 'Cash' if asset_name in ['원화', '달러'] else 'Stock'
+        asset.updated_at = datetime.utcnow()
+        db.add(asset)
+
+    processed_hashes = set()
+    for idx, row in data['transactions'].iterrows():
+        date_str = str(row.get('날짜', '')).strip()
+        if not date_str or date_str == 'NaT': continue
+        try:
+            dt = pd.to_datetime(date_str).date()
+        except:
+            continue
+        sync_hash = migration.generate_sync_hash(row)
+        if sync_hash in processed_hashes:
+            continue
+        processed_hashes.add(sync_hash)
+        txn = db.query(models.Transaction).filter_by(sync_hash=sync_hash).first()
+        if not txn:
+            txn = models.Transaction(sync_hash=sync_hash)
+        txn.date = dt
+        txn.owner = str(row.get('소유자', '')).strip()
+        txn.account_name = str(row.get('계좌', '')).strip()
+        txn.asset_name = str(row.get('종목', '')).strip()
+        txn.type = str(row.get('거래구분', '')).strip()
+        txn.amount = float(row.get('거래금액', 0))
+        txn.qty = float(row.get('수량', 0))
+        txn.price = 0.0
+        txn.currency = str(row.get('통화', 'KRW')).strip()
+        txn.note = str(row.get('비고', '')).strip()
+        txn.status = '완료'
+        txn.source_row_index = idx + 2
+        txn.synced_at = datetime.utcnow()
+        db.add(txn)
+
+
+def time_runs(sync_fn, data):
+    """Returns (cold_seconds, warm_seconds) on a fresh temporary database."""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        models.Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        timings = []
+        for _ in range(2):
+            db = Session()
+            start = time.perf_counter()
+            sync_fn(db, data)
+            db.commit()
+            timings.append(time.perf_counter() - start)
+            db.close()
+        engine.dispose()
+    return timings[0], timings[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--skip-legacy-above', type=int, default=None,
+                        help="Skip the per-row implementation for sizes above this (it is slow).")
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} | {'legacy cold':>12} | {'legacy warm':>12} | {'bulk cold':>10} | {'bulk warm':>10}")
+    print("-" * 66)
+    for n in args.sizes:
+        data = make_synthetic_data(n)
+        if args.skip_legacy_above is not None and n > args.skip_legacy_above:
+            legacy = ('skipped', 'skipped')
+        else:
+            legacy = tuple(f"{t:.2f}s" for t in time_runs(legacy_sync, data))
+        bulk = tuple(f"{t:.2f}s" for t in time_runs(migration.sync_dataframes, data))
+        print(f"{n:>8} | {legacy[0]:>12} | {legacy[1]:>12} | {bulk[0]:>10} | {bulk[1]:>10}")
+
+
+if __name__ == '__main__':
+    main()
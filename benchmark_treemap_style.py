@@ -0,0 +1,133 @@
+"""
+Benchmark: per-row treemap styling (.apply, as Asset Details did) vs the
+vectorized treemap_style helpers.
+
+Builds a synthetic Asset Details pivot, styles it both ways, checks that the
+results agree (colors within one LUT step) and prints the timings.
+
+Usage:
+    python benchmark_treemap_style.py
+    python benchmark_treemap_style.py --rows 50 500 5000 --repeat 20
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from modules import treemap_style
+
+PORTFOLIOS = ['쇼호 α', '쇼호 β', '조연재', '조이재', '박행자']
+
+
+def make_pivot(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    invested = rng.uniform(1e5, 1e7, n_rows)
+    invested[rng.random(n_rows) < 0.05] = 0
+    return pd.DataFrame({
+        '포트폴리오': rng.choice(PORTFOLIOS, n_rows),
+        '종목': [f"T{i:04d}" for i in range(n_rows)],
+        '매입금액': invested,
+        '평가금액': invested * rng.uniform(0.5, 1.6, n_rows) + 1,
+        '화폐': rng.choice(['KRW', 'USD', '달러', '원화'], n_rows),
+    })
+
+
+def style_per_row(df_pivot):
+    """The former Asset Details code: one .apply per helper and portfolio."""
+    def get_currency_symbol(curr):
+        s = str(curr).strip().upper()
+        if s in ['USD', '달러', 'DOLLAR']: return '$'
+        return '₩'
+
+    def get_color_hex(val):
+        v = max(-30, min(30, val))
+        norm = (v + 30) / 60.0
+        return px.colors.sample_colorscale('RdYlGn', [norm])[0]
+
+    def get_text_color(val):
+        if abs(val) < 10:
+            return 'black'
+        return 'white'
+
+    df = df_pivot.copy()
+    df['CurSymbol'] = df['화폐'].apply(get_currency_symbol)
+    df['ReturnRate'] = 0.0
+    mask_invest = df['매입금액'] != 0
+    df.loc[mask_invest, 'ReturnRate'] = (df.loc[mask_invest, '평가금액'] / df.loc[mask_invest, '매입금액'] - 1) * 100
+    parts = []
+    for port in df['포트폴리오'].unique():
+        df_p = df[df['포트폴리오'] == port].copy()
+        min_val, max_val = df_p['평가금액'].min(), df_p['평가금액'].max()
+        total_val = df_p['평가금액'].sum()
+
+        def get_font_size(val):
+            if max_val == min_val: return 24
+            norm = (val - min_val) / (max_val - min_val)
+            return 14 + (norm * 66)
+
+        def calc_font_size_aggressive(val):
+            if total_val == 0: return 20
+            size = (val / total_val) * 450
+            return int(max(20, min(180, size)))
+
+        df_p['TargetFontSize'] = df_p['평가금액'].apply(get_font_size)
+        df_p['Color'] = df_p['ReturnRate'].apply(get_color_hex)
+        df_p['FontSize'] = df_p['평가금액'].apply(calc_font_size_aggressive)
+        df_p['TextColor'] = df_p['ReturnRate'].apply(get_text_color)
+        parts.append(df_p)
+    return pd.concat(parts).sort_index()
+
+
+def style_vectorized(df_pivot):
+    df = df_pivot.copy()
+    df['CurSymbol'] = treemap_style.currency_symbols(df['화폐'])
+    df['ReturnRate'] = treemap_style.return_rates(df['매입금액'], df['평가금액'])
+    return df.join(treemap_style.style_pivot(df))
+
+
+def _rgb(colors):
+    out = []
+    for c in colors:
+        if c.startswith('#'):
+            out.append([int(c[i:i + 2], 16) for i in (1, 3, 5)])
+        else:
+            out.append([float(x) for x in c[c.index('(') + 1:c.index(')')].split(',')])
+    return np.array(out)
+
+
+def check(a, b):
+    for col in ['CurSymbol', 'TextColor', 'FontSize']:
+        assert (a[col].to_numpy() == b[col].to_numpy()).all(), col
+    for col in ['ReturnRate', 'TargetFontSize']:
+        assert np.allclose(a[col], b[col]), col
+    return np.abs(_rgb(a['Color']) - _rgb(b['Color'])).max()
+
+
+def timed(fn, df, repeat):
+    fn(df)
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn(df)
+    return (time.perf_counter() - t0) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[50, 500, 5000])
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'rows':>6} | {'per-row':>10} | {'vectorized':>10} | {'speedup':>7} | {'max RGB diff':>12}")
+    print("-" * 58)
+    for n in args.rows:
+        df = make_pivot(n)
+        diff = check(style_per_row(df), style_vectorized(df))
+        slow = timed(style_per_row, df, args.repeat)
+        fast = timed(style_vectorized, df, args.repeat)
+        print(f"{n:>6} | {slow * 1e3:>8.2f}ms | {fast * 1e3:>8.2f}ms | {slow / fast:>6.1f}x | {diff:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+# Makes the repo root (and `modules`) importable when running `pytest` from here.
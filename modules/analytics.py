@@ -0,0 +1,164 @@
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+import streamlit as st
+from pandas.tseries.frequencies import to_offset
+from modules import risk_metrics
+
+# Precomputed '자산기록' analytics shared by Asset Trend and Historical Analysis.
+# Results are keyed by a content hash of the history frame; when the new frame
+# only appends rows to a cached one, just the tail is computed.
+
+RESAMPLE_RULES = {"Weekly": "W", "Monthly": "ME"}
+MAX_VERSIONS = 4 # Cached frames (one per owner filter in practice)
+
+def _row_hashes(df):
+    return pd.util.hash_pandas_object(df, index=True).to_numpy()
+
+def _digest(row_hashes):
+    return hashlib.md5(row_hashes.tobytes()).hexdigest()
+
+class HistoryAnalytics:
+    """
+    Derived series of one history frame (index: 날짜, sorted):
+    returns (pct_change), running_max / drawdown (cummax), max_drawdown,
+    and the raw weekly/monthly resamples used by Asset Trend.
+    """
+
+    def __init__(self, frame, row_hashes):
+        self.frame = frame
+        self.row_hashes = row_hashes
+        self.version = _digest(row_hashes)
+        values = frame.select_dtypes('number')
+        self.returns = values.pct_change(fill_method=None).iloc[1:]
+        self.running_max = values.cummax()
+        self.drawdown = (values - self.running_max) / self.running_max
+        self.max_drawdown = self.drawdown.min()
+        self.resampled = {rule: frame.resample(rule).last().dropna() for rule in RESAMPLE_RULES.values()}
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def _from_parts(cls, frame, row_hashes, returns, running_max, drawdown, max_drawdown, resampled):
+        obj = cls.__new__(cls)
+        obj.frame, obj.row_hashes, obj.version = frame, row_hashes, _digest(row_hashes)
+        obj.returns, obj.running_max, obj.drawdown = returns, running_max, drawdown
+        obj.max_drawdown, obj.resampled = max_drawdown, resampled
+        obj._memo = {}
+        obj._lock = threading.Lock()
+        return obj
+
+    def extended(self, frame, row_hashes):
+        """
+        Analytics for `frame`, whose first len(self.frame) rows are this frame.
+        Only the appended rows (and the last resample bucket) are computed.
+        """
+        n = len(self.frame)
+        tail = frame.iloc[n:]
+        values = frame.select_dtypes('number')
+        tail_values = values.iloc[n:]
+
+        # Returns: previous last row + tail
+        tail_returns = values.iloc[n - 1:].pct_change(fill_method=None).iloc[1:]
+        # Running max continues from the previous last running max
+        tail_max = pd.concat([self.running_max.iloc[[-1]], tail_values]).cummax().iloc[1:]
+        tail_dd = (tail_values - tail_max) / tail_max
+
+        # Resample: rebuild from the bucket holding the previous last date
+        last = self.frame.index[-1]
+        resampled = {}
+        for rule, old in self.resampled.items():
+            offset = to_offset(rule)
+            label = offset.rollforward(last.normalize())
+            fresh = frame[frame.index > label - offset].resample(rule).last().dropna()
+            resampled[rule] = pd.concat([old[old.index < label], fresh[fresh.index >= label]])
+
+        return HistoryAnalytics._from_parts(
+            frame, row_hashes,
+            pd.concat([self.returns, tail_returns]),
+            pd.concat([self.running_max, tail_max]),
+            pd.concat([self.drawdown, tail_dd]),
+            np.fmin(self.max_drawdown, tail_dd.min()) if len(tail) else self.max_drawdown,
+            resampled,
+        )
+
+    def correlation(self, columns):
+        """Correlation of daily returns over rows where all `columns` have one (memoized)."""
+        key = tuple(columns)
+        with self._lock:
+            if key not in self._memo:
+                self._memo[key] = self.returns[list(columns)].dropna().corr()
+            return self._memo[key]
+
+    def risk(self, columns, window, benchmark=None):
+        """risk_metrics.rolling_risk over `columns` (memoized per window/benchmark)."""
+        key = ('risk', tuple(columns), window, benchmark)
+        with self._lock:
+            if key not in self._memo:
+                cols = list(dict.fromkeys(list(columns) + ([benchmark] if benchmark else [])))
+                risk = risk_metrics.rolling_risk(self.frame[cols], window, benchmark)
+                self._memo[key] = {k: v[list(columns)] for k, v in risk.items()}
+            return self._memo[key]
+
+    def chart_frame(self, freq_option):
+        """
+        Asset Trend frame ('날짜' column) for "Daily" / "Weekly" / "Monthly".
+        Resampled views keep the very first data point as the baseline.
+        """
+        rule = RESAMPLE_RULES.get(freq_option)
+        if rule is None:
+            return self.frame.reset_index()
+        df_resampled = self.resampled[rule]
+        first_row = self.frame.iloc[[0]]
+        # Combine first row if it's not effectively the same as the first resampled point
+        if not df_resampled.empty and first_row.index[0] != df_resampled.index[0]:
+            df_chart = pd.concat([first_row, df_resampled]).drop_duplicates().sort_index()
+        else:
+            df_chart = df_resampled
+        return df_chart.reset_index()
+
+class AnalyticsCache:
+    """Most recent HistoryAnalytics versions, looked up by content hash or prefix."""
+
+    def __init__(self, max_versions=MAX_VERSIONS):
+        self.max_versions = max_versions
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.stats = {'hit': 0, 'extend': 0, 'full': 0}
+
+    def get(self, df_hist):
+        frame = df_hist.set_index('날짜').sort_index(kind='stable')
+        row_hashes = _row_hashes(frame)
+        version = _digest(row_hashes)
+        with self._lock:
+            if version in self._versions:
+                self.stats['hit'] += 1
+                self._versions[version] = self._versions.pop(version) # Most recent last
+                return self._versions[version]
+            base = next((a for a in reversed(self._versions.values())
+                         if 0 < len(a.row_hashes) <= len(row_hashes)
+                         and list(a.frame.columns) == list(frame.columns)
+                         and np.array_equal(a.row_hashes, row_hashes[:len(a.row_hashes)])), None)
+
+        if base is not None:
+            analytics = base.extended(frame, row_hashes)
+            kind = 'extend'
+        else:
+            analytics = HistoryAnalytics(frame, row_hashes)
+            kind = 'full'
+
+        with self._lock:
+            self.stats[kind] += 1
+            self._versions[version] = analytics
+            while len(self._versions) > self.max_versions:
+                self._versions.pop(next(iter(self._versions)))
+        return analytics
+
+@st.cache_resource
+def _analytics_cache():
+    return AnalyticsCache()
+
+def get_history_analytics(df_hist):
+    """Precomputed analytics for the given '자산기록' frame (must have a '날짜' column)."""
+    return _analytics_cache().get(df_hist)
@@ -1,12 +1,118 @@
+import copy
+import getpass
+import os
+import sys
 import streamlit as st
 import streamlit_authenticator as stauth
 import yaml
 from yaml.loader import SafeLoader
 import time
 
+# Per-user credentials file (bcrypt hashes only), written by:
+#   python -m modules.auth_manager set <username> [--name NAME] [--email EMAIL] [--owner OWNER] [--role admin]
+# Each user either has role 'admin' (every owner's data) or sees only its 'owner'
+# (소유자 / portfolio name); a user with neither sees no data.
+CREDENTIALS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'auth_credentials.yaml')
+
+# Accounts used when there is no credentials file (all share secrets general.password)
+DEFAULT_USERS = {
+    'admin': {'name': 'Admin', 'email': 'admin@example.com', 'role': 'admin'},
+    'park': {'name': '박행자', 'email': 'park@example.com', 'owner': '박행자'},
+}
+ADMIN_ROLE = 'admin'
+
+COOKIE_CONFIG = {
+    'expiry_days': 30, # Persist for 30 days
+    'key': 'asset_dashboard_signature_key',
+    'name': 'asset_dashboard_auth'
+}
+
+@st.cache_resource(show_spinner=False)
+def hash_password(plain_password):
+    """bcrypt hash of a password, computed once per process (bcrypt is deliberately slow)."""
+    return stauth.Hasher.hash(plain_password)
+
+def load_credentials(path=CREDENTIALS_FILE):
+    """
+    {'usernames': {username: {name, email, password}}} from the YAML file, or None
+    if it does not exist. Plain-text passwords are hashed (once) with a warning.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        users = (yaml.load(f, Loader=SafeLoader) or {}).get('usernames', {})
+    for username, info in users.items():
+        if not stauth.Hasher.is_hash(str(info.get('password', ''))):
+            print(f"Auth: plain-text password for '{username}' in {path}; run 'python -m modules.auth_manager set {username}'.")
+            info['password'] = hash_password(str(info.get('password', '')))
+    return {'usernames': users}
+
+@st.cache_resource(show_spinner=False)
+def _cached_credentials(path, mtime, fallback_password):
+    credentials = load_credentials(path) if mtime is not None else None
+    if credentials is None:
+        if fallback_password is None:
+            return None
+        hashed = hash_password(fallback_password)
+        credentials = {'usernames': {u: dict(info, password=hashed) for u, info in DEFAULT_USERS.items()}}
+    return credentials
+
+def get_credentials(fallback_password=None, path=CREDENTIALS_FILE):
+    """
+    Hashed credentials, built once per process (and again only when the file changes):
+    the credentials file when present, otherwise DEFAULT_USERS with fallback_password.
+    Returns a copy, since the authenticator writes login state into it; None if
+    there is neither a file nor a fallback password.
+    """
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    return copy.deepcopy(_cached_credentials(path, mtime, fallback_password))
+
+def get_access(credentials, username):
+    """
+    (is_admin, owner) for a logged-in user, from its credentials entry.
+    Entries without role/owner (e.g. files written before these fields) fall back
+    to DEFAULT_USERS for the same username; anyone else is restricted with owner
+    None, i.e. no data until an owner is assigned.
+    """
+    info = (credentials or {}).get('usernames', {}).get(username) or {}
+    if 'role' not in info and 'owner' not in info:
+        info = DEFAULT_USERS.get(username, {})
+    if info.get('role') == ADMIN_ROLE:
+        return True, None
+    return False, info.get('owner') or None
+
+def build_config(credentials):
+    """Authenticator config dict (credentials + cookie settings)."""
+    return {
+        'credentials': credentials,
+        'cookie': dict(COOKIE_CONFIG),
+        'pre-authorized': {'emails': []}
+    }
+
+def save_user(username, plain_password, name=None, email=None, owner=None, role=None, path=CREDENTIALS_FILE):
+    """Adds/updates one user in the credentials file, storing only the bcrypt hash."""
+    users = (load_credentials(path) or {'usernames': {}})['usernames']
+    info = users.get(username, dict(DEFAULT_USERS.get(username, {})))
+    info['name'] = name or info.get('name', username)
+    info['email'] = email or info.get('email', f"{username}@example.com")
+    if owner:
+        info['owner'] = owner
+    if role:
+        info['role'] = role
+    info['password'] = stauth.Hasher.hash(plain_password)
+    users[username] = info
+    with open(path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump({'usernames': users}, f, allow_unicode=True, sort_keys=True)
+    try:
+        os.chmod(path, 0o600)
+    except OSError:
+        pass
+
 def get_authenticator(config):
     """
     Initializes the Authenticator with 30-day persistence.
+    Built per rerun on purpose: it owns a CookieManager component bound to the
+    current session, so only the (hashed) credentials are cached process-wide.
     """
     # Force 30 days expiry
     cookie_expiry = 30
@@ -67,3 +173,17 @@ def logout_widget(authenticator):
     Renders logout button.
     """
     authenticator.logout("Logout", "sidebar")
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) < 2 or args[0] != 'set':
+        print("Usage: python -m modules.auth_manager set <username> [--name NAME] [--email EMAIL] [--owner OWNER] [--role admin]")
+        sys.exit(1)
+    opts = dict(zip(args[2::2], args[3::2]))
+    password = getpass.getpass(f"Password for {args[1]}: ")
+    if password != getpass.getpass("Repeat: "):
+        print("Passwords do not match.")
+        sys.exit(1)
+    save_user(args[1], password, name=opts.get('--name'), email=opts.get('--email'),
+              owner=opts.get('--owner'), role=opts.get('--role'))
+    print(f"Saved '{args[1]}' to {CREDENTIALS_FILE}")
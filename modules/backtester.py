@@ -0,0 +1,161 @@
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from modules import portfolio_logic
+
+# Rebalancing backtests over daily closes of the TARGET_WEIGHTS universe.
+# All strategies of a sweep are simulated side by side: the day loop is
+# sequential (rebalancing depends on drift) but each step is one array operation
+# over (strategies x assets). Scripts can run chunks of the grid on separate
+# (spawned) processes; the app runs in-process, since forking a Streamlit server
+# copies its threads and locks.
+
+# Calendar periods in trading days (0 = check every day)
+PERIODS = {'None': 0, 'Monthly': 21, 'Quarterly': 63, 'Annual': 252}
+DEFAULT_BANDS = [0.0, 0.02, 0.05, 0.10, 0.20]
+COST_RATE = 0.0025  # Fee + slippage per traded amount
+TRADING_DAYS = 252
+
+def universe_returns(closes, targets=None):
+    """
+    Daily simple returns for the tickers in targets (TARGET_WEIGHTS by default),
+    plus the target weight vector. The 'Cash' target (and any ticker without prices)
+    is held as a zero-return cash sleeve, so weights still sum to the target total.
+    A ticker whose history starts later has zero returns until its first close
+    (held as cash), instead of cutting every ticker to the shortest history.
+    Returns (returns DataFrame, weights ndarray, cash weight).
+    """
+    targets = targets or portfolio_logic.TARGET_WEIGHTS
+    tickers = [t for t in targets if t in closes.columns]
+    prices = closes[tickers].sort_index().ffill().dropna(how='all')
+    returns = prices.pct_change(fill_method=None).iloc[1:].fillna(0.0)
+    weights = np.array([targets[t] for t in tickers], dtype='float64')
+    cash_weight = max(0.0, 1.0 - weights.sum())
+    return returns, weights, cash_weight
+
+def late_starts(closes, targets=None):
+    """{ticker: first close date} for target tickers whose prices start after the first date in closes."""
+    targets = targets or portfolio_logic.TARGET_WEIGHTS
+    prices = closes[[t for t in targets if t in closes.columns]].sort_index()
+    first = prices.apply(lambda s: s.first_valid_index())
+    start = prices.dropna(how='all').index.min()
+    return {t: d for t, d in first.items() if d is not None and d > start}
+
+def simulate(returns, weights, cash_weight, bands, periods, cost_rate=COST_RATE):
+    """
+    Simulates len(bands) strategies at once. Strategy s checks for rebalancing on
+    every periods[s]-th day (every day when 0) and rebalances back to target when
+    the largest absolute weight drift exceeds bands[s] (band 0 + period = pure
+    calendar, period 0 + band = pure band, both = threshold-plus-calendar).
+    Costs are cost_rate * traded amount, taken from the portfolio.
+    Returns (equity (T+1, S), traded (S,) as a sum of traded fractions of equity,
+    rebalance counts (S,)).
+    """
+    r = np.asarray(returns, dtype='float64')
+    bands = np.asarray(bands, dtype='float64')[:, None]
+    periods = np.asarray(periods, dtype='int64')
+    n_days, n_assets = r.shape
+    n_strat = len(periods)
+
+    target = np.append(weights, cash_weight)           # cash sleeve is the last column
+    growth = np.hstack([1.0 + r, np.ones((n_days, 1))])
+    holdings = np.tile(target, (n_strat, 1))            # start fully rebalanced, equity 1
+    equity = np.empty((n_days + 1, n_strat))
+    equity[0] = 1.0
+    traded = np.zeros(n_strat)
+    rebalances = np.zeros(n_strat, dtype='int64')
+
+    for t in range(n_days):
+        holdings *= growth[t]
+        total = holdings.sum(axis=1, keepdims=True)
+        drift = np.abs(holdings / total - target).max(axis=1, keepdims=True)
+        check = (periods == 0) | ((t + 1) % np.maximum(periods, 1) == 0)
+        trigger = check[:, None] & (drift > bands)
+        if trigger.any():
+            trade = np.abs(target * total - holdings).sum(axis=1, keepdims=True)
+            cost = trade * cost_rate
+            rebalanced = target * (total - cost)
+            holdings = np.where(trigger, rebalanced, holdings)
+            hit = trigger[:, 0]
+            traded[hit] += (trade[hit, 0] / 2) / total[hit, 0]
+            rebalances += hit
+        equity[t + 1] = holdings.sum(axis=1)
+
+    return equity, traded, rebalances
+
+def metrics(equity, traded, rebalances, years):
+    """CAGR (portfolio_logic.calculate_cagr), MDD, annual turnover per strategy column."""
+    peak = np.maximum.accumulate(equity, axis=0)
+    mdd = (equity / peak - 1).min(axis=0)
+    cagr = np.array([portfolio_logic.calculate_cagr(equity[0, s], equity[-1, s], years)
+                     for s in range(equity.shape[1])])
+    return pd.DataFrame({
+        'CAGR': cagr,
+        'MDD': mdd,
+        'Turnover': traded / years if years > 0 else traded,
+        'Rebalances': rebalances,
+        'FinalValue': equity[-1],
+    })
+
+def _run_chunk(args):
+    returns, weights, cash_weight, bands, periods, cost_rate = args
+    return simulate(returns, weights, cash_weight, bands, periods, cost_rate)
+
+def sweep(returns, weights, cash_weight, bands=DEFAULT_BANDS, periods=PERIODS,
+          cost_rate=COST_RATE, workers=1):
+    """
+    Backtests every (band, period) combination. periods: {label: trading days}.
+    workers=1 (default) runs in-process; more (None = os.cpu_count()) split the
+    grid into one chunk per 'spawn' worker process, for use outside Streamlit.
+    Returns one metrics row per combination.
+    """
+    grid = list(itertools.product(bands, periods.items()))
+    band_arr = np.array([b for b, _ in grid], dtype='float64')
+    period_arr = np.array([p for _, (_, p) in grid], dtype='int64')
+    r = np.ascontiguousarray(returns, dtype='float64')
+    workers = min(workers or os.cpu_count() or 1, len(grid))
+
+    chunks = [idx for idx in np.array_split(np.arange(len(grid)), workers) if len(idx)]
+    jobs = [(r, weights, cash_weight, band_arr[idx], period_arr[idx], cost_rate) for idx in chunks]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            results = list(pool.map(_run_chunk, jobs))
+    else:
+        results = [_run_chunk(job) for job in jobs]
+
+    equity = np.hstack([res[0] for res in results])
+    traded = np.concatenate([res[1] for res in results])
+    rebalances = np.concatenate([res[2] for res in results])
+
+    years = len(r) / TRADING_DAYS
+    df = metrics(equity, traded, rebalances, years)
+    df.insert(0, 'Band', band_arr)
+    df.insert(1, 'Calendar', [label for _, (label, _) in grid])
+    df['Strategy'] = np.select(
+        [(band_arr > 0) & (period_arr > 0), band_arr > 0, period_arr > 0],
+        ['Threshold+Calendar', 'Band', 'Calendar'],
+        default='Daily',
+    )
+    return df
+
+def run_backtest(store, years=5, bands=DEFAULT_BANDS, periods=PERIODS,
+                 cost_rate=COST_RATE, workers=1, targets=None):
+    """
+    Loads closes for the target universe from the price store (only missing dates
+    are fetched) and sweeps the grid. Returns (results, failed_tickers, late),
+    late being {ticker: first close date} for tickers held as cash until then.
+    """
+    targets = targets or portfolio_logic.TARGET_WEIGHTS
+    end = date.today()
+    start = end - timedelta(days=int(365.25 * years))
+    tickers = [t for t in targets if t != 'Cash']
+    closes, failed = store.get_closes(tickers, start, end)
+    if closes.empty:
+        return pd.DataFrame(), failed, {}
+    returns, weights, cash_weight = universe_returns(closes, targets)
+    results = sweep(returns, weights, cash_weight, bands, periods, cost_rate, workers)
+    return results, failed, late_starts(closes, targets)
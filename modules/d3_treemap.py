@@ -1,10 +1,98 @@
+import hashlib
 import json
+import os
+import numpy as np
 import pandas as pd
 import streamlit as st
+import streamlit.components.v1 as components
+from modules import treemap_style, profiler
+
+# Finviz-style D3 treemaps for the Asset Details page.
+# The HTML/JS lives in one static file (d3_treemap_frontend/index.html) served by
+# Streamlit as a component, so a rerun only sends each portfolio's JSON payload.
+# Payloads for all portfolios are built in one pass and cached by content hash.
+
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'd3_treemap_frontend')
+DATA_MARKER = '<!--__TREEMAP_DATA__-->'
+
+# Payload field -> pivot column (numeric, 0 when missing)
+FIELDS = {
+    'value': '평가금액',
+    'rate': 'ReturnRate',
+    'price': '현재가',
+    'profit': '총평가손익',
+    'invested': '매입금액',
+    'qty': '보유주수',
+    'avg_price': '평단가',
+    'dividend': '배당수익',
+    'realized': '확정손익',
+}
+
+_treemap_component = components.declare_component('d3_treemap', path=FRONTEND_DIR)
+
+@st.cache_resource
+def _template():
+    with open(os.path.join(FRONTEND_DIR, 'index.html'), encoding='utf-8') as f:
+        return f.read()
+
+def _children(df_pivot):
+    """Leaf records for every pivot row; fields are converted column-wise."""
+    n = len(df_pivot)
+    columns = {'name': df_pivot['종목'].astype(str).tolist()}
+    for key, col in FIELDS.items():
+        if col in df_pivot.columns:
+            values = pd.to_numeric(df_pivot[col], errors='coerce').to_numpy(dtype='float64')
+            columns[key] = np.nan_to_num(values).tolist()
+        else:
+            columns[key] = [0.0] * n
+    columns['symbol'] = df_pivot['CurSymbol'].tolist() if 'CurSymbol' in df_pivot.columns else ['₩'] * n
+    # Precomputed tile color / rate label (the template falls back to its own scale)
+    if 'D3Color' in df_pivot.columns:
+        columns['color'] = df_pivot['D3Color'].tolist()
+        columns['label'] = df_pivot['RateLabel'].tolist()
+    else:
+        columns['color'] = treemap_style.rate_colors(columns['rate'], 'd3').tolist()
+        columns['label'] = treemap_style.rate_labels(columns['rate']).tolist()
+    keys = list(columns)
+    return [dict(zip(keys, row)) for row in zip(*columns.values())]
+
+def _payload(name, children):
+    return json.dumps({'name': str(name), 'children': children})
+
+def build_payloads(df_pivot, port_col='포트폴리오'):
+    """
+    JSON payload ({"name": port, "children": [...]}) per portfolio of the
+    Asset Details pivot. Records are built once for all portfolios, then split
+    by row positions. Returns {portfolio: json string}.
+    """
+    if df_pivot.empty:
+        return {}
+    children = _children(df_pivot)
+    return {port: _payload(port, [children[i] for i in rows])
+            for port, rows in df_pivot.groupby(port_col, sort=False).indices.items()}
+
+@st.cache_resource(max_entries=8)
+def _cached_payloads(version, _df_pivot, port_col):
+    return build_payloads(_df_pivot, port_col)
+
+@profiler.timed()
+def get_payloads(df_pivot, port_col='포트폴리오'):
+    """build_payloads, cached per content hash of the pivot."""
+    version = hashlib.md5(pd.util.hash_pandas_object(df_pivot, index=True).to_numpy().tobytes()).hexdigest()
+    return _cached_payloads(version, df_pivot, port_col)
+
+@profiler.timed()
+def render_treemap(payload, height=520, key=None):
+    """
+    Draws one treemap from a build_payloads JSON string (static template, data only).
+    height is the iframe height, as st.components.v1.html used; the chart is 20px shorter.
+    """
+    return _treemap_component(data=payload, height=height, key=key, default=None)
 
 def generate_d3_treemap_v6(df_pivot, port_name="Portfolio"):
     """
-    Generates a D3.js Treemap HTML string for a specific portfolio.
+    Generates a standalone D3.js Treemap HTML string for a specific portfolio
+    (same template as the component, with the data inlined).
     v6: Selective Currency Symbols (Prices in $, Values in ₩).
     
     Args:
@@ -18,247 +106,5 @@ def generate_d3_treemap_v6(df_pivot, port_name="Portfolio"):
     if df_pivot.empty:
         return "<div>No Data</div>"
 
-    # 1. Prepare Data for D3 (Hierarchical JSON)
-    children = []
-    for _, row in df_pivot.iterrows():
-        rate = row.get('ReturnRate', 0)
-        value = row.get('평가금액', 0)
-        
-        child = {
-            "name": str(row['종목']),
-            "value": float(value),
-            "rate": float(rate),
-            "price": float(row.get('현재가', 0)),
-            "profit": float(row.get('총평가손익', 0)),
-            "invested": float(row.get('매입금액', 0)),
-            "qty": float(row.get('보유주수', 0)),
-            "avg_price": float(row.get('평단가', 0)),
-            "dividend": float(row.get('배당수익', 0)),
-            "realized": float(row.get('확정손익', 0)),
-            "symbol": row.get('CurSymbol', '₩') 
-        }
-        children.append(child)
-        
-    data_tree = {
-        "name": port_name,
-        "children": children
-    }
-    
-    json_data = json.dumps(data_tree)
-
-    # 2. HTML/JS Template
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <style>
-            body {{ margin: 0; padding: 0; overflow: hidden; background-color: transparent; font-family: 'SUIT', sans-serif; }}
-            #chart {{ width: 100vw; height: 500px; }}
-            .node {{ box-sizing: border-box; position: absolute; overflow: hidden; border: 1px solid #1e1e1e; cursor: default; }}
-            .node-label {{ 
-                position: absolute; 
-                fill: white; 
-                text-anchor: middle; 
-                dominant-baseline: central; 
-                pointer-events: none;
-                font-family: 'SUIT', sans-serif;
-                font-weight: 700;
-                text-shadow: 0px 0px 3px rgba(0,0,0,0.8);
-            }}
-            .node-sub {{ 
-                position: absolute; 
-                fill: white; 
-                text-anchor: middle; 
-                dominant-baseline: central; 
-                pointer-events: none;
-                font-family: 'SUIT', sans-serif;
-                font-weight: 400;
-                opacity: 0.9;
-                text-shadow: 0px 0px 2px rgba(0,0,0,0.8);
-            }}
-            /* Tooltip */
-            .tooltip {{
-                position: absolute;
-                text-align: left;
-                padding: 10px;
-                background: rgba(30, 30, 30, 0.95);
-                color: white;
-                border: 1px solid #555;
-                border-radius: 4px;
-                pointer-events: none;
-                z-index: 10;
-                opacity: 0;
-                transition: opacity 0.15s;
-                box-shadow: 0 4px 8px rgba(0,0,0,0.4);
-            }}
-        </style>
-        <script src="https://d3js.org/d3.v7.min.js"></script>
-    </head>
-    <body>
-        <div id="chart"></div>
-        <div class="tooltip" id="tooltip"></div>
-
-        <script>
-            const data = {json_data};
-            
-            const colorScale = d3.scaleLinear()
-                .domain([-30, 0, 30])
-                .range(["#f63538", "#303030", "#30cc5a"])
-                .clamp(true);
-
-            function drawChart() {{
-                const container = document.getElementById('chart');
-                const width = container.clientWidth;
-                const height = container.clientHeight;
-
-                container.innerHTML = ''; 
-
-                const root = d3.hierarchy(data)
-                    .sum(d => d.value)
-                    .sort((a, b) => b.value - a.value);
-
-                d3.treemap()
-                    .size([width, height])
-                    .paddingInner(1)
-                    .paddingOuter(0)
-                    .round(true)
-                    (root);
-
-                const svg = d3.select("#chart").append("svg")
-                    .attr("width", width)
-                    .attr("height", height);
-
-                const nodes = svg.selectAll("g")
-                    .data(root.leaves())
-                    .enter().append("g")
-                    .attr("transform", d => `translate(${{d.x0}},${{d.y0}})`);
-
-                nodes.append("rect")
-                    .attr("width", d => Math.max(0, d.x1 - d.x0))
-                    .attr("height", d => Math.max(0, d.y1 - d.y0))
-                    .attr("fill", d => colorScale(d.data.rate))
-                    // --- MOUSE OVER: Dynamic Content Sizing ---
-                    .on("mouseover", function(event, d) {{
-                        const tt = d3.select("#tooltip");
-                        tt.style("opacity", 1);
-                        
-                        // Check Screen Width for Compact Mode
-                        const isSmall = window.innerWidth < 600;
-                        
-                        // Define Styles based on mode
-                        const sTitle = isSmall ? 'font-size:13px; font-weight:bold' : 'font-size:16px; font-weight:bold';
-                        const sSub = isSmall ? 'font-size:10px; color:#cccccc' : 'font-size:11px; color:#cccccc';
-                        const sLabel = isSmall ? 'font-size:11px; color:#cccccc' : 'color:#aaaaaa';
-                        const sVal = isSmall ? 'font-size:12px' : 'font-size:15px';
-                        const sPct = isSmall ? 'font-size:11px' : 'font-size:13px';
-                        const sFooter = isSmall ? 'font-size:9px; color:#888888' : 'font-size:10px; color:#888888';
-                        
-                        const pad = isSmall ? '4px' : '10px';
-                        tt.style("padding", pad);
-
-                        // CURRENCY LOGIC: v6 Update
-                        // Values in KRW (Inventory converted) -> Hardcode '₩'
-                        // Prices in Native Currency -> Use d.data.symbol ($ or ₩)
-                        
-                        tt.html(`
-                            <span style='${{sTitle}}'>${{d.data.name}}</span><br>
-                            <span style='${{sSub}}'>${{d.data.qty.toLocaleString()}}주 보유</span><br><br>
-                            
-                            <span style='${{sLabel}}'>평가금액:</span> <b style='${{sVal}}'>₩${{d.data.value.toLocaleString()}}</b> 
-                            <span style='${{sPct}}'>(${{d.data.rate > 0 ? '+' : ''}}${{d.data.rate.toFixed(2)}}%)</span><br>
-                            
-                            <span style='${{sLabel}}'>매입금액:</span> <b>₩${{d.data.invested.toLocaleString()}}</b><br>
-                            <span style='${{sLabel}}'>총 손 익:</span> <b>₩${{d.data.profit.toLocaleString()}}</b><br><br>
-                            
-                            <span style='${{sLabel}}'>현 재 가:</span> ${{d.data.symbol}}${{d.data.price.toLocaleString()}}<br>
-                            <span style='${{sLabel}}'>평 단 가:</span> ${{d.data.symbol}}${{d.data.avg_price.toLocaleString()}}<br><br>
-                            
-                            <span style='${{sFooter}}'>배당금 ₩${{d.data.dividend.toLocaleString()}} | 실현손익 ₩${{d.data.realized.toLocaleString()}}</span>
-                        `);
-                    }})
-                    .on("mousemove", function(event) {{
-                        const tt = d3.select("#tooltip");
-                        const tooltipNode = tt.node();
-                        const tooltipWidth = tooltipNode.offsetWidth || 150; 
-                        const tooltipHeight = tooltipNode.offsetHeight || 200;
-                        
-                        const windowWidth = window.innerWidth;
-                        const windowHeight = window.innerHeight;
-                        
-                        let leftPos = event.pageX + 15;
-                        let topPos = event.pageY + 15;
-                        
-                        if (event.clientX + tooltipWidth + 30 > windowWidth) {{
-                            leftPos = event.pageX - tooltipWidth - 20;
-                        }}
-                        
-                        if (event.clientY + tooltipHeight + 30 > windowHeight) {{
-                             topPos = event.pageY - tooltipHeight - 10;
-                        }}
-                        
-                        tt.style("left", leftPos + "px")
-                          .style("top", topPos + "px");
-                    }})
-                    .on("mouseout", function() {{
-                        d3.select("#tooltip").style("opacity", 0);
-                    }});
-
-                nodes.each(function(d) {{
-                    const g = d3.select(this);
-                    const w = d.x1 - d.x0;
-                    const h = d.y1 - d.y0;
-                    
-                    if (w < 20 || h < 20) return; 
-
-                    const tickerText = g.append("text")
-                        .attr("class", "node-label")
-                        .text(d.data.name)
-                        .attr("x", w / 2)
-                        .attr("y", h / 2); 
-
-                    let fontSize = Math.min(w / 3, h / 3, 60);
-                    if (fontSize < 12) fontSize = 12;
-                    tickerText.style("font-size", fontSize + "px");
-
-                    let textWidth = tickerText.node().getComputedTextLength();
-                    const padding = 10;
-                    const minFontSize = 10;
-
-                    while (textWidth > w - padding && fontSize > minFontSize) {{
-                        fontSize -= 1; 
-                        tickerText.style("font-size", fontSize + "px");
-                        textWidth = tickerText.node().getComputedTextLength();
-                    }}
-                    
-                    const hasSub = fontSize >= 14; 
-                    const yOffset = hasSub ? -fontSize * 0.2 : 0;
-                    tickerText.attr("y", (h / 2) + yOffset);
-
-                    if (hasSub) {{
-                        const rateStr = d.data.rate > 0 ? "+" + d.data.rate.toFixed(2) + "%" : d.data.rate.toFixed(2) + "%";
-                        let subSize = fontSize * 0.6;
-                        const subText = g.append("text")
-                            .attr("class", "node-sub")
-                            .attr("x", w / 2)
-                            .attr("y", (h / 2) + (fontSize * 0.8) + yOffset)
-                            .text(rateStr)
-                            .style("font-size", subSize + "px");
-                        
-                        let subWidth = subText.node().getComputedTextLength();
-                        while (subWidth > w - padding && subSize > 8) {{
-                             subSize -= 1;
-                             subText.style("font-size", subSize + "px");
-                             subWidth = subText.node().getComputedTextLength();
-                        }}
-                    }}
-                }});
-            }}
-
-            drawChart();
-            window.addEventListener('resize', drawChart);
-        </script>
-    </body>
-    </html>
-    """
-    return html_content
+    json_data = _payload(port_name, _children(df_pivot))
+    return _template().replace(DATA_MARKER, f"<script>window.TREEMAP_DATA = {json_data};</script>", 1)
@@ -0,0 +1,177 @@
+import pandas as pd
+from sqlalchemy import inspect, text
+from modules import database, data_loader, migration, profiler
+
+# Keys served from the local DB; everything else still comes from the sheet cache.
+DB_KEYS = ['transactions', 'account_master', 'asset_master', 'inventory']
+
+def _read_sql(sql, params=None):
+    with database.engine.connect() as conn:
+        return pd.read_sql(text(sql), conn, params=params or {})
+
+def _owner_filter(owner, column='owner'):
+    """(WHERE clause, params) restricting rows to one owner; empty when owner is None."""
+    if owner is None:
+        return "", {}
+    return f"WHERE {column} = :owner", {'owner': owner}
+
+def _text_column(column, alias):
+    """Text column with the sync's stand-ins for a blank cell ('nan', 'None', '') read back as NULL."""
+    return f"NULLIF(NULLIF(NULLIF({column}, 'nan'), 'None'), '') AS \"{alias}\""
+
+def get_transactions(owner=None):
+    """
+    Returns transaction_log in the '00_거래일지' sheet shape (Korean headers),
+    in sheet order (initial balance rows first). owner: only that owner's rows.
+    Blank text cells come back as NULL, like the sheet frame. What the mirror
+    keeps differs from the raw sheet by design (see migration._prepare_transactions):
+    only the nine ledger columns, dates as 'YYYY-MM-DD', no rows without a
+    parseable date or numbers, and identical rows (same sync hash) once.
+    """
+    where, params = _owner_filter(owner)
+    return _read_sql(f"""
+        SELECT
+            date AS "날짜",
+            {_text_column('owner', '소유자')},
+            {_text_column('account_name', '계좌')},
+            {_text_column('asset_name', '종목')},
+            {_text_column('type', '거래구분')},
+            {_text_column('currency', '통화')},
+            amount AS "거래금액",
+            qty AS "수량",
+            {_text_column('note', '비고')}
+        FROM transaction_log
+        {where}
+        ORDER BY source_row_index, id
+    """, params)
+
+def get_account_master(owner=None):
+    """Returns account_master in the '01_계좌마스터' sheet shape."""
+    where, params = _owner_filter(owner)
+    return _read_sql(f"""
+        SELECT
+            account_number AS "계좌번호",
+            owner AS "소유자",
+            account_name AS "계좌명",
+            broker AS "증권사",
+            type AS "포트폴리오 구분"
+        FROM account_master
+        {where}
+        ORDER BY owner, account_name
+    """, params)
+
+def get_asset_master(owner=None):
+    """Returns asset_master in the '02_종목마스터' sheet shape (shared by all owners)."""
+    return _read_sql("""
+        SELECT
+            asset_name AS "종목명",
+            ticker AS "티커",
+            currency AS "통화"
+        FROM asset_master
+        ORDER BY asset_name
+    """)
+
+def get_inventory(owner=None):
+    """
+    Returns the '자산종합' mirror table exactly as synced (same columns as the sheet).
+    Empty if the mirror has not been created yet, or if owner is given and the
+    mirror has no '소유자' column.
+    """
+    inspector = inspect(database.engine)
+    if not inspector.has_table(migration.INVENTORY_TABLE):
+        return pd.DataFrame()
+    where, params = _owner_filter(owner, '"소유자"')
+    if owner is not None and '소유자' not in {c['name'] for c in inspector.get_columns(migration.INVENTORY_TABLE)}:
+        return pd.DataFrame()
+    return _read_sql(f'SELECT * FROM "{migration.INVENTORY_TABLE}" {where}', params)
+
+def scope_sheet_frame(key, df, owner):
+    """
+    Restricts a sheet-cache frame to one owner (the sheet cache itself is shared):
+    history keeps 날짜/요일 and the owner's value/index columns; temp_history keeps
+    the owner's portfolio row; row frames keep rows whose '소유자' is the owner.
+    Frames that cannot be scoped come back empty rather than unfiltered.
+    """
+    if owner is None or df is None or df.empty:
+        return df
+    if key == 'history':
+        keep = [c for c in df.columns if c in ('날짜', '요일', owner, f"{owner}_idx")]
+        return df[keep]
+    if key == 'temp_history':
+        port_col = next((c for c in df.columns if '포트폴리오' in c), None)
+        return df[df[port_col] == owner] if port_col else df.iloc[0:0]
+    if key in ('transactions', 'inventory', 'account_master'):
+        return df[df['소유자'] == owner] if '소유자' in df.columns else df.iloc[0:0]
+    return df
+
+_GETTERS = {
+    'transactions': get_transactions,
+    'account_master': get_account_master,
+    'asset_master': get_asset_master,
+    'inventory': get_inventory,
+}
+
+def has_synced():
+    """True once a sync has saved a transaction watermark (the DB mirror is authoritative)."""
+    return not _read_sql(
+        "SELECT 1 FROM sync_metadata WHERE key = :key LIMIT 1",
+        {'key': f"watermark:{migration.TXN_WORKSHEET}"},
+    ).empty
+
+@profiler.timed()
+def load_dashboard_data(owner=None):
+    """
+    Same dict as data_loader.load_data(), but transactions, masters and inventory
+    are read from the local SQLite mirror (kept current by sync_manager.auto_sync).
+    Only the sheet-only frames (history, cagr, beta_plan, temp_history) come from
+    the sheet cache. For an unrestricted session, a table that cannot be read, or
+    is empty on a never-synced DB (first run), falls back to its sheet frame.
+    owner: restricted session. DB reads filter in SQL, sheet frames are projected
+    with scope_sheet_frame, so the returned dict holds no other owner's rows.
+    Their DB-backed frames never fall back; an empty result stays empty.
+    """
+    sheet_keys = [spec[0] for spec in data_loader.SHEET_SPECS.values()
+                  if spec[0] not in DB_KEYS and spec[0] != 'initial_balance']
+    data = data_loader.load_data(keys=sheet_keys)
+    if data is None:
+        return None
+
+    missing, empty = [], []
+    for key, getter in _GETTERS.items():
+        try:
+            df = getter(owner)
+        except Exception as e:
+            print(f"DB read failed ({key}): {e}")
+            missing.append(key)
+            continue
+        if df.empty:
+            empty.append(key)
+        else:
+            data[key] = df
+
+    if empty and owner is None:
+        try:
+            synced = has_synced()
+        except Exception as e:
+            print(f"DB read failed (sync_metadata): {e}")
+            synced = False
+        if not synced:
+            missing += empty
+            empty = []
+    # Restricted sessions never read the unscoped sheets for DB-backed frames
+    if owner is not None:
+        empty += missing
+        missing = []
+    data.update({k: pd.DataFrame() for k in empty})
+
+    if missing:
+        fallback = data_loader.load_data(keys=missing)
+        if fallback is None:
+            return None
+        data.update({k: fallback.get(k, pd.DataFrame()) for k in missing})
+
+    if owner is not None:
+        for key in sheet_keys:
+            if key in data:
+                data[key] = scope_sheet_frame(key, data[key], owner)
+    return data
@@ -1,7 +1,7 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from datetime import datetime
+from datetime import date, datetime
 from streamlit_gsheets import GSheetsConnection
 
 
@@ -52,7 +52,11 @@ import random
 from functools import wraps
 
 # Rate Limit Retry Decorator
-def retry_with_backoff(retries=3, backoff_in_seconds=1):
+def _is_rate_limited(e):
+    return "429" in str(e) or "RESOURCE_EXHAUSTED" in str(e)
+
+def retry_with_backoff(retries=3, backoff_in_seconds=1, retry_if=_is_rate_limited):
+    """Retries on exceptions accepted by retry_if (rate limits by default), with exponential backoff + jitter."""
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
@@ -61,7 +65,7 @@ def retry_with_backoff(retries=3, backoff_in_seconds=1):
                 try:
                     return func(*args, **kwargs)
                 except Exception as e:
-                    if "429" in str(e) or "RESOURCE_EXHAUSTED" in str(e):
+                    if retry_if(e):
                         if x == retries:
                             raise e
                         sleep = (backoff_in_seconds * 2 ** x + 
@@ -73,92 +77,253 @@ def retry_with_backoff(retries=3, backoff_in_seconds=1):
         return wrapper
     return decorator
 
-@st.cache_data(ttl=600)
-def load_data():
+# --- Per-Worksheet Cache ---
+import threading
+from modules import snapshot_store, profiler
+
+TXN_SHEET = "00_거래일지"
+
+# worksheet -> (result key, ttl seconds, header row, cleaner, optional)
+# Optional sheets fall back to an empty DataFrame instead of failing load_data.
+SHEET_SPECS = {
+    "자산기록": ("history", 600, 1, lambda df: _clean_history_data(df), False),
+    "수익률": ("cagr", 600, 0, None, False),
+    "자산종합": ("inventory", 600, 0, lambda df: _clean_numeric_cols(df, ['Qty', 'Price', 'EvalValue', '수량', '평단가', '평가금액', '배당수익', '확정손익']), False),
+    "베타포트폴리오": ("beta_plan", 600, 0, lambda df: _clean_numeric_cols(df, ['CurrentWeight', 'TargetWeight', '현재비중', '목표비중']), False),
+    TXN_SHEET: ("transactions", 600, 0, lambda df: _clean_numeric_cols(df, ['Amount', 'Qty', '수량', '금액']), False),
+    "01_계좌마스터": ("account_master", 600, 0, None, False),
+    "02_종목마스터": ("asset_master", 600, 0, None, True),
+    "자산기록_TEMP": ("temp_history", 60, 0, lambda df: _clean_numeric_cols(df, ['투자원금', '평가금액']), True),
+    "2025년9월_자산종합": ("initial_balance", 86400, 0, lambda df: _clean_initial_balance(df), True),
+}
+
+class SheetCache:
     """
-    Fetches data from multiple worksheets in the '★온가족 자산 정리' Google Sheet in parallel.
-    Returns a dictionary of DataFrames.
+    Process-wide cache of cleaned worksheet frames, one entry per sheet name.
+    Each sheet expires on its own TTL and can be invalidated on its own,
+    so a write to one sheet does not throw away its siblings.
     """
-    try:
-        conn = st.connection("gsheets", type=GSheetsConnection)
-        
-        # Capture the current script context
-        ctx = get_script_run_ctx()
-
-        @retry_with_backoff(retries=3)
-        def _fetch(worksheet, ttl, header=0):
-            # Attach the context to this thread
-            if ctx:
-                add_script_run_ctx(threading.current_thread(), ctx)
-            return conn.read(worksheet=worksheet, ttl=ttl, header=header)
-
-        # Use ThreadPoolExecutor
-        import threading 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor: # Limit workers to reduce burst
-            # Submit all tasks
-            f_history = executor.submit(_fetch, "자산기록", "10m", 1)
-            f_cagr = executor.submit(_fetch, "수익률", "10m", 0)
-            f_inventory = executor.submit(_fetch, "자산종합", "10m", 0)
-            f_beta = executor.submit(_fetch, "베타포트폴리오", "10m", 0)
-            f_txn = executor.submit(_fetch, "00_거래일지", "10m", 0)
-            f_master = executor.submit(_fetch, "01_계좌마스터", "10m", 0)
-            f_asset_master = executor.submit(_fetch, "02_종목마스터", "10m", 0)
-            f_temp = executor.submit(_fetch, "자산기록_TEMP", "0", 0)
-            f_initial_balance = executor.submit(_fetch, "2025년9월_자산종합", "0", 0)
-
-            # Wait for results & Process
-            # 1. History
-            df_history = _clean_history_data(f_history.result())
-
-            # 2. CAGR
-            df_cagr = f_cagr.result()
-
-            # 3. Inventory
-            df_inventory = _clean_numeric_cols(f_inventory.result(), ['Qty', 'Price', 'EvalValue', '수량', '평단가', '평가금액', '배당수익', '확정손익'])
-
-            # 4. Beta Plan
-            df_beta = _clean_numeric_cols(f_beta.result(), ['CurrentWeight', 'TargetWeight', '현재비중', '목표비중'])
-
-            # 5. Transaction Log
-            df_txn = _clean_numeric_cols(f_txn.result(), ['Amount', 'Qty', '수량', '금액'])
-
-            # 6. Masters
-            df_master = f_master.result()
-            try:
-                df_asset_master = f_asset_master.result()
-            except Exception:
-                # If sheet doesn't exist or error, return empty to avoid crash
-                df_asset_master = pd.DataFrame()
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {} # worksheet -> (df, fetched_at)
+        self._stats = {}   # worksheet -> {'hits', 'misses', 'snapshots', 'last', 'fetch_ms'}
+        self._refreshing = set()
+
+    def _stat(self, worksheet):
+        return self._stats.setdefault(worksheet, {'hits': 0, 'misses': 0, 'snapshots': 0, 'last': None, 'fetch_ms': None})
+
+    def seen(self, worksheet):
+        """True once the sheet has been loaded in this process (network or snapshot)."""
+        with self._lock:
+            stat = self._stats.get(worksheet)
+            return bool(stat and (stat['misses'] or stat['snapshots']))
+
+    def start_refresh(self, worksheet):
+        """Claims a background refresh slot; False if one is already running."""
+        with self._lock:
+            if worksheet in self._refreshing:
+                return False
+            self._refreshing.add(worksheet)
+            return True
+
+    def end_refresh(self, worksheet):
+        with self._lock:
+            self._refreshing.discard(worksheet)
+
+    def get(self, worksheet, ttl):
+        """Returns the cached frame if younger than ttl seconds (counts a hit), else None."""
+        with self._lock:
+            entry = self._entries.get(worksheet)
+            if entry is not None and time.time() - entry[1] < ttl:
+                stat = self._stat(worksheet)
+                stat['hits'] += 1
+                stat['last'] = 'hit'
+                return entry[0]
+            return None
+
+    def put(self, worksheet, df, fetch_ms=None, source='network'):
+        """Stores a fetched frame (counts a miss) or a warm-start snapshot (source='snapshot')."""
+        with self._lock:
+            self._entries[worksheet] = (df, time.time())
+            stat = self._stat(worksheet)
+            if source == 'snapshot':
+                stat['snapshots'] += 1
+                stat['last'] = 'snapshot'
+            else:
+                stat['misses'] += 1
+                stat['last'] = 'miss'
+                stat['fetch_ms'] = fetch_ms
+
+    def invalidate(self, worksheet):
+        with self._lock:
+            self._entries.pop(worksheet, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Per-sheet hit/miss/age stats as a DataFrame.
+        'last' is what the most recent lookup did ('hit', 'miss' or 'snapshot').
+        """
+        now = time.time()
+        rows = []
+        with self._lock:
+            for worksheet, spec in SHEET_SPECS.items():
+                stat = self._stat(worksheet)
+                entry = self._entries.get(worksheet)
+                rows.append({
+                    'sheet': worksheet,
+                    'ttl_s': spec[1],
+                    'age_s': round(now - entry[1], 1) if entry else None,
+                    'hits': stat['hits'],
+                    'misses': stat['misses'],
+                    'snapshots': stat['snapshots'],
+                    'last': stat['last'],
+                    'fetch_ms': stat['fetch_ms'],
+                    'refreshing': worksheet in self._refreshing,
+                })
+        return pd.DataFrame(rows)
+
+@st.cache_resource
+def _sheet_cache():
+    return SheetCache()
+
+def invalidate_sheet(worksheet):
+    """Drops a single worksheet from the cache (e.g. after writing to it)."""
+    _sheet_cache().invalidate(worksheet)
+
+def clear_sheet_cache():
+    """Drops every cached worksheet."""
+    _sheet_cache().clear()
+
+def get_cache_stats():
+    """Returns per-sheet cache stats (hits, misses, age, ttl, last fetch time)."""
+    return _sheet_cache().stats()
 
-            # 7. Temp History
+@retry_with_backoff(retries=3)
+def _fetch_sheet(conn, worksheet, ctx=None):
+    """
+    Reads and cleans one worksheet. Returns (df, fetch_ms).
+    """
+    # Attach the context to this thread
+    if ctx:
+        add_script_run_ctx(threading.current_thread(), ctx)
+    _, _, header, cleaner, _ = SHEET_SPECS[worksheet]
+    start = time.perf_counter()
+    # ttl=0: expiry is handled by SheetCache, not the connection's own cache
+    df = conn.read(worksheet=worksheet, ttl=0, header=header)
+    if cleaner is not None:
+        df = cleaner(df)
+    return df, (time.perf_counter() - start) * 1000
+
+def _refresh_in_background(conn, worksheets):
+    """
+    Refetches worksheets served from a snapshot, on a daemon thread.
+    Fresh frames replace the cache entry and the snapshot; the next rerun picks them up.
+    """
+    cache = _sheet_cache()
+    worksheets = [ws for ws in worksheets if cache.start_refresh(ws)]
+    if not worksheets:
+        return
+
+    def _run():
+        for ws in worksheets:
             try:
-                df_temp_history = f_temp.result()
-                df_temp_history = _clean_numeric_cols(df_temp_history, ['투자원금', '평가금액'])
-            except Exception:
-                df_temp_history = pd.DataFrame()
+                df, fetch_ms = _fetch_sheet(conn, ws)
+                cache.put(ws, df, fetch_ms)
+                snapshot_store.write_snapshot(ws, df)
+            except Exception as e:
+                print(f"Background refresh failed ({ws}): {e}")
+            finally:
+                cache.end_refresh(ws)
 
-            # 8. Initial Balance (New logic)
+    threading.Thread(target=_run, name="sheet-snapshot-refresh", daemon=True).start()
+
+def _load_sheets(worksheets):
+    """
+    Returns {worksheet: cleaned DataFrame} for the requested sheets.
+    Fresh sheets come from the cache. On a cold process, sheets with an on-disk
+    snapshot are served from it immediately and refreshed in the background;
+    everything else that is expired/missing is fetched in parallel.
+    Optional sheets that fail become empty frames; required failures raise.
+    The cached frames are shared by every session in the process, so callers get
+    copies they are free to modify.
+    """
+    cache = _sheet_cache()
+    frames = {}
+    to_fetch = []
+    from_snapshot = []
+    for ws in worksheets:
+        df = cache.get(ws, SHEET_SPECS[ws][1])
+        if df is None and not cache.seen(ws):
+            df, _ = snapshot_store.read_snapshot(ws)
+            if df is not None:
+                cache.put(ws, df, source='snapshot')
+                from_snapshot.append(ws)
+        if df is None:
+            to_fetch.append(ws)
+        else:
+            frames[ws] = df
+
+    if not to_fetch and not from_snapshot:
+        return {ws: df.copy() for ws, df in frames.items()}
+
+    conn = st.connection("gsheets", type=GSheetsConnection)
+    if from_snapshot:
+        _refresh_in_background(conn, from_snapshot)
+    if not to_fetch:
+        return {ws: df.copy() for ws, df in frames.items()}
+
+    # Capture the current script context
+    ctx = get_script_run_ctx()
+
+    # Use ThreadPoolExecutor
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor: # Limit workers to reduce burst
+        futures = {ws: executor.submit(_fetch_sheet, conn, ws, ctx) for ws in to_fetch}
+        for ws, future in futures.items():
             try:
-                df_initial = f_initial_balance.result()
-                df_initial = _clean_initial_balance(df_initial)
+                df, fetch_ms = future.result()
             except Exception as e:
-                st.warning(f"Initial Balance Load Error: {e}. Proceeding without initial balance.")
-                df_initial = pd.DataFrame()
-            
-            # Merge Initial Balance into Transactions
-            if not df_initial.empty:
-                df_txn = pd.concat([df_initial, df_txn], ignore_index=True)
+                if not SHEET_SPECS[ws][4]:
+                    raise
+                if ws == "2025년9월_자산종합":
+                    st.warning(f"Initial Balance Load Error: {e}. Proceeding without initial balance.")
+                # If sheet doesn't exist or error, cache empty to avoid crash (retried after its TTL)
+                df, fetch_ms = pd.DataFrame(), None
+            else:
+                snapshot_store.write_snapshot(ws, df)
+            cache.put(ws, df, fetch_ms)
+            frames[ws] = df
+
+    return {ws: df.copy() for ws, df in frames.items()}
+
+@profiler.timed()
+def load_data(keys=None):
+    """
+    Fetches data from multiple worksheets in the '★온가족 자산 정리' Google Sheet.
+    Each worksheet is cached separately with its own TTL (see SHEET_SPECS);
+    only expired or invalidated sheets are refetched, in parallel.
+    A cold process renders from the local Arrow snapshots (snapshot_store) and
+    refreshes them from the network in the background.
+    keys: optional list of result keys (e.g. ['history', 'cagr']) to load only those sheets.
+    Returns a dictionary of DataFrames.
+    """
+    try:
+        worksheets = [
+            ws for ws, spec in SHEET_SPECS.items()
+            if keys is None or spec[0] in keys or (spec[0] == 'initial_balance' and 'transactions' in keys)
+        ]
+        frames = _load_sheets(worksheets)
+        data = {SHEET_SPECS[ws][0]: df for ws, df in frames.items()}
 
-        return {
-            "history": df_history,
-            "cagr": df_cagr,
-            "inventory": df_inventory,
-            "beta_plan": df_beta,
-            "transactions": df_txn, # This now includes initial balance
-            "account_master": df_master,
-            "asset_master": df_asset_master,
-            "temp_history": df_temp_history
-        }
+        # Merge Initial Balance into Transactions
+        df_initial = data.pop('initial_balance', None)
+        if df_initial is not None and not df_initial.empty:
+            data['transactions'] = pd.concat([df_initial, data['transactions']], ignore_index=True) # This now includes initial balance
+
+        return data
 
     except Exception as e:
         st.error(f"Error loading data: {e}. Check sheet names and permissions.")
@@ -172,17 +337,22 @@ def _read_sheet(conn, worksheet, ttl=0):
 def _update_sheet(conn, worksheet, data):
     return conn.update(worksheet=worksheet, data=data)
 
-def get_transaction_options():
+def get_transaction_options(owner=None):
     """
-    Reads '00_거래일지' to get unique values for dropdowns.
-    Returns a dict with lists for 'owners', 'accounts', 'tickers', 'types', 'currencies'.
+    Reads '00_거래일지' (via the sheet cache) to get unique values for dropdowns.
+    Returns a dict with lists for 'owners', 'accounts', 'tickers', 'types', 'currencies',
+    plus 'row_count': the sheet's row count at read time, for add_transaction_log's
+    expected_row_count.
+    owner: only values from that owner's rows (nothing if the sheet has no '소유자').
     """
     try:
-        conn = st.connection("gsheets", type=GSheetsConnection)
-        df = _read_sheet(conn, worksheet="00_거래일지", ttl="0") # Cached by decorator logic if needed, but here mostly for retry
+        df = _load_sheets([TXN_SHEET])[TXN_SHEET]
         
         if df is None or df.empty:
             return {}
+        row_count = len(df)
+        if owner is not None:
+            df = df[df['소유자'] == owner] if '소유자' in df.columns else df.iloc[0:0]
 
         return {
             "owners": sorted(df['소유자'].dropna().unique().tolist()) if '소유자' in df.columns else [],
@@ -190,32 +360,137 @@ def get_transaction_options():
             "tickers": sorted(df['종목'].dropna().unique().tolist()) if '종목' in df.columns else [],
             "types": sorted(df['거래구분'].dropna().unique().tolist()) if '거래구분' in df.columns else [],
             "currencies": sorted(df['통화'].dropna().unique().tolist()) if '통화' in df.columns else [],
+            "row_count": row_count,
         }
     except Exception as e:
         st.error(f"Error fetching options: {e}")
         return {}
 
-def add_transaction_log(new_row_data):
+# --- Row-Level Sheet Writes ---
+class AppendConflictError(Exception):
+    """Raised when a sheet's row count differs from the one seen at read time."""
+
+class GSheetsWriter:
+    """
+    Row-level write operations on a GSheetsConnection (via its gspread client).
+    Anything exposing the same methods can be passed as `conn` to the write helpers,
+    e.g. an in-memory fake connection in tests:
+        header(worksheet) -> list of column names
+        row_count(worksheet) -> number of data rows (excluding header)
+        append_rows(worksheet, rows) -> None
+        batch_update(worksheet, data) -> None   (data: [{'range': 'A1:B1', 'values': [[...]]}])
+    """
+    def __init__(self, conn):
+        self._conn = conn
+        self._worksheets = {}
+
+    def _ws(self, worksheet):
+        # Opening the spreadsheet is a network call; reuse the handle
+        if worksheet not in self._worksheets:
+            self._worksheets[worksheet] = self._conn.client._select_worksheet(worksheet=worksheet)
+        return self._worksheets[worksheet]
+
+    @retry_with_backoff(retries=3)
+    def header(self, worksheet):
+        return self._ws(worksheet).row_values(1)
+
+    @retry_with_backoff(retries=3)
+    def row_count(self, worksheet):
+        # Column A only, not the whole sheet
+        return max(len(self._ws(worksheet).col_values(1)) - 1, 0)
+
+    @retry_with_backoff(retries=3)
+    def append_rows(self, worksheet, rows):
+        self._ws(worksheet).append_rows(rows, value_input_option='USER_ENTERED')
+
+    @retry_with_backoff(retries=3)
+    def batch_update(self, worksheet, data):
+        # One values.batchUpdate request for all ranges
+        self._ws(worksheet).batch_update(data, value_input_option='USER_ENTERED')
+
+def _get_writer(conn=None):
+    if conn is None:
+        conn = st.connection("gsheets", type=GSheetsConnection)
+    if isinstance(conn, GSheetsConnection):
+        return GSheetsWriter(conn)
+    return conn
+
+def _to_cell(value):
+    """Converts a Python/NumPy value into something the Sheets API accepts."""
+    if value is None:
+        return ''
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return ''
+    if isinstance(value, (pd.Timestamp, datetime, date)): # date: what st.date_input returns
+        return value.strftime('%Y-%m-%d')
+    return value
+
+def _rows_to_values(rows, header):
+    """Orders dict rows by the sheet header; unknown keys are dropped, missing ones left blank."""
+    return [[_to_cell(row.get(col)) for col in header] for row in rows]
+
+class AppendBatch:
+    """
+    Collects rows for one worksheet and sends them in a single append call.
+    If expected_row_count is given (the row count seen at read time), flush()
+    raises AppendConflictError when the sheet has changed since then.
+    """
+    def __init__(self, worksheet=TXN_SHEET, expected_row_count=None):
+        self.worksheet = worksheet
+        self.expected_row_count = expected_row_count
+        self.rows = []
+
+    def add(self, row):
+        self.rows.append(dict(row))
+        return self
+
+    def __len__(self):
+        return len(self.rows)
+
+    def flush(self, conn=None):
+        """Appends all pending rows in one request. Returns the number of rows sent."""
+        if not self.rows:
+            return 0
+        writer = _get_writer(conn)
+        if self.expected_row_count is not None:
+            current = writer.row_count(self.worksheet)
+            if current != self.expected_row_count:
+                raise AppendConflictError(
+                    f"'{self.worksheet}' has {current} rows, expected {self.expected_row_count}. "
+                    "Reload and try again."
+                )
+        writer.append_rows(self.worksheet, _rows_to_values(self.rows, writer.header(self.worksheet)))
+        sent = len(self.rows)
+        self.rows = []
+        invalidate_sheet(self.worksheet)
+        return sent
+
+def append_transaction_rows(rows, expected_row_count=None, conn=None):
+    """
+    Appends rows (list of dicts keyed by sheet column) to '00_거래일지' in one call.
+    Only the new rows are sent. Raises AppendConflictError if expected_row_count is
+    given and does not match the sheet. Returns the number of rows appended.
+    """
+    batch = AppendBatch(TXN_SHEET, expected_row_count=expected_row_count)
+    for row in rows:
+        batch.add(row)
+    return batch.flush(conn)
+
+def add_transaction_log(new_row_data, expected_row_count=None, conn=None):
     """
     Appends a new row to '00_거래일지'.
     new_row_data: dict containing keys matching columns.
+    Sends only the new row (no full-sheet read/overwrite).
     """
     try:
-        conn = st.connection("gsheets", type=GSheetsConnection)
-        df = _read_sheet(conn, worksheet="00_거래일지", ttl="0")
-        
-        # Convert dict to DataFrame
-        new_df = pd.DataFrame([new_row_data])
-        
-        # Append
-        updated_df = pd.concat([df, new_df], ignore_index=True)
-        
-        # Update Sheet
-        _update_sheet(conn, worksheet="00_거래일지", data=updated_df)
-        
-        # Clear cache to reflect changes immediately
-        st.cache_data.clear()
+        append_transaction_rows([new_row_data], expected_row_count=expected_row_count, conn=conn)
         return True
+    except AppendConflictError as e:
+        invalidate_sheet(TXN_SHEET) # Next rerun reads the current row count
+        st.warning(f"Transaction log changed while editing: {e}")
+        return False
     except Exception as e:
         st.error(f"Error saving transaction: {e}")
         return False
@@ -228,12 +503,116 @@ def overwrite_transaction_log(df_new):
     try:
         conn = st.connection("gsheets", type=GSheetsConnection)
         _update_sheet(conn, worksheet="00_거래일지", data=df_new)
-        st.cache_data.clear()
+        invalidate_sheet(TXN_SHEET)
         return True
     except Exception as e:
         st.error(f"Error updating logs: {e}")
         return False
 
+def _col_letter(idx):
+    """0-based column index -> A1 column letters (0 -> A, 26 -> AA)."""
+    letters = ''
+    idx += 1
+    while idx:
+        idx, rem = divmod(idx - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+def _runs(positions):
+    """Splits sorted integer positions into (start, end) runs of consecutive values."""
+    runs = []
+    for p in positions:
+        if runs and p == runs[-1][1] + 1:
+            runs[-1][1] = p
+        else:
+            runs.append([p, p])
+    return runs
+
+def diff_transaction_log(df_original, df_edited, header):
+    """
+    Computes the minimal sheet edits turning df_original into df_edited.
+    Rows are matched by index (df_original must be the frame as read, so index i
+    is sheet row i + 2); rows with new index labels are appends.
+    header: the sheet's header row; edited columns missing from it are added.
+    Returns a list of {'range', 'values'} updates (header, changed cells, appended
+    rows) ready for a single batch_update, plus the list of removed index labels.
+    """
+    header = list(header)
+    new_cols = [c for c in df_edited.columns if c not in header]
+    cols = header + new_cols
+    updates = []
+
+    if new_cols:
+        updates.append({
+            'range': f"{_col_letter(len(header))}1:{_col_letter(len(cols) - 1)}1",
+            'values': [new_cols],
+        })
+
+    kept = df_original.index.intersection(df_edited.index)
+    removed = df_original.index.difference(df_edited.index).tolist()
+    appended = df_edited.index.difference(df_original.index)
+
+    # 1. Changed cells (vectorized compare; NaN == NaN)
+    if len(kept):
+        before = df_original.reindex(index=kept, columns=cols).to_numpy(dtype=object)
+        after = df_edited.reindex(index=kept, columns=cols).to_numpy(dtype=object)
+        null_before = pd.isna(before)
+        null_after = pd.isna(after)
+        changed = ~((before == after) | (null_before & null_after))
+
+        row_pos = {label: pos for pos, label in enumerate(df_original.index)}
+        for r in np.flatnonzero(changed.any(axis=1)):
+            sheet_row = row_pos[kept[r]] + 2
+            for start, stop in _runs(np.flatnonzero(changed[r]).tolist()):
+                updates.append({
+                    'range': f"{_col_letter(start)}{sheet_row}:{_col_letter(stop)}{sheet_row}",
+                    'values': [[_to_cell(v) for v in after[r, start:stop + 1]]],
+                })
+
+    # 2. Appended rows, written directly below the rows seen at read time
+    if len(appended):
+        first_row = len(df_original) + 2
+        last_row = first_row + len(appended) - 1
+        values = df_edited.reindex(index=appended, columns=cols).to_numpy(dtype=object)
+        updates.append({
+            'range': f"A{first_row}:{_col_letter(len(cols) - 1)}{last_row}",
+            'values': [[_to_cell(v) for v in row] for row in values],
+        })
+
+    return updates, removed
+
+def patch_transaction_log(df_original, df_edited, conn=None):
+    """
+    Writes only the differences between df_original (as read via
+    get_latest_transaction_log) and df_edited to '00_거래일지', as one batched
+    request: changed cells are patched in place and new rows are appended.
+    Falls back to overwrite_transaction_log if rows were removed.
+    """
+    try:
+        writer = _get_writer(conn)
+        updates, removed = diff_transaction_log(df_original, df_edited, writer.header(TXN_SHEET))
+        if removed:
+            return overwrite_transaction_log(df_edited)
+        if not updates:
+            return True
+
+        # Row positions are only valid if nobody changed the sheet since the read
+        current = writer.row_count(TXN_SHEET)
+        if current != len(df_original):
+            raise AppendConflictError(
+                f"'{TXN_SHEET}' has {current} rows, expected {len(df_original)}. Reload and try again."
+            )
+        writer.batch_update(TXN_SHEET, updates)
+        invalidate_sheet(TXN_SHEET)
+        return True
+    except AppendConflictError as e:
+        invalidate_sheet(TXN_SHEET) # Next rerun reads the current row count
+        st.warning(f"Transaction log changed while editing: {e}")
+        return False
+    except Exception as e:
+        st.error(f"Error updating logs: {e}")
+        return False
+
 def get_latest_transaction_log():
     """
     Fetches the '00_거래일지' sheet explicitly with ttl=0 to bypass cache.
@@ -245,7 +624,11 @@ def get_latest_transaction_log():
         df = _read_sheet(conn, worksheet="00_거래일지", ttl="0")
         if df is None:
             return pd.DataFrame()
-        return _clean_numeric_cols(df, ['Amount', 'Qty', '수량', '금액'])
+        df = _clean_numeric_cols(df, ['Amount', 'Qty', '수량', '금액'])
+        # A fresh read is as good as a cache refill for this sheet
+        # (copy: callers edit the returned frame in place before overwriting)
+        _sheet_cache().put(TXN_SHEET, df.copy())
+        return df
     except Exception as e:
         st.error(f"Error fetching latest logs: {e}")
         return pd.DataFrame()
@@ -337,145 +720,3 @@ def calculate_dod(df_history):
         }
         
     return dod_data
-
-# --- SQLite Sync Logic ---
-import hashlib
-from modules import db_manager
-
-def _generate_hash(row):
-    """
-    Generates a unique hash for a transaction row using key fields.
-    Fields used: date, account, asset, type, amount, qty.
-    NOTE: 'note' is explicitly EXCLUDED to allow 'Pending' -> 'Settled' updates.
-    """
-    # Normalize strings (strip) and numbers (float)
-    # Row keys match GSheet columns: '날짜', '계좌', '종목', '거래구분', '거래금액', '수량', '소유자'
-    # Mapped to DB cols: date, account_name, asset_name, type, amount, qty, owner
-    
-    unique_str = f"{str(row.get('날짜', '')).strip()}_" \
-                 f"{str(row.get('소유자', '')).strip()}_" \
-                 f"{str(row.get('계좌', '')).strip()}_" \
-                 f"{str(row.get('종목', '')).strip()}_" \
-                 f"{str(row.get('거래구분', '')).strip()}_" \
-                 f"{float(row.get('거래금액', 0))}_" \
-                 f"{float(row.get('수량', 0))}"
-                 
-    return hashlib.md5(unique_str.encode('utf-8')).hexdigest()
-
-def sync_to_sqlite(data_dict):
-    """
-    Synchronizes the fetched GSheet data to local SQLite DB.
-    """
-    if not data_dict:
-        return False, "No data to sync."
-    
-    try:
-        conn = db_manager.get_connection()
-        cursor = conn.cursor()
-        
-        # 1. Sync Masters
-        _sync_masters(cursor, data_dict.get('account_master'), data_dict.get('asset_master'))
-        
-        # 2. Sync Transactions (Incremental)
-        added_count = _sync_transactions(cursor, data_dict.get('transactions'))
-        
-        conn.commit()
-        conn.close()
-        return True, f"Sync check complete. {added_count} new/updated rows."
-        
-    except Exception as e:
-        return False, f"Sync failed: {e}"
-
-def _sync_masters(cursor, df_acct, df_asset):
-    """
-    Upserts master data.
-    """
-    # ... (No changes here)
-    # Account Master
-    if df_acct is not None and not df_acct.empty:
-        for _, row in df_acct.iterrows():
-            cursor.execute("""
-                INSERT OR REPLACE INTO account_master (account_number, owner, account_name, broker, type)
-                VALUES (?, ?, ?, ?, ?)
-            """, (
-                str(row.get('계좌번호', '')).strip(),
-                str(row.get('소유자', '')).strip(),
-                str(row.get('계좌명', '')).strip(),
-                str(row.get('증권사', '')) if '증권사' in row else None,
-                # Fix: Column header is "포트폴리오 구분" in GSheet
-                str(row.get('포트폴리오 구분', row.get('계좌구분', ''))).strip() or None
-            ))
-            
-    # Asset Master
-    if df_asset is not None and not df_asset.empty:
-        for _, row in df_asset.iterrows():
-            # Retry with proper UPSERT syntax (Optimized)
-            cursor.execute("""
-                INSERT INTO asset_master (ticker, asset_name, currency, asset_class)
-                VALUES (?, ?, ?, ?)
-                ON CONFLICT(asset_name) DO UPDATE SET
-                    ticker=excluded.ticker,
-                    currency=excluded.currency,
-                    asset_class=excluded.asset_class,
-                    updated_at=CURRENT_TIMESTAMP
-            """, (
-                str(row.get('티커', '')).strip(),
-                str(row.get('종목명', '')).strip(),
-                str(row.get('통화', 'KRW')).strip(),
-                'Cash' if str(row.get('종목명', '')).strip() in ['원화', '달러'] else 'Stock'
-            ))
-
-def _sync_transactions(cursor, df_txn):
-    """
-    Incrementally loads transactions.
-    """
-    if df_txn is None or df_txn.empty:
-        return 0
-        
-    count = 0
-    # Optimize: Get all existing hashes to avoid trying INSERT on everything?
-    # Or just use INSERT OR REPLACE provided usage of Unique Index on sync_hash.
-    
-    # We must prepare the rows.
-    for idx, row in df_txn.iterrows():
-        # Clean Data
-        r_hash = _generate_hash(row)
-        r_date = str(row.get('날짜', '')).strip()
-        
-        # Skip empty rows
-        if not r_date or r_date == 'NaT':
-            continue
-            
-        try:
-            cursor.execute("""
-                INSERT INTO transaction_log (
-                    date, owner, account_name, asset_name, type, amount, qty, price, currency, note,
-                    source_row_index, sync_hash
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT(sync_hash) DO UPDATE SET
-                    note = excluded.note,
-                    source_row_index = excluded.source_row_index,
-                    synced_at = CURRENT_TIMESTAMP
-            """, (
-                r_date,
-                str(row.get('소유자', '')).strip(),
-                str(row.get('계좌', '')).strip(),
-                str(row.get('종목', '')).strip(),
-                str(row.get('거래구분', '')).strip(),
-                float(row.get('거래금액', 0)),
-                float(row.get('수량', 0)),
-                0.0, 
-                str(row.get('통화', 'KRW')).strip(),
-                str(row.get('비고', '')).strip(),
-                idx + 2, # Approx row number (header+1)
-                r_hash
-            ))
-            
-            # Check if row was inserted (Optimization: counting is hard with upsert, assume processed)
-            count += 1
-            
-        except Exception as e:
-            print(f"Row error: {e}")
-            continue
-            
-    return count
@@ -2,20 +2,57 @@ import streamlit as st
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from modules.models import Base
+from modules import db_manager
 import os
 
-DB_FILE = "assets.db"
+# Single store shared with db_manager (schema + versioning live there)
+DB_FILE = db_manager.DB_FILE
 DATABASE_URL = f"sqlite:///{DB_FILE}"
+# Waiting for a pooled connection gets the same budget as waiting for the SQLite lock
+POOL_TIMEOUT = db_manager.PRAGMAS["busy_timeout"] / 1000
 
+def create_read_engine(db_file=DB_FILE):
+    """
+    Pooled reader engine. Connections are query_only and carry the db_manager
+    tuning profile (WAL etc.), so reads proceed while a sync is writing.
+    """
+    return create_engine(
+        f"sqlite:///{db_file}",
+        creator=lambda: db_manager.connect(db_file, read_only=True),
+        pool_size=db_manager.READ_POOL_SIZE,
+        max_overflow=0,
+        pool_timeout=POOL_TIMEOUT,
+    )
+
+def create_write_engine(db_file=DB_FILE):
+    """
+    Writer engine with exactly one connection. SQLite allows a single writer anyway;
+    queueing on the pool serializes concurrent syncs in-process instead of having
+    them race for the file lock.
+    """
+    return create_engine(
+        f"sqlite:///{db_file}",
+        creator=lambda: db_manager.connect(db_file),
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=POOL_TIMEOUT,
+    )
+
+# cache_resource: one pool per process, shared by every Streamlit session
 @st.cache_resource
 def get_engine():
-    return create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    return create_read_engine()
+
+@st.cache_resource
+def get_write_engine():
+    return create_write_engine()
 
 engine = get_engine()
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+write_engine = get_write_engine()
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=write_engine)
 
 def get_db():
-    """Dependency for getting DB session."""
+    """Dependency for getting DB session (on the single writer connection)."""
     db = SessionLocal()
     try:
         yield db
@@ -24,9 +61,9 @@ def get_db():
 
 def initialize_sqlite_db():
     """
-    Creates tables based on models.
+    Brings the shared store up to the current schema version.
     To be called on app startup or via migration script.
+    Tables are created by db_manager's versioned migrations (not metadata.create_all),
+    so there is one schema definition to keep in sync with models.py.
     """
-    # Create tables
-    Base.metadata.create_all(bind=engine)
-    print(f"Database {DB_FILE} initialized.")
+    db_manager.init_db()
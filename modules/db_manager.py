@@ -5,25 +5,51 @@ import pandas as pd
 
 DB_FILE = "asset_database.db"
 
+# --- Connection Profile ---
+# Applied to every connection (raw sqlite3 and SQLAlchemy pools alike).
+# WAL lets dashboard readers keep reading the last committed snapshot while a
+# sync is writing; synchronous=NORMAL is durable at checkpoints under WAL.
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -65536,       # page cache in KiB (64MB)
+    "mmap_size": 268435456,     # 256MB memory-mapped reads
+    "temp_store": "MEMORY",
+    "busy_timeout": 30000,      # ms to wait for the writer lock instead of failing
+}
+# Pooled read connections shared by all Streamlit sessions. Smaller pools starve
+# readers during a sync (benchmark_concurrency, 8 readers: pool 4 -> max 8.8 s).
+READ_POOL_SIZE = 8
+
+def apply_pragmas(conn, read_only=False):
+    for name, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value};")
+    if read_only:
+        # Reader connections can never take the write lock by accident
+        conn.execute("PRAGMA query_only = ON;")
+
+def connect(db_file=None, read_only=False):
+    """Opens a sqlite3 connection with the tuning profile applied."""
+    conn = sqlite3.connect(db_file or DB_FILE, check_same_thread=False,
+                           timeout=PRAGMAS["busy_timeout"] / 1000)
+    apply_pragmas(conn, read_only=read_only)
+    return conn
+
 def get_connection():
     """Returns a connection to the SQLite database."""
-    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+    conn = connect()
     # Enable accessing columns by name
     conn.row_factory = sqlite3.Row
     return conn
 
-def init_db():
-    """Initializes the database with valid tables and views."""
-    conn = get_connection()
-    c = conn.cursor()
-
-    # Force Schema Reset (Dev Phase) - REMOVED to persist data
-    # c.execute("DROP VIEW IF EXISTS view_asset_inventory;")
-    # c.execute("DROP VIEW IF EXISTS view_transaction_details;")
-    # c.execute("DROP TABLE IF EXISTS transaction_log;")
-    # c.execute("DROP TABLE IF EXISTS asset_master;")
-    # c.execute("DROP TABLE IF EXISTS account_master;")
+# --- Schema Versioning ---
+# The schema version lives in PRAGMA user_version. Each entry in MIGRATIONS moves
+# the store forward by one version and runs in its own transaction; existing
+# databases (including the old raw-sqlite3 layout at version 0) are upgraded in place.
+# models.py maps the same tables for the SQLAlchemy sync path.
 
+def _m001_baseline(c):
+    """Canonical tables (same layout as models.py)."""
     # 1. Accounts Master
     c.execute("""
     CREATE TABLE IF NOT EXISTS account_master (
@@ -37,13 +63,13 @@ def init_db():
     """)
     # Index for joins
     c.execute("CREATE INDEX IF NOT EXISTS idx_account_name ON account_master(account_name);")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_account_lookup ON account_master(owner, account_name);")
 
-    # 2. Asset Master
+    # 2. Asset Master (asset_name is the key, as in models.Asset)
     c.execute("""
     CREATE TABLE IF NOT EXISTS asset_master (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        asset_name TEXT PRIMARY KEY,
         ticker TEXT,
-        asset_name TEXT NOT NULL UNIQUE,
         currency TEXT DEFAULT 'KRW',
         asset_class TEXT,
         updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
@@ -64,7 +90,9 @@ def init_db():
         amount REAL DEFAULT 0,
         qty REAL DEFAULT 0,
         price REAL DEFAULT 0,
+        fee REAL DEFAULT 0,
         currency TEXT,
+        status TEXT DEFAULT 'Settled',
         note TEXT,
         
         source_row_index INTEGER,
@@ -75,8 +103,53 @@ def init_db():
     c.execute("CREATE INDEX IF NOT EXISTS idx_txn_date ON transaction_log(date);")
     c.execute("CREATE INDEX IF NOT EXISTS idx_txn_asset ON transaction_log(asset_name);")
     c.execute("CREATE INDEX IF NOT EXISTS idx_txn_owner ON transaction_log(owner);") # Good for filtering
+    c.execute("CREATE INDEX IF NOT EXISTS idx_txn_owner_asset ON transaction_log(owner, asset_name);")
+
+    # 4. Sync Metadata (watermarks)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS sync_metadata (
+        key TEXT PRIMARY KEY,
+        value TEXT,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
 
-    # 4. View: Transaction Details (Reconstruction)
+def _m002_asset_master_name_key(c):
+    """Legacy asset_master used an autoincrement id; rebuild it keyed by asset_name."""
+    cols = [r[1] for r in c.execute("PRAGMA table_info(asset_master);")]
+    if 'id' not in cols:
+        return
+    # Views reference asset_master; they are recreated by the views migration
+    c.execute("DROP VIEW IF EXISTS view_asset_inventory;")
+    c.execute("DROP VIEW IF EXISTS view_transaction_details;")
+    c.execute("""
+    CREATE TABLE asset_master_new (
+        asset_name TEXT PRIMARY KEY,
+        ticker TEXT,
+        currency TEXT DEFAULT 'KRW',
+        asset_class TEXT,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+    c.execute("""
+    INSERT OR REPLACE INTO asset_master_new (asset_name, ticker, currency, asset_class, updated_at)
+    SELECT asset_name, ticker, currency, asset_class, updated_at FROM asset_master ORDER BY id;
+    """)
+    c.execute("DROP TABLE asset_master;")
+    c.execute("ALTER TABLE asset_master_new RENAME TO asset_master;")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_asset_ticker ON asset_master(ticker);")
+
+def _m003_transaction_fee_status(c):
+    """Legacy transaction_log lacked the fee/status columns of models.Transaction."""
+    cols = [r[1] for r in c.execute("PRAGMA table_info(transaction_log);")]
+    if 'fee' not in cols:
+        c.execute("ALTER TABLE transaction_log ADD COLUMN fee REAL DEFAULT 0;")
+    if 'status' not in cols:
+        c.execute("ALTER TABLE transaction_log ADD COLUMN status TEXT DEFAULT 'Settled';")
+
+def _m004_views(c):
+    """Reporting views over the canonical tables."""
+    # 1. View: Transaction Details (Reconstruction)
     c.execute("DROP VIEW IF EXISTS view_transaction_details;")
     c.execute("""
     CREATE VIEW view_transaction_details AS
@@ -98,7 +171,7 @@ def init_db():
     LEFT JOIN asset_master am ON t.asset_name = am.asset_name;
     """)
 
-    # 5. View: Inventory (Aggregation)
+    # 2. View: Inventory (Aggregation)
     c.execute("DROP VIEW IF EXISTS view_asset_inventory;")
     c.execute("""
     CREATE VIEW view_asset_inventory AS
@@ -152,5 +225,92 @@ def init_db():
     GROUP BY t.owner, t.asset_name;
     """)
 
-    conn.commit()
-    conn.close()
+
+def _m005_holdings(c):
+    """
+    Materialized current positions per (owner, account, asset).
+    Maintained by modules.holdings during sync; filled by the first sync after upgrade.
+    """
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS holdings (
+        owner TEXT NOT NULL,
+        account_name TEXT NOT NULL,
+        asset_name TEXT NOT NULL,
+        current_qty REAL DEFAULT 0,
+        net_book_value_amount REAL DEFAULT 0,
+        last_transaction_date TEXT,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (owner, account_name, asset_name)
+    );
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_holdings_owner_asset ON holdings(owner, asset_name);")
+
+def _m006_price_history(c):
+    """Local daily close cache for market data (modules/price_store.py)."""
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS price_history (
+        ticker TEXT NOT NULL,
+        date TEXT NOT NULL,
+        close REAL,
+        PRIMARY KEY (ticker, date)
+    );
+    """)
+    # Date range already fetched per ticker (holidays leave gaps in price_history itself)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS price_coverage (
+        ticker TEXT PRIMARY KEY,
+        start_date TEXT NOT NULL,
+        end_date TEXT NOT NULL,
+        fetched_at REAL NOT NULL
+    );
+    """)
+
+
+MIGRATIONS = [
+    _m001_baseline,
+    _m002_asset_master_name_key,
+    _m003_transaction_fee_status,
+    _m004_views,
+    _m005_holdings,
+    _m006_price_history,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version;").fetchone()[0]
+
+def migrate(conn):
+    """
+    Applies pending forward migrations. Each runs in its own transaction and bumps
+    user_version, so a failure leaves the store at the last good version.
+    Returns the list of applied migration names.
+    """
+    applied = []
+    version = get_schema_version(conn)
+    isolation = conn.isolation_level
+    conn.isolation_level = None # Manual transaction control (DDL included)
+    try:
+        for number, step in enumerate(MIGRATIONS[version:], start=version + 1):
+            c = conn.cursor()
+            c.execute("BEGIN;")
+            try:
+                step(c)
+                c.execute(f"PRAGMA user_version = {number};")
+                c.execute("COMMIT;")
+            except Exception:
+                c.execute("ROLLBACK;")
+                raise
+            applied.append(step.__name__)
+    finally:
+        conn.isolation_level = isolation
+    return applied
+
+def init_db():
+    """Brings the database up to SCHEMA_VERSION (no-op when already current)."""
+    conn = get_connection()
+    try:
+        applied = migrate(conn)
+        if applied:
+            print(f"Database {DB_FILE} migrated to v{SCHEMA_VERSION}: {', '.join(applied)}")
+    finally:
+        conn.close()
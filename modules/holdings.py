@@ -0,0 +1,199 @@
+import argparse
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from modules import models
+
+# Materialized replacement for view_asset_inventory.
+# One row per (owner, account, asset); the view aggregates the same rules per
+# (owner, asset) over the whole transaction_log on every query.
+HOLDINGS_TABLE = "holdings"
+
+# Same CASE rules as view_asset_inventory (db_manager._m004_views)
+_QTY_SQL = """
+    CASE
+        WHEN am.asset_class = 'Stock' AND t.type = '매수' THEN t.qty
+        WHEN am.asset_class = 'Stock' AND t.type = '매도' THEN -t.qty
+        WHEN am.asset_class = 'Cash' AND t.asset_name = '원화' AND t.type = '입금' THEN t.qty
+        WHEN am.asset_class = 'Cash' AND t.asset_name = '원화' AND t.type = '출금' THEN -t.qty
+        WHEN am.asset_class = 'Cash' AND t.asset_name = '원화' AND t.type = '환전' THEN t.qty
+        WHEN am.asset_class = 'Cash' AND t.asset_name = '원화' AND t.type = '매도' AND t.currency = '₩' THEN t.amount
+        WHEN am.asset_class = 'Cash' AND t.asset_name = '원화' AND t.type = '매수' AND t.currency = '₩' THEN -t.amount
+        WHEN am.asset_class = 'Cash' AND t.asset_name = '원화' AND t.type = '배당금' AND t.currency = '₩' THEN t.amount
+        WHEN am.asset_class = 'Cash' AND t.asset_name = '달러' AND t.type = '환전' THEN t.qty
+        WHEN am.asset_class = 'Cash' AND t.asset_name = '달러' AND t.type = '매도' AND t.currency = '$' THEN t.amount
+        WHEN am.asset_class = 'Cash' AND t.asset_name = '달러' AND t.type = '매수' AND t.currency = '$' THEN -t.amount
+        WHEN am.asset_class = 'Cash' AND t.asset_name = '달러' AND t.type = '배당금' AND t.currency = '$' THEN t.amount
+        ELSE 0
+    END"""
+
+_BOOK_SQL = """
+    CASE
+        WHEN t.type = '매수' THEN t.amount
+        WHEN t.type = '매도' THEN -t.amount
+        WHEN t.type = '확정손익' THEN t.amount
+        ELSE 0
+    END"""
+
+_UPSERT_SQL = text(f"""
+    INSERT INTO {HOLDINGS_TABLE}
+        (owner, account_name, asset_name, current_qty, net_book_value_amount, last_transaction_date, updated_at)
+    VALUES (:owner, :account_name, :asset_name, :qty, :book, :last_date, CURRENT_TIMESTAMP)
+    ON CONFLICT (owner, account_name, asset_name) DO UPDATE SET
+        current_qty = current_qty + excluded.current_qty,
+        net_book_value_amount = net_book_value_amount + excluded.net_book_value_amount,
+        last_transaction_date = MAX(COALESCE(last_transaction_date, ''), COALESCE(excluded.last_transaction_date, '')),
+        updated_at = CURRENT_TIMESTAMP
+""")
+
+def transaction_deltas(df, asset_class, currency_col='currency'):
+    """
+    Vectorized _QTY_SQL / _BOOK_SQL for prepared transaction rows
+    (migration._prepare_transactions columns). `asset_class` maps asset_name -> class.
+    Returns (qty_delta, book_delta) arrays.
+    """
+    cls = df['asset_name'].map(asset_class).to_numpy(dtype=object)
+    name = df['asset_name'].to_numpy(dtype=object)
+    typ = df['type'].to_numpy(dtype=object)
+    cur = df[currency_col].to_numpy(dtype=object)
+    qty = np.nan_to_num(df['qty'].to_numpy(dtype='float64'))
+    amount = np.nan_to_num(df['amount'].to_numpy(dtype='float64'))
+
+    stock = cls == 'Stock'
+    krw = (cls == 'Cash') & (name == '원화')
+    usd = (cls == 'Cash') & (name == '달러')
+    buy, sell, div = typ == '매수', typ == '매도', typ == '배당금'
+
+    qty_delta = np.select(
+        [
+            stock & buy, stock & sell,
+            krw & (typ == '입금'), krw & (typ == '출금'), krw & (typ == '환전'),
+            krw & sell & (cur == '₩'), krw & buy & (cur == '₩'), krw & div & (cur == '₩'),
+            usd & (typ == '환전'),
+            usd & sell & (cur == '$'), usd & buy & (cur == '$'), usd & div & (cur == '$'),
+        ],
+        [
+            qty, -qty,
+            qty, -qty, qty,
+            amount, -amount, amount,
+            qty,
+            amount, -amount, amount,
+        ],
+        default=0.0,
+    )
+    book_delta = np.select([buy, sell, typ == '확정손익'], [amount, -amount, amount], default=0.0)
+    return qty_delta, book_delta
+
+def _asset_classes(db):
+    return dict(db.query(models.Asset.asset_name, models.Asset.asset_class).all())
+
+def apply_transaction_changes(db, df_new, df_changed=None):
+    """
+    Folds synced transaction rows into the holdings table without rescanning the log.
+    df_new: newly inserted rows. df_changed: updated rows carrying both 'currency' and
+    'old_currency' (the only updated field that moves a position); their old
+    contribution is reversed and the new one added. Does not commit.
+    Returns the number of (owner, account, asset) keys touched.
+    """
+    parts = [(df_new, 1, 'currency')]
+    if df_changed is not None and not df_changed.empty:
+        moved = df_changed[df_changed['currency'] != df_changed['old_currency']]
+        parts += [(moved, 1, 'currency'), (moved, -1, 'old_currency')]
+
+    frames = []
+    asset_class = None
+    for df, sign, currency_col in parts:
+        if df is None or df.empty:
+            continue
+        if asset_class is None:
+            asset_class = _asset_classes(db)
+        qty, book = transaction_deltas(df, asset_class, currency_col)
+        frames.append(pd.DataFrame({
+            'owner': df['owner'].to_numpy(),
+            'account_name': df['account_name'].to_numpy(),
+            'asset_name': df['asset_name'].to_numpy(),
+            'qty': qty * sign,
+            'book': book * sign,
+            'last_date': df['date'].astype(str).to_numpy(),
+        }))
+    if not frames:
+        return 0
+
+    deltas = (pd.concat(frames, ignore_index=True)
+              .groupby(['owner', 'account_name', 'asset_name'], as_index=False)
+              .agg(qty=('qty', 'sum'), book=('book', 'sum'), last_date=('last_date', 'max')))
+    db.execute(_UPSERT_SQL, deltas.to_dict('records'))
+    return len(deltas)
+
+def rebuild_holdings(db):
+    """Recomputes the whole holdings table from transaction_log. Does not commit."""
+    db.execute(text(f"DELETE FROM {HOLDINGS_TABLE}"))
+    db.execute(text(f"""
+        INSERT INTO {HOLDINGS_TABLE}
+            (owner, account_name, asset_name, current_qty, net_book_value_amount, last_transaction_date, updated_at)
+        SELECT t.owner, t.account_name, t.asset_name,
+               SUM({_QTY_SQL}), SUM({_BOOK_SQL}), MAX(t.date), CURRENT_TIMESTAMP
+        FROM transaction_log t
+        LEFT JOIN asset_master am ON t.asset_name = am.asset_name
+        GROUP BY t.owner, t.account_name, t.asset_name
+    """))
+    return db.execute(text(f"SELECT COUNT(*) FROM {HOLDINGS_TABLE}")).scalar()
+
+def is_empty(db):
+    return db.execute(text(f"SELECT 1 FROM {HOLDINGS_TABLE} LIMIT 1")).first() is None
+
+def check_consistency(db, tolerance=1e-6):
+    """
+    Compares holdings (rolled up to owner/asset, over accounts present in
+    account_master, as the view joins them) against view_asset_inventory.
+    Returns the mismatching rows; empty means the table is consistent.
+    """
+    conn = db.connection()
+    df_view = pd.read_sql(text("""
+        SELECT owner, asset_name, current_qty, net_book_value_amount, last_transaction_date
+        FROM view_asset_inventory
+    """), conn)
+    df_mat = pd.read_sql(text(f"""
+        SELECT h.owner, h.asset_name,
+               SUM(h.current_qty) AS current_qty,
+               SUM(h.net_book_value_amount) AS net_book_value_amount,
+               MAX(h.last_transaction_date) AS last_transaction_date
+        FROM {HOLDINGS_TABLE} h
+        JOIN account_master a ON h.account_name = a.account_name AND a.owner = h.owner
+        GROUP BY h.owner, h.asset_name
+    """), conn)
+
+    df = df_view.merge(df_mat, on=['owner', 'asset_name'], how='outer',
+                       suffixes=('_view', '_holdings'), indicator=True)
+    mismatch = df['_merge'] != 'both'
+    for col in ['current_qty', 'net_book_value_amount']:
+        a = pd.to_numeric(df[f'{col}_view'], errors='coerce').fillna(0)
+        b = pd.to_numeric(df[f'{col}_holdings'], errors='coerce').fillna(0)
+        mismatch |= ~np.isclose(a, b, rtol=0, atol=tolerance)
+    mismatch |= (df['last_transaction_date_view'].astype(str)
+                 != df['last_transaction_date_holdings'].astype(str))
+    return df[mismatch].drop(columns='_merge').reset_index(drop=True)
+
+if __name__ == '__main__':
+    from modules import database
+
+    parser = argparse.ArgumentParser(description="Materialized holdings maintenance.")
+    parser.add_argument('command', choices=['rebuild', 'check'])
+    args = parser.parse_args()
+
+    database.initialize_sqlite_db()
+    db = next(database.get_db())
+    try:
+        if args.command == 'rebuild':
+            n = rebuild_holdings(db)
+            db.commit()
+            print(f"Rebuilt {HOLDINGS_TABLE}: {n} rows.")
+        else:
+            df_bad = check_consistency(db)
+            if df_bad.empty:
+                print(f"{HOLDINGS_TABLE} is consistent with view_asset_inventory.")
+            else:
+                print(f"{len(df_bad)} mismatching (owner, asset) rows:")
+                print(df_bad.to_string())
+    finally:
+        db.close()
@@ -1,8 +1,10 @@
 import pandas as pd
+import numpy as np
 import hashlib
+import json
 from datetime import datetime
 from sqlalchemy.orm import Session
-from modules import database,models
+from modules import database,models,holdings
 from modules import data_loader
 import streamlit as st
 
@@ -20,12 +22,323 @@ def generate_sync_hash(row):
                  f"{float(row.get('수량', 0))}"
     return hashlib.md5(unique_str.encode('utf-8')).hexdigest()
 
-def migrate_google_sheets_to_sqlite():
+def _text(df, col, default=''):
+    """Stripped string column (str() semantics, so None -> 'None'), or a default-filled one if missing."""
+    if col not in df.columns:
+        return np.full(len(df), default, dtype=object).astype(str)
+    return np.char.strip(df[col].to_numpy(dtype=object).astype(str))
+
+def _float_col(df, col):
+    """Column as float64 plus a mask of values float() would have rejected."""
+    if col not in df.columns:
+        return np.zeros(len(df)), np.zeros(len(df), dtype=bool)
+    raw = df[col]
+    values = pd.to_numeric(raw, errors='coerce')
+    invalid = values.isna() & raw.notna()
+    return values.to_numpy(dtype=float), invalid.to_numpy()
+
+def generate_sync_hashes(df):
+    """
+    Vectorized generate_sync_hash over a whole transactions DataFrame.
+    Builds every key string in one pass over the columns; only the md5 call is per row.
+    Returns (hashes, invalid_mask); invalid rows have non-numeric amount/qty.
+    """
+    amounts, bad_amount = _float_col(df, '거래금액')
+    qtys, bad_qty = _float_col(df, '수량')
+
+    keys = _text(df, '날짜')
+    for col in ['소유자', '계좌', '종목', '거래구분']:
+        keys = np.char.add(np.char.add(keys, '_'), _text(df, col))
+    keys = np.char.add(np.char.add(keys, '_'), amounts.astype(str))
+    keys = np.char.add(np.char.add(keys, '_'), qtys.astype(str))
+
+    hashes = [hashlib.md5(k.encode('utf-8')).hexdigest() for k in keys.tolist()]
+    return np.array(hashes, dtype=object), bad_amount | bad_qty
+
+def _sync_accounts(db, df_acct):
+    """
+    Upserts account_master with one preload query and bulk mappings.
+    Returns (inserted, updated).
+    """
+    if df_acct is None or df_acct.empty:
+        return 0, 0
+
+    df = pd.DataFrame({
+        'account_number': _text(df_acct, '계좌번호'),
+        'owner': _text(df_acct, '소유자'),
+        'account_name': _text(df_acct, '계좌명'),
+        'broker': df_acct['증권사'].astype(object).map(str).to_numpy() if '증권사' in df_acct.columns else None,
+        'type': (_text(df_acct, '포트폴리오 구분') if '포트폴리오 구분' in df_acct.columns else _text(df_acct, '계좌구분')),
+    })
+    df['type'] = df['type'].replace('', 'General')
+    df = df[df['account_number'] != ''].drop_duplicates(subset='account_number', keep='last')
+
+    existing = {k for (k,) in db.query(models.Account.account_number)}
+    mappings = df.astype(object).where(df.notna(), None).to_dict('records')
+    new_rows = [m for m in mappings if m['account_number'] not in existing]
+    upd_rows = [m for m in mappings if m['account_number'] in existing]
+
+    db.bulk_insert_mappings(models.Account, new_rows)
+    db.bulk_update_mappings(models.Account, upd_rows)
+    return len(new_rows), len(upd_rows)
+
+def _sync_assets(db, df_asset):
+    """
+    Upserts asset_master with one preload query and bulk mappings.
+    Returns (inserted, updated).
+    """
+    if df_asset is None or df_asset.empty:
+        return 0, 0
+
+    now = datetime.utcnow()
+    df = pd.DataFrame({
+        'asset_name': _text(df_asset, '종목명'),
+        'ticker': _text(df_asset, '티커'),
+        'currency': _text(df_asset, '통화', 'KRW'),
+    })
+    df['asset_class'] = np.where(df['asset_name'].isin(['원화', '달러']), 'Cash', 'Stock')
+    df['updated_at'] = now
+    df = df[df['asset_name'] != ''].drop_duplicates(subset='asset_name', keep='last')
+
+    existing = {k for (k,) in db.query(models.Asset.asset_name)}
+    mappings = df.astype(object).to_dict('records')
+    new_rows = [m for m in mappings if m['asset_name'] not in existing]
+    upd_rows = [m for m in mappings if m['asset_name'] in existing]
+
+    db.bulk_insert_mappings(models.Asset, new_rows)
+    db.bulk_update_mappings(models.Asset, upd_rows)
+    return len(new_rows), len(upd_rows)
+
+def _prepare_transactions(df_txn):
+    """
+    Maps the GSheet transaction frame to Transaction columns in one vectorized pass.
+    Rows without a parseable date or numbers are dropped; the first occurrence of a
+    duplicate hash wins (matches the old intra-batch duplicate skip).
+    """
+    hashes, invalid = generate_sync_hashes(df_txn)
+    date_str = _text(df_txn, '날짜')
+    dates = pd.to_datetime(pd.Series(date_str), errors='coerce', format='mixed')
+
+    df = pd.DataFrame({
+        'sync_hash': hashes,
+        'date': dates.dt.date,
+        'owner': _text(df_txn, '소유자'),
+        'account_name': _text(df_txn, '계좌'),
+        'asset_name': _text(df_txn, '종목'),
+        'type': _text(df_txn, '거래구분'),
+        'amount': _float_col(df_txn, '거래금액')[0],
+        'qty': _float_col(df_txn, '수량')[0],
+        'price': 0.0, # Not in GSheet explicit column usually
+        'currency': _text(df_txn, '통화', 'KRW'),
+        'note': _text(df_txn, '비고'),
+        # Default status to Settled (완료) unless specified
+        'status': '완료',
+        'source_row_index': np.asarray(df_txn.index, dtype='int64') + 2,
+    })
+
+    valid = (date_str != '') & (date_str != 'NaT') & dates.notna().to_numpy() & ~invalid
+    df = df[valid]
+    return df.drop_duplicates(subset='sync_hash', keep='first')
+
+def _load_existing_transactions(db, hashes=None):
+    """
+    Preloads (sync_hash, id, note, currency, source_row_index) for all rows,
+    or only for the given hashes (chunked to stay under SQLite's variable limit).
+    """
+    query = db.query(
+        models.Transaction.sync_hash,
+        models.Transaction.id,
+        models.Transaction.note,
+        models.Transaction.currency,
+        models.Transaction.source_row_index,
+    )
+    if hashes is None:
+        rows = query.filter(models.Transaction.sync_hash.isnot(None)).all()
+    else:
+        hashes = list(hashes)
+        rows = []
+        for i in range(0, len(hashes), 500):
+            rows.extend(query.filter(models.Transaction.sync_hash.in_(hashes[i:i + 500])).all())
+    return pd.DataFrame(rows, columns=['sync_hash', 'id', 'old_note', 'old_currency', 'old_row_index'])
+
+def _prune_transactions(db, keep_hashes):
+    """
+    Deletes transaction_log rows whose sync_hash is no longer produced by the sheet
+    (row deleted, or edited so its hash changed, e.g. Pending -> Settled).
+    Only valid on a full reconciliation, where keep_hashes covers the whole sheet.
+    Returns the number of deleted rows.
+    """
+    existing = pd.DataFrame(
+        db.query(models.Transaction.id, models.Transaction.sync_hash)
+          .filter(models.Transaction.sync_hash.isnot(None)).all(),
+        columns=['id', 'sync_hash'])
+    gone = existing.loc[~existing['sync_hash'].isin(set(keep_hashes)), 'id'].astype('int64').tolist()
+    for i in range(0, len(gone), 500):
+        db.query(models.Transaction).filter(models.Transaction.id.in_(gone[i:i + 500])).delete(synchronize_session=False)
+    return len(gone)
+
+def _sync_transactions(db, df_txn, start=0):
+    """
+    Upserts transaction_log keyed by sync_hash.
+    Existing hashes are preloaded in one query; new rows go through a bulk insert and
+    only rows whose mutable fields (note, currency, row index) changed are bulk updated.
+    Both are folded into the materialized holdings table.
+    With start > 0 only rows from that position on are hashed and upserted; with
+    start == 0 (full reconciliation) rows whose hash left the sheet are deleted and
+    the caller must rebuild holdings if any were.
+    Returns (inserted, updated, unchanged, deleted).
+    """
+    if df_txn is None or df_txn.empty:
+        return 0, 0, 0, 0
+
+    df = _prepare_transactions(df_txn.iloc[start:])
+    deleted = _prune_transactions(db, df['sync_hash']) if start == 0 else 0
+    if df.empty:
+        return 0, 0, 0, deleted
+
+    existing = _load_existing_transactions(db, df['sync_hash'] if start else None)
+
+    df = df.merge(existing, on='sync_hash', how='left')
+    is_new = df['id'].isna()
+    is_changed = ~is_new & (
+        (df['note'] != df['old_note']) |
+        (df['currency'] != df['old_currency']) |
+        (df['source_row_index'] != df['old_row_index'])
+    )
+
+    now = datetime.utcnow()
+    txn_cols = ['sync_hash', 'date', 'owner', 'account_name', 'asset_name', 'type', 'amount',
+                'qty', 'price', 'currency', 'note', 'status', 'source_row_index']
+
+    df_new = df.loc[is_new, txn_cols].assign(synced_at=now)
+    db.bulk_insert_mappings(models.Transaction, df_new.astype(object).to_dict('records'))
+
+    df_upd = df.loc[is_changed, ['id', 'note', 'currency', 'status', 'source_row_index']].assign(synced_at=now)
+    df_upd['id'] = df_upd['id'].astype('int64')
+    db.bulk_update_mappings(models.Transaction, df_upd.astype(object).to_dict('records'))
+
+    if not deleted:
+        holdings.apply_transaction_changes(db, df.loc[is_new], df.loc[is_changed])
+
+    return len(df_new), len(df_upd), len(df) - len(df_new) - len(df_upd), deleted
+
+# --- Incremental Sync (Watermark) ---
+TXN_WORKSHEET = "00_거래일지"
+_DIGEST_COLS = ['날짜', '소유자', '계좌', '종목', '거래구분', '통화', '거래금액', '수량', '비고']
+
+def _sheet_digest(df_txn, end):
+    """
+    Content digest of every row before position `end` (the part synced last time).
+    Covers the note column, so Pending -> Settled edits are detected anywhere in
+    the sheet, and is positional, so deleted/inserted rows change it too.
+    Hashing the whole sheet is cheap (about 10 ms for 10k rows).
+    """
+    window = df_txn.iloc[:end]
+    joined = _text(window, _DIGEST_COLS[0])
+    for col in _DIGEST_COLS[1:]:
+        joined = np.char.add(np.char.add(joined, '\x1f'), _text(window, col))
+    return hashlib.md5('\x1e'.join(joined.tolist()).encode('utf-8')).hexdigest()
+
+def get_watermark(db, worksheet=TXN_WORKSHEET):
+    """
+    Returns the saved watermark dict for a worksheet
+    ({'last_row_index', 'row_count', 'digest'}) or None.
+    """
+    meta = db.get(models.SyncMetadata, f"watermark:{worksheet}")
+    if meta is None or not meta.value:
+        return None
+    try:
+        return json.loads(meta.value)
+    except ValueError:
+        return None
+
+def save_watermark(db, df_txn, worksheet=TXN_WORKSHEET):
+    """
+    Persists the watermark for the frame that was just synced. Does not commit.
+    """
+    row_count = len(df_txn)
+    watermark = {
+        'last_row_index': int(df_txn.index[-1]) + 2 if row_count else 0,
+        'row_count': row_count,
+        'digest': _sheet_digest(df_txn, row_count),
+    }
+    db.merge(models.SyncMetadata(
+        key=f"watermark:{worksheet}",
+        value=json.dumps(watermark),
+        updated_at=datetime.utcnow(),
+    ))
+    return watermark
+
+def _incremental_start(db, df_txn, worksheet=TXN_WORKSHEET):
+    """
+    Position to resume from, or 0 when a full reconciliation is needed:
+    no watermark yet, rows were deleted, or any previously synced row changed
+    (watermarks from older versions, without 'digest', also force a full pass).
+    """
+    watermark = get_watermark(db, worksheet)
+    if not watermark:
+        return 0
+    row_count = watermark.get('row_count', 0)
+    if len(df_txn) < row_count:
+        return 0
+    if _sheet_digest(df_txn, row_count) != watermark.get('digest'):
+        return 0
+    return row_count
+
+# Mirror of the '자산종합' sheet (prices/valuations only exist there)
+INVENTORY_TABLE = "sheet_inventory"
+
+def _sync_inventory(db, df_inv):
+    """
+    Replaces the inventory mirror table with the current '자산종합' frame, as-is,
+    so the DB can serve it in the same shape the pages use. Returns the row count.
+    """
+    if df_inv is None or df_inv.empty:
+        return 0
+    df_inv.to_sql(INVENTORY_TABLE, db.connection(), if_exists='replace', index=False)
+    return len(df_inv)
+
+def sync_dataframes(db, data, incremental=False):
+    """
+    Syncs already loaded sheet frames (masters, transactions, inventory) into the session.
+    With incremental=True, transactions resume from the saved watermark and fall
+    back to a full reconciliation only if earlier rows were edited or deleted.
+    Does not commit. Returns a dict of counts per table plus the sync 'mode'.
+    """
+    acct_new, acct_upd = _sync_accounts(db, data.get('account_master'))
+    asset_new, asset_upd = _sync_assets(db, data.get('asset_master'))
+    inv_rows = _sync_inventory(db, data.get('inventory'))
+
+    df_txn = data.get('transactions')
+    start = 0
+    if df_txn is not None and not df_txn.empty:
+        start = _incremental_start(db, df_txn) if incremental else 0
+    txn_new, txn_upd, txn_same, txn_del = _sync_transactions(db, df_txn, start=start)
+    if df_txn is not None and not df_txn.empty:
+        save_watermark(db, df_txn)
+
+    # New assets give earlier rows an asset_class, a freshly upgraded store has
+    # no holdings yet, and pruned rows have no delta: all need the full recompute.
+    rebuilt = bool(asset_new) or bool(txn_del) or holdings.is_empty(db)
+    if rebuilt:
+        holdings.rebuild_holdings(db)
+
+    return {
+        'mode': 'incremental' if start else 'full',
+        'accounts': {'inserted': acct_new, 'updated': acct_upd},
+        'assets': {'inserted': asset_new, 'updated': asset_upd},
+        'inventory': {'rows': inv_rows},
+        'transactions': {'inserted': txn_new, 'updated': txn_upd, 'unchanged': txn_same, 'deleted': txn_del},
+        'holdings': {'rebuilt': rebuilt},
+    }
+
+def migrate_google_sheets_to_sqlite(incremental=False):
     """
     Full migration logic:
     1. Load data from Sheets (mock or real).
     2. Sync Masters (Account/Asset).
-    3. Sync Transactions.
+    3. Sync Transactions (from the watermark if incremental=True).
+    Each table is synced with a single preload query plus bulk insert/update mappings.
     """
     # 1. Init DB
     database.initialize_sqlite_db()
@@ -42,94 +355,14 @@ def migrate_google_sheets_to_sqlite():
 
     db = next(database.get_db())
     try:
-        # 3. Sync Account Master
-        df_acct = data.get('account_master')
-        if df_acct is not None and not df_acct.empty:
-            print(f"Syncing {len(df_acct)} accounts...")
-            for _, row in df_acct.iterrows():
-                acct_num = str(row.get('계좌번호', '')).strip()
-                if not acct_num: continue
-                
-                acct = db.query(models.Account).filter_by(account_number=acct_num).first()
-                if not acct:
-                    acct = models.Account(account_number=acct_num)
-                
-                acct.owner = str(row.get('소유자', '')).strip()
-                acct.account_name = str(row.get('계좌명', '')).strip()
-                acct.broker = str(row.get('증권사', '')) if '증권사' in row else None
-                acct.type = str(row.get('포트폴리오 구분', row.get('계좌구분', ''))).strip() or "General"
-                
-                db.add(acct)
-        
-        # 4. Sync Asset Master
-        df_asset = data.get('asset_master')
-        if df_asset is not None and not df_asset.empty:
-            print(f"Syncing {len(df_asset)} assets...")
-            for _, row in df_asset.iterrows():
-                asset_name = str(row.get('종목명', '')).strip()
-                if not asset_name: continue
-                
-                asset = db.query(models.Asset).filter_by(asset_name=asset_name).first()
-                if not asset:
-                    asset = models.Asset(asset_name=asset_name)
-                
-                asset.ticker = str(row.get('티커', '')).strip()
-                asset.currency = str(row.get('통화', 'KRW')).strip()
-                asset.asset_class = 'Cash' if asset_name in ['원화', '달러'] else 'Stock'
-                asset.updated_at = datetime.utcnow()
-                
-                db.add(asset)
-
-        # 5. Sync Transactions
-        df_txn = data.get('transactions')
-        if df_txn is not None and not df_txn.empty:
-            print(f"Syncing {len(df_txn)} transactions...")
-            processed_hashes = set() # Track for intra-batch duplicates
-            
-            for idx, row in df_txn.iterrows():
-                date_str = str(row.get('날짜', '')).strip()
-                if not date_str or date_str == 'NaT': continue
-                
-                try:
-                    # Parse date
-                    dt = pd.to_datetime(date_str).date()
-                except:
-                    continue
-
-                sync_hash = generate_sync_hash(row)
-                
-                # Check for duplicates within this batch execution
-                if sync_hash in processed_hashes:
-                    continue
-                processed_hashes.add(sync_hash)
-                
-                txn = db.query(models.Transaction).filter_by(sync_hash=sync_hash).first()
-                if not txn:
-                    txn = models.Transaction(sync_hash=sync_hash)
-                
-                txn.date = dt
-                txn.owner = str(row.get('소유자', '')).strip()
-                txn.account_name = str(row.get('계좌', '')).strip()
-                txn.asset_name = str(row.get('종목', '')).strip()
-                txn.type = str(row.get('거래구분', '')).strip()
-                txn.amount = float(row.get('거래금액', 0))
-                txn.qty = float(row.get('수량', 0))
-                txn.price = 0.0 # Not in GSheet explicit column usually
-                txn.currency = str(row.get('통화', 'KRW')).strip()
-                
-                # Fee & Note
-                txn.note = str(row.get('비고', '')).strip()
-                # Default status to Settled (완료) unless specified
-                txn.status = '완료' 
-                
-                txn.source_row_index = idx + 2
-                txn.synced_at = datetime.utcnow()
-                
-                db.add(txn)
-        
+        counts = sync_dataframes(db, data, incremental=incremental)
         db.commit()
-        print("Migration complete.")
-        return True, "Migration successful."
+
+        txn = counts['transactions']
+        msg = (f"Migration successful ({counts['mode']}). Transactions: {txn['inserted']} inserted, "
+               f"{txn['updated']} updated, {txn['unchanged']} unchanged, {txn['deleted']} deleted.")
+        print(msg)
+        return True, msg
 
     except Exception as e:
         db.rollback()
@@ -69,6 +69,25 @@ class Transaction(Base):
     def __repr__(self):
         return f"<Transaction(date={self.date}, asset={self.asset_name}, type={self.type})>"
 
+class Holding(Base):
+    __tablename__ = 'holdings'
+
+    # Materialized from transaction_log (see modules/holdings.py)
+    owner = Column(String, primary_key=True)
+    account_name = Column(String, primary_key=True)
+    asset_name = Column(String, primary_key=True)
+    current_qty = Column(Float, default=0.0)
+    net_book_value_amount = Column(Float, default=0.0)
+    last_transaction_date = Column(String)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('idx_holdings_owner_asset', 'owner', 'asset_name'),
+    )
+
+    def __repr__(self):
+        return f"<Holding(owner={self.owner}, account={self.account_name}, asset={self.asset_name}, qty={self.current_qty})>"
+
 class SyncMetadata(Base):
     __tablename__ = 'sync_metadata'
     
@@ -0,0 +1,243 @@
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+import streamlit as st
+from sqlalchemy import text
+from modules import database, positions, price_store
+
+# Flow-adjusted returns: external cash flows (입금/출금 in transaction_log)
+# combined with the daily values of '자산기록'. TWR chains daily returns with the
+# flows taken out; XIRR is the money-weighted annual rate, solved by Newton's
+# method for all groups at once.
+# Dollar flows are converted at the KRW/USD rate of their date: the cached KRW=X
+# close (price_store), else the rate implied by the nearest earlier 환전 row,
+# else DEFAULT_FX_RATE when the data has no rate at all.
+
+FLOW_SIGN = {'입금': 1.0, '출금': -1.0}
+FX_TICKER = 'KRW=X'
+DEFAULT_FX_RATE = 1300.0  # KRW per USD, only when neither KRW=X closes nor 환전 rows exist
+DAYS_PER_YEAR = 365.0
+USD_CODES = ['$', 'USD']
+
+def exchange_rates(df_txn):
+    """
+    KRW per USD implied by 환전 rows (amount in the row's currency, qty in the other),
+    one value per date (daily mean).
+    """
+    df = df_txn[df_txn['type'] == '환전'].copy()
+    df['date'] = pd.to_datetime(df['date'], errors='coerce').dt.normalize()
+    amount = pd.to_numeric(df['amount'], errors='coerce')
+    qty = pd.to_numeric(df['qty'], errors='coerce')
+    from_usd = df['currency'].astype(str).str.strip().isin(USD_CODES)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df['rate'] = np.where(from_usd, qty / amount, amount / qty)
+    df = df[df['date'].notna() & np.isfinite(df['rate']) & (df['rate'] > 0)]
+    return df.groupby('date')['rate'].mean().sort_index()
+
+def rates_on(dates, fx_rate):
+    """
+    fx_rate (scalar, or Series of KRW/USD by date) looked up for each date: the last
+    rate on or before it, the first rate for earlier dates, DEFAULT_FX_RATE if empty.
+    """
+    dates = pd.DatetimeIndex(dates)
+    if not isinstance(fx_rate, pd.Series):
+        return np.full(len(dates), float(fx_rate))
+    fx = fx_rate.dropna().sort_index()
+    if fx.empty:
+        return np.full(len(dates), DEFAULT_FX_RATE)
+    pos = np.searchsorted(fx.index.to_numpy(), dates.to_numpy(), side='right') - 1
+    return fx.to_numpy(dtype='float64')[np.maximum(pos, 0)]
+
+def cash_flows(df_txn, accounts, by='portfolio', fx_rate=DEFAULT_FX_RATE):
+    """
+    Daily net external flows in KRW (+ deposit, - withdrawal), one column per group.
+    df_txn: transaction_log rows (date, owner, account_name, type, currency, amount).
+    accounts: account_master rows (owner, account_name, portfolio).
+    by: 'portfolio' or 'owner'. Transfers between accounts of the same group on
+    the same day net to zero. fx_rate: KRW per USD, scalar or by date (see rates_on).
+    """
+    df = df_txn[df_txn['type'].isin(list(FLOW_SIGN))].copy()
+    df['date'] = pd.to_datetime(df['date'], errors='coerce').dt.normalize()
+    df = df[df['date'].notna()]
+    if by == 'portfolio':
+        df = df.merge(accounts[['owner', 'account_name', 'portfolio']], on=['owner', 'account_name'], how='left')
+        df = df[df['portfolio'].notna()]
+    to_krw = np.where(df['currency'].astype(str).str.strip().isin(USD_CODES), rates_on(df['date'], fx_rate), 1.0)
+    df['flow'] = df['type'].map(FLOW_SIGN) * pd.to_numeric(df['amount'], errors='coerce').fillna(0) * to_krw
+    flows = df.pivot_table(index='date', columns=by, values='flow', aggfunc='sum', fill_value=0.0)
+    flows.columns.name = None
+    return flows.sort_index()
+
+def _align_flows(values, flows):
+    """
+    Flows moved onto value dates: a flow counts on the first value date on or
+    after it. Flows before a column's first value are already part of that value;
+    flows after the last value date are pending. Returns a (T, N) array.
+    """
+    out = np.zeros(values.shape)
+    if flows is None or flows.empty:
+        return out
+    flows = flows.reindex(columns=values.columns, fill_value=0.0)
+    pos = np.searchsorted(values.index.to_numpy(), flows.index.to_numpy(), side='left')
+    keep = pos < len(values)
+    np.add.at(out, pos[keep], flows.to_numpy(dtype='float64')[keep])
+    return out
+
+def twr_index(values, flows=None):
+    """
+    Time-weighted growth index (1.0 at each column's first value).
+    Daily return r_t = V_t / (V_{t-1} + F_t) - 1, i.e. flows at the start of the day;
+    days without a usable previous value are flat.
+    """
+    v = values.to_numpy(dtype='float64')
+    f = _align_flows(values, flows)
+    growth = np.ones(v.shape)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        base = v[:-1] + f[1:]
+        growth[1:] = np.where(base > 0, v[1:] / base, np.nan)
+    growth = np.where(np.isfinite(growth), growth, 1.0)
+    index = np.cumprod(growth, axis=0)
+    return pd.DataFrame(np.where(np.isnan(v), np.nan, index), index=values.index, columns=values.columns)
+
+def xirr(amounts, times, guess=0.1, tol=1e-10, max_iter=100):
+    """
+    Annual rates r with sum(amounts * (1 + r) ** -times) = 0, row-wise.
+    amounts: (G, D) cash flows (investor view: paid in < 0, received > 0).
+    times: (D,) or (G, D) years from the first flow.
+    Newton iterations run on all rows together; rows without both signs or
+    without convergence are NaN.
+    """
+    cf = np.asarray(amounts, dtype='float64')
+    t = np.broadcast_to(np.asarray(times, dtype='float64'), cf.shape)
+    valid = (cf > 0).any(axis=1) & (cf < 0).any(axis=1)
+    rate = np.full(len(cf), guess)
+    done = ~valid
+    for _ in range(max_iter):
+        disc = (1.0 + rate[:, None]) ** -t
+        npv = (cf * disc).sum(axis=1)
+        slope = (-t * cf * disc).sum(axis=1) / (1.0 + rate)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = np.where(~done & (slope != 0), npv / slope, 0.0)
+        rate = np.maximum(rate - step, -0.9999)
+        done |= np.abs(step) < tol * np.maximum(1.0, np.abs(rate))
+        if done.all():
+            break
+    return np.where(valid & done & np.isfinite(rate), rate, np.nan)
+
+def returns_summary(values, flows=None):
+    """
+    Per column of values (date index, one column per group):
+    Start/End dates and values, NetFlow (in the period), TWR (cumulative),
+    TWR_Ann (annualized), XIRR (annual, money-weighted).
+    """
+    values = values.sort_index()
+    values = values.select_dtypes('number')
+    v = values.to_numpy(dtype='float64')
+    f = _align_flows(values, flows)
+    index = twr_index(values, flows).to_numpy()
+    dates = values.index.to_numpy()
+    has = ~np.isnan(v)
+
+    n_rows, n_cols = v.shape
+    first = np.where(has.any(axis=0), has.argmax(axis=0), -1)
+    last = np.where(has.any(axis=0), n_rows - 1 - has[::-1].argmax(axis=0), -1)
+    cols = np.arange(n_cols)
+    ok = first >= 0
+    fi, li = np.where(ok, first, 0), np.where(ok, last, 0)
+
+    start_val, end_val = v[fi, cols], v[li, cols]
+    rows = np.arange(n_rows)[:, None]
+    in_period = (rows > fi) & (rows <= li)
+    period_flows = np.where(in_period, f, 0.0)
+
+    # Investor cash flows: initial value paid in, flows in the period, final value received
+    cf = -period_flows
+    cf[fi, cols] -= start_val
+    cf[li, cols] += end_val
+    days = (dates - dates[0]) / np.timedelta64(1, 'D')
+    t = (days[None, :] - days[fi][:, None]) / DAYS_PER_YEAR
+    irr = xirr(cf.T, np.maximum(t, 0.0))
+
+    years = (days[li] - days[fi]) / DAYS_PER_YEAR
+    twr = index[li, cols] - 1.0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        twr_ann = np.where(years > 0, (1.0 + twr) ** (1.0 / years) - 1.0, np.nan)
+
+    df = pd.DataFrame({
+        'Start': np.where(ok, dates[fi], np.datetime64('NaT')),
+        'End': np.where(ok, dates[li], np.datetime64('NaT')),
+        'StartValue': start_val,
+        'EndValue': end_val,
+        'NetFlow': period_flows.sum(axis=0),
+        'TWR': twr,
+        'TWR_Ann': twr_ann,
+        'XIRR': irr,
+    }, index=values.columns)
+    return df[ok]
+
+def load_flows(owner=None):
+    """
+    Deposit/withdrawal and 환전 rows of transaction_log and the account -> portfolio map.
+    owner: only that owner's rows (filtered in SQL).
+    """
+    mine = "owner = :owner" if owner is not None else ""
+    params = {'owner': owner} if owner is not None else {}
+    with database.engine.connect() as conn:
+        df = pd.read_sql(text(f"""
+            SELECT date, owner, account_name, type, currency, amount, qty
+            FROM transaction_log
+            WHERE type IN ('입금', '출금', '환전') {'AND ' + mine if mine else ''}
+        """), conn, params=params)
+        accounts = pd.read_sql(text(f"""
+            SELECT owner, account_name, type AS portfolio FROM account_master
+            {'WHERE ' + mine if mine else ''}
+        """), conn, params=params)
+    return df, accounts
+
+def load_fx_rates(df_txn, start, end):
+    """
+    KRW/USD by date for start..end: cached KRW=X closes (no download), with
+    the 환전-implied rates filling the days the cache does not have.
+    Errors reading the price store propagate to the caller.
+    """
+    implied = exchange_rates(df_txn)
+    store = price_store.get_price_store()
+    if store is None:
+        return implied
+    closes = store.read_closes([FX_TICKER], start, end)
+    if closes.empty:
+        return implied
+    return closes[FX_TICKER].dropna().combine_first(implied)
+
+def latest_fx_rate(owner=None):
+    """Most recent KRW/USD from load_fx_rates (KRW=X closes, else 환전 rows), or None if there is none."""
+    df, _ = load_flows(owner)
+    today = date.today()
+    rates = load_fx_rates(df, today - timedelta(days=14), today).dropna()
+    return float(rates.iloc[-1]) if not rates.empty else None
+
+def value_columns(frame):
+    """
+    Portfolio value columns of a '자산기록' frame: numeric columns other than
+    날짜/요일 and the '<port>_idx' index columns (as data_loader.calculate_dod).
+    """
+    return [c for c in frame.select_dtypes('number').columns
+            if c not in ['날짜', '요일'] and not str(c).endswith('_idx')]
+
+@st.cache_resource(max_entries=8)
+def _build_summary(txn_version, hist_version, _values, by, fx_rate, owner):
+    df, accounts = load_flows(owner)
+    if fx_rate is None:
+        fx_rate = load_fx_rates(df, _values.index.min().date(), _values.index.max().date())
+    return returns_summary(_values, cash_flows(df, accounts, by=by, fx_rate=fx_rate))
+
+def get_returns_summary(hist_analytics, by='portfolio', fx_rate=None, owner=None):
+    """
+    returns_summary for the portfolio value columns of the '자산기록' frame of an
+    analytics.HistoryAnalytics. fx_rate: KRW per USD; None takes it from the data
+    (load_fx_rates). owner: flows of that owner only (restricted sessions).
+    Cached per (transaction_log version, history version, owner).
+    """
+    frame = hist_analytics.frame
+    return _build_summary(positions._data_version(), hist_analytics.version,
+                          frame[value_columns(frame)], by, fx_rate, owner)
@@ -30,6 +30,49 @@ def calculate_portfolio_weights(df):
     df['CurrentWeight'] = df['CurrentValue'] / total_value
     return df
 
+# Display order of the Beta portfolio assets (unknown tickers sort last)
+BETA_TICKER_ORDER = ['SPY', 'QQQ', 'GMF', 'VEA', 'BND', 'TIP', 'PDBC', 'GLD', 'VNQ', '달러', '원화']
+
+# Band outcome labels, in np.select order: above band, below band, inside band
+ACTIONS = ["SELL", "BUY", "HOLD"]
+STATUSES = ["Over", "Under", "Normal"]
+
+def _band_codes(diff_weight, tolerance):
+    """0 = above the band, 1 = below, 2 = inside (indexes ACTIONS / STATUSES)."""
+    diff_weight = np.asarray(diff_weight, dtype='float64')
+    return np.select([diff_weight > tolerance, diff_weight < -tolerance], [0, 1], default=2)
+
+def order_key(values, order=BETA_TICKER_ORDER):
+    """Position of each value in `order` (len(order) for unknown values), for sorting."""
+    codes = pd.Categorical(values, categories=order).codes
+    return np.where(codes < 0, len(order), codes)
+
+def rebalance_portfolios(df, value_col, target_col, group_cols, band=TOLERANCE, relative=False):
+    """
+    Vectorized rebalancing for any number of portfolios in one frame.
+    A portfolio is a group_cols group (e.g. owner, or [target set, owner] for rows
+    stacked once per target-weight set); weights are taken against the group total. band is an absolute weight band, or a fraction of
+    each target weight when relative=True.
+    Adds PortfolioTotal, TargetAmount, DiffAmount (current - target), CurrentWeight,
+    DiffWeight, Tolerance, Status/Action (categoricals), Breach and TradeAmount
+    (|DiffAmount| where the band is breached, else 0).
+    """
+    df = df.copy()
+    total = df.groupby(group_cols, sort=False)[value_col].transform('sum')
+    df['PortfolioTotal'] = total
+    df['TargetAmount'] = total * df[target_col]
+    df['DiffAmount'] = df[value_col] - df['TargetAmount']
+    df['CurrentWeight'] = df[value_col] / total
+    df['DiffWeight'] = df['CurrentWeight'] - df[target_col]
+    df['Tolerance'] = df[target_col] * band if relative else band
+
+    codes = _band_codes(df['DiffWeight'], df['Tolerance'].to_numpy(dtype='float64'))
+    df['Status'] = pd.Categorical.from_codes(codes, categories=STATUSES)
+    df['Action'] = pd.Categorical.from_codes(codes, categories=ACTIONS)
+    df['Breach'] = codes != 2
+    df['TradeAmount'] = np.where(df['Breach'], df['DiffAmount'].abs(), 0.0)
+    return df
+
 def check_rebalancing(df):
     """
     Checks if any asset is outside the tolerance band.
@@ -42,23 +85,10 @@ def check_rebalancing(df):
     # Calculate difference
     df['Diff'] = df['CurrentWeight'] - df['TargetWeight']
     
-    # Flag if absolute diff > tolerance
-    # Only applicable for assets that are in the TARGET_WEIGHTS list (Beta Portfolio)
-    # We assume 'Beta' assets match the keys in TARGET_WEIGHTS. 
-    # Logic: If Ticker is in TARGET_WEIGHTS, check tolerance.
-    
-    def get_action(row):
-        if row['Ticker'] not in TARGET_WEIGHTS:
-            return "N/A" # or Keep
-        
-        if row['Diff'] > TOLERANCE:
-            return "SELL"
-        elif row['Diff'] < -TOLERANCE:
-            return "BUY"
-        else:
-            return "HOLD"
-
-    df['Action'] = df.apply(get_action, axis=1)
+    # Only assets in TARGET_WEIGHTS (Beta Portfolio) are checked against the band
+    in_target = df['Ticker'].isin(list(TARGET_WEIGHTS)).to_numpy()
+    actions = np.array(ACTIONS, dtype=object)[_band_codes(df['Diff'], TOLERANCE)]
+    df['Action'] = np.where(in_target, actions, "N/A")
     df['RebalanceFlag'] = df['Action'] != "HOLD"
     
     return df
@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from sqlalchemy import text
+from modules import database, holdings
+
+# Daily position engine: replays transaction_log into dense per-day arrays so
+# "holdings as of D" and "position history of X" are array lookups instead of
+# scans. Quantity/book rules are the holdings ones (holdings.transaction_deltas).
+
+class PositionEngine:
+    """
+    qty[d, k] / book[d, k]: end-of-day position for calendar day days[d] and
+    key k = (owner, asset). Built once per data version with a cumulative sum
+    over the day axis.
+    """
+
+    def __init__(self, df_txn, asset_class):
+        df = df_txn.copy()
+        df['date'] = pd.to_datetime(df['date'], errors='coerce')
+        df = df[df['date'].notna()]
+
+        keys = pd.MultiIndex.from_arrays([df['owner'], df['asset_name']])
+        key_codes, uniques = keys.factorize(sort=True)
+        self.owners = np.asarray(uniques.get_level_values(0), dtype=object)
+        self.assets = np.asarray(uniques.get_level_values(1), dtype=object)
+
+        if df.empty:
+            self.days = np.array([], dtype='datetime64[D]')
+            self.qty = np.zeros((0, 0))
+            self.book = np.zeros((0, 0))
+            return
+
+        day = df['date'].to_numpy().astype('datetime64[D]')
+        self.days = np.arange(day.min(), day.max() + np.timedelta64(1, 'D'), dtype='datetime64[D]')
+        day_idx = (day - self.days[0]).astype('int64')
+
+        qty_delta, book_delta = holdings.transaction_deltas(df, asset_class)
+        shape = (len(self.days), len(self.owners))
+        self.qty = np.zeros(shape)
+        self.book = np.zeros(shape)
+        np.add.at(self.qty, (day_idx, key_codes), qty_delta)
+        np.add.at(self.book, (day_idx, key_codes), book_delta)
+        np.cumsum(self.qty, axis=0, out=self.qty)
+        np.cumsum(self.book, axis=0, out=self.book)
+
+    def _day_index(self, date):
+        """Row for the end of `date` (last day on or before it), or -1 before history."""
+        d = np.datetime64(pd.Timestamp(date).date(), 'D')
+        return int(np.searchsorted(self.days, d, side='right')) - 1
+
+    def _key_mask(self, owner=None, asset=None):
+        mask = np.ones(len(self.owners), dtype=bool)
+        if owner is not None:
+            mask &= self.owners == owner
+        if asset is not None:
+            mask &= self.assets == asset
+        return mask
+
+    def holdings_as_of(self, date, owner=None, include_zero=False):
+        """
+        Positions at the end of `date` (optionally one owner).
+        Returns DataFrame[owner, asset_name, qty, net_book_value_amount].
+        """
+        cols = ['owner', 'asset_name', 'qty', 'net_book_value_amount']
+        i = self._day_index(date)
+        if i < 0:
+            return pd.DataFrame(columns=cols)
+        mask = self._key_mask(owner=owner)
+        qty, book = self.qty[i, mask], self.book[i, mask]
+        df = pd.DataFrame({
+            'owner': self.owners[mask],
+            'asset_name': self.assets[mask],
+            'qty': qty,
+            'net_book_value_amount': book,
+        })
+        if not include_zero:
+            df = df[~np.isclose(df['qty'], 0)]
+        return df.reset_index(drop=True)
+
+    def position_series(self, asset, owner=None, start=None, end=None, value='qty'):
+        """
+        Daily end-of-day position of one asset (summed over owners unless given).
+        value: 'qty' or 'book'. Returns a Series indexed by date.
+        """
+        matrix = self.qty if value == 'qty' else self.book
+        mask = self._key_mask(owner=owner, asset=asset)
+        lo = 0 if start is None else max(self._day_index(start), 0)
+        hi = len(self.days) if end is None else self._day_index(end) + 1
+        series = matrix[lo:hi, mask].sum(axis=1)
+        return pd.Series(series, index=pd.DatetimeIndex(self.days[lo:hi]), name=asset)
+
+def _data_version():
+    """Cheap fingerprint of transaction_log; changes whenever a sync writes to it."""
+    with database.engine.connect() as conn:
+        row = conn.execute(text("SELECT COUNT(*), MAX(id), MAX(synced_at) FROM transaction_log")).one()
+    return tuple(row)
+
+def load_transactions(owner=None):
+    """
+    Reads the columns the engine needs from transaction_log (+ asset classes).
+    owner: only that owner's rows (filtered in SQL).
+    """
+    where = "WHERE owner = :owner" if owner is not None else ""
+    with database.engine.connect() as conn:
+        df = pd.read_sql(text(f"""
+            SELECT date, owner, account_name, asset_name, type, currency, amount, qty
+            FROM transaction_log
+            {where}
+        """), conn, params={'owner': owner} if owner is not None else {})
+        classes = dict(conn.execute(text("SELECT asset_name, asset_class FROM asset_master")).all())
+    return df, classes
+
+@st.cache_resource(max_entries=8)
+def _build_engine(version, owner):
+    df, classes = load_transactions(owner)
+    return PositionEngine(df, classes)
+
+def get_position_engine(owner=None):
+    """
+    Position engine for the current transaction_log (one owner's rows if given),
+    rebuilt only after a sync changes it.
+    """
+    return _build_engine(_data_version(), owner)
@@ -0,0 +1,250 @@
+import abc
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+import pandas as pd
+import streamlit as st
+from sqlalchemy import text
+from modules import database, data_loader
+
+try:
+    import yfinance as yf
+except ImportError:
+    yf = None
+
+# Trailing day is re-fetched after this long, so today's close replaces the intraday one
+REFRESH_TTL = 3600
+DOWNLOAD_WORKERS = 8  # Concurrent ticker downloads
+FETCH_RETRIES = 2     # Per-ticker retries (exponential backoff, seconds below)
+FETCH_BACKOFF = 0.5
+
+# --- Price Sources ---
+class PriceSource(abc.ABC):
+    """
+    Where daily closes come from. fetch() returns a Series of closes indexed by
+    tz-naive date for start..end (inclusive), empty if the source has none.
+    """
+    @abc.abstractmethod
+    def fetch(self, ticker, start, end):
+        ...
+
+class YFinancePriceSource(PriceSource):
+    def __init__(self, session=None):
+        if yf is None:
+            raise ImportError("yfinance is not installed")
+        self._session = session
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        """The given session, else one per download thread (HTTP sessions are not shared across threads)."""
+        if self._session is not None:
+            return self._session
+        if getattr(self._local, 'session', None) is None:
+            self._local.session = _make_session()
+        return self._local.session
+
+    def fetch(self, ticker, start, end):
+        hist = yf.Ticker(ticker, session=self.session).history(
+            start=start.isoformat(), end=(end + timedelta(days=1)).isoformat(), interval="1d"
+        )
+        if hist.empty or 'Close' not in hist.columns:
+            return pd.Series(dtype='float64', name=ticker)
+        s_close = hist['Close']
+        # Remove timezone
+        if s_close.index.tz is not None:
+            s_close.index = s_close.index.tz_localize(None)
+        s_close.index = s_close.index.normalize()
+        s_close.name = ticker
+        return s_close
+
+class FixturePriceSource(PriceSource):
+    """Serves closes from in-memory Series (ticker -> Series); no network. Counts calls."""
+    def __init__(self, closes):
+        self.closes = closes
+        self.calls = []
+
+    def fetch(self, ticker, start, end):
+        self.calls.append((ticker, start, end))
+        s = self.closes.get(ticker)
+        if s is None:
+            return pd.Series(dtype='float64', name=ticker)
+        s = s[(s.index >= pd.Timestamp(start)) & (s.index <= pd.Timestamp(end))]
+        return s.rename(ticker)
+
+def _make_session():
+    """HTTP session for yfinance: curl_cffi (Chrome impersonation) if present, else requests."""
+    try:
+        from curl_cffi import requests as cffi_requests
+        # Impersonate Chrome to avoid rate limiting
+        session = cffi_requests.Session(impersonate="chrome")
+        session.verify = False
+    except ImportError:
+        # Fallback to standard requests if curl_cffi missing
+        import requests
+        from requests.packages.urllib3.exceptions import InsecureRequestWarning
+        import warnings
+        warnings.simplefilter('ignore', InsecureRequestWarning)
+        session = requests.Session()
+        session.verify = False
+    return session
+
+# --- Store ---
+class PriceStore:
+    """
+    Daily closes cached in price_history (keyed by ticker, date). Only the part of
+    a requested range outside a ticker's price_coverage is fetched from the source.
+    Reads use the pooled reader engine, writes the single writer engine
+    (the app's shared ones, or a pair for db_file).
+    """
+    def __init__(self, source, db_file=None, max_workers=DOWNLOAD_WORKERS,
+                 retries=FETCH_RETRIES, backoff=FETCH_BACKOFF):
+        self.source = source
+        self.db_file = db_file
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        if db_file is None:
+            self.read_engine, self.write_engine = database.engine, database.write_engine
+        else:
+            self.read_engine = database.create_read_engine(db_file)
+            self.write_engine = database.create_write_engine(db_file)
+
+    def _missing_ranges(self, coverage, start, end, now=None):
+        """(start, end) date ranges to fetch for one ticker, given its coverage row."""
+        if coverage is None:
+            return [(start, end)]
+        cov_start = date.fromisoformat(coverage[0])
+        cov_end = date.fromisoformat(coverage[1])
+        fetched_at = coverage[2]
+        now = now or time.time()
+
+        ranges = []
+        if start < cov_start:
+            ranges.append((start, cov_start - timedelta(days=1)))
+        # The last covered day may hold an intraday price; re-read it with the tail
+        stale_tail = cov_end >= date.today() - timedelta(days=1) and now - fetched_at > REFRESH_TTL
+        if end > cov_end or (end >= cov_end and stale_tail):
+            ranges.append((cov_end, end))
+        return ranges
+
+    def _plan(self, conn, ticker, start, end):
+        coverage = conn.execute(
+            text("SELECT start_date, end_date, fetched_at FROM price_coverage WHERE ticker = :ticker"),
+            {'ticker': ticker},
+        ).fetchone()
+        return coverage, self._missing_ranges(coverage, start, end)
+
+    def _fetch(self, ticker, ranges):
+        """Fetches the given ranges, retrying any source error with backoff."""
+        fetch = data_loader.retry_with_backoff(
+            retries=self.retries, backoff_in_seconds=self.backoff, retry_if=lambda e: True
+        )(self.source.fetch)
+        return [fetch(ticker, lo, hi) for lo, hi in ranges]
+
+    def _save(self, ticker, coverage, start, fetched):
+        """
+        Stores fetched closes and extends coverage to the last returned date (not
+        the requested end), so days the source has not published yet are asked
+        for again. An empty reply leaves coverage untouched.
+        """
+        rows = [{'ticker': ticker, 'date': idx.date().isoformat(), 'close': float(v)}
+                for s in fetched for idx, v in s.dropna().items()]
+        if not rows:
+            # Bad ticker, a throttled empty reply or nothing new: retry next time
+            return 0
+
+        last = max(r['date'] for r in rows)
+        new_start = min([start] + ([date.fromisoformat(coverage[0])] if coverage else []))
+        new_end = max([date.fromisoformat(last)] + ([date.fromisoformat(coverage[1])] if coverage else []))
+        with self.write_engine.begin() as conn:
+            conn.execute(
+                text("INSERT OR REPLACE INTO price_history (ticker, date, close) VALUES (:ticker, :date, :close)"),
+                rows,
+            )
+            conn.execute(
+                text("INSERT OR REPLACE INTO price_coverage (ticker, start_date, end_date, fetched_at) "
+                     "VALUES (:ticker, :start, :end, :fetched_at)"),
+                {'ticker': ticker, 'start': new_start.isoformat(), 'end': new_end.isoformat(),
+                 'fetched_at': time.time()},
+            )
+        return len(rows)
+
+    def update(self, ticker, start, end):
+        """
+        Fetches whatever of start..end is not cached yet. Returns the number of
+        fetched rows. Source errors propagate and leave coverage unchanged.
+        """
+        with self.read_engine.connect() as conn:
+            coverage, ranges = self._plan(conn, ticker, start, end)
+        if not ranges:
+            return 0
+        return self._save(ticker, coverage, start, self._fetch(ticker, ranges))
+
+    def read_closes(self, tickers, start, end):
+        """Wide frame of cached closes (date index, one column per ticker)."""
+        if not tickers:
+            return pd.DataFrame()
+        names = [f"t{i}" for i in range(len(tickers))]
+        with self.read_engine.connect() as conn:
+            df = pd.read_sql(
+                text(f"SELECT ticker, date, close FROM price_history "
+                     f"WHERE ticker IN ({', '.join(':' + n for n in names)}) AND date BETWEEN :start AND :end"),
+                conn, params={**dict(zip(names, tickers)), 'start': start.isoformat(), 'end': end.isoformat()},
+            )
+        if df.empty:
+            return pd.DataFrame()
+        df['date'] = pd.to_datetime(df['date'])
+        wide = df.pivot(index='date', columns='ticker', values='close')
+        return wide[[t for t in tickers if t in wide.columns]]
+
+    def get_closes(self, tickers, start, end, progress=None):
+        """
+        Ensures start..end is cached for every ticker and returns
+        (closes_wide, failed) where failed maps ticker -> reason.
+        Missing ranges are downloaded concurrently (max_workers threads, each ticker
+        retried with backoff); writes and progress(done, total) stay on the caller's thread.
+        """
+        failed = {}
+        with self.read_engine.connect() as conn:
+            plans = {t: self._plan(conn, t, start, end) for t in tickers}
+        todo = [t for t, (_, ranges) in plans.items() if ranges]
+        done = len(tickers) - len(todo)
+        if progress and done:
+            progress(done, len(tickers))
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(todo) or 1))) as pool:
+            futures = {pool.submit(self._fetch, t, plans[t][1]): t for t in todo}
+            for future in as_completed(futures):
+                t = futures[future]
+                try:
+                    self._save(t, plans[t][0], start, future.result())
+                except Exception as e:
+                    print(f"Price fetch failed ({t}): {e}")
+                    failed[t] = str(e) or type(e).__name__
+                done += 1
+                if progress:
+                    progress(done, len(tickers))
+
+        closes = self.read_closes(tickers, start, end)
+        for t in tickers:
+            if t not in failed and t not in closes.columns:
+                failed[t] = "no data"
+        return closes, failed
+
+# --- Calculations (served from the local store) ---
+def daily_returns(closes):
+    """Simple daily returns per column."""
+    return closes.sort_index().pct_change(fill_method=None).iloc[1:]
+
+def correlation_matrix(closes, returns=False):
+    """Pairwise correlation of closes (as the Correlation tab plots), or of daily returns."""
+    return (daily_returns(closes) if returns else closes).corr()
+
+@st.cache_resource
+def get_price_store():
+    """Process-wide store backed by yfinance (None if yfinance is not installed)."""
+    if yf is None:
+        return None
+    return PriceStore(YFinancePriceSource())
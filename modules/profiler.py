@@ -0,0 +1,187 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Rerun profiler: named, nested spans collected per Streamlit rerun.
+# Each script run (one thread per session) gets its own trace through a
+# context variable; finished traces go to a process-wide ring buffer that the
+# admin sidebar panel summarizes (flame view of the last rerun, p50/p95 per span).
+# JSONL export is chosen per session, so it travels with the trace.
+# Spans outside a rerun trace (scripts, worker threads) cost one lookup and are ignored.
+# st.stop()/st.rerun() raise past the end of app.py; use stop()/rerun() below so
+# the trace is still recorded.
+
+HISTORY_SIZE = 200  # Reruns kept for percentiles
+EXPORT_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'profile_reruns.jsonl')
+
+_current = contextvars.ContextVar('rerun_trace', default=None)
+
+class RerunTrace:
+    """Spans of one rerun: (name, start offset s, duration s, depth), in start order."""
+
+    def __init__(self, label=None, export_path=None):
+        self.label = label
+        self.export_path = export_path
+        self.status = None
+        self.started_at = datetime.now()
+        self.t0 = time.perf_counter()
+        self.spans = []
+        self.depth = 0
+        self.total = None
+
+    def begin(self, name):
+        index = len(self.spans)
+        self.spans.append([name, time.perf_counter() - self.t0, None, self.depth])
+        self.depth += 1
+        return index
+
+    def end(self, index):
+        span = self.spans[index]
+        if span[2] is None:
+            span[2] = time.perf_counter() - self.t0 - span[1]
+            self.depth = span[3]
+
+    def finish(self, status='ok'):
+        # Close spans left open (e.g. a page that returned early)
+        for index, span in enumerate(self.spans):
+            if span[2] is None:
+                self.end(index)
+        self.total = time.perf_counter() - self.t0
+        self.status = status
+        return self
+
+    def to_frame(self):
+        return pd.DataFrame(self.spans, columns=['span', 'start', 'duration', 'depth'])
+
+    def to_record(self):
+        return {
+            'ts': self.started_at.isoformat(timespec='seconds'),
+            'label': self.label,
+            'status': self.status,
+            'total_ms': round((self.total or 0.0) * 1e3, 3),
+            'spans': [{'name': n, 'start_ms': round(s * 1e3, 3), 'duration_ms': round((d or 0.0) * 1e3, 3), 'depth': depth}
+                      for n, s, d, depth in self.spans],
+        }
+
+def start_rerun(label=None, export_path=None):
+    """
+    Starts the trace of the current script run (call once, at the top of app.py).
+    export_path: JSONL file this rerun is appended to (None: not exported).
+    A trace still open on this thread (run aborted by an exception) is recorded first.
+    """
+    if _current.get() is not None:
+        finish_rerun(status='aborted')
+    trace = RerunTrace(label, export_path)
+    _current.set(trace)
+    return trace
+
+def current_trace():
+    return _current.get()
+
+def begin(name):
+    """Opens a span without a with-block (for long page sections); pass the token to end()."""
+    trace = _current.get()
+    return (trace, trace.begin(name)) if trace is not None else None
+
+def end(token):
+    if token is not None:
+        token[0].end(token[1])
+
+@contextmanager
+def span(name):
+    """Times the block as a span of the current rerun (no-op outside one)."""
+    token = begin(name)
+    try:
+        yield
+    finally:
+        end(token)
+
+def timed(name=None):
+    """Decorator: each call is a span named `name` (default module.function)."""
+    def decorator(func):
+        label = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class ProfileStore:
+    """Finished reruns (ring buffer); each is also appended to its trace's export_path, if set."""
+
+    def __init__(self, size=HISTORY_SIZE):
+        self._traces = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, trace):
+        with self._lock:
+            self._traces.append(trace)
+        path = trace.export_path
+        if path:
+            try:
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(trace.to_record(), ensure_ascii=False) + "\n")
+            except OSError as e:
+                print(f"Profiler export failed: {e}")
+
+    def last(self):
+        with self._lock:
+            return self._traces[-1] if self._traces else None
+
+    def summary(self):
+        """
+        Per span name over the buffered reruns (time summed within a rerun):
+        reruns, calls, p50_ms, p95_ms, last_ms. Sorted by p95, slowest first.
+        """
+        with self._lock:
+            traces = list(self._traces)
+        if not traces:
+            return pd.DataFrame(columns=['span', 'reruns', 'calls', 'p50_ms', 'p95_ms', 'last_ms'])
+        rows = [(i, n, d) for i, t in enumerate(traces) for n, _, d, _ in t.spans]
+        rows += [(i, '(rerun total)', t.total) for i, t in enumerate(traces)]
+        df = pd.DataFrame(rows, columns=['rerun', 'span', 'duration'])
+        per_rerun = df.groupby(['span', 'rerun']).agg(ms=('duration', 'sum'), calls=('duration', 'size')).reset_index()
+        per_rerun['ms'] *= 1e3
+        last = per_rerun[per_rerun['rerun'] == len(traces) - 1].set_index('span')['ms']
+        out = per_rerun.groupby('span').agg(
+            reruns=('rerun', 'nunique'),
+            calls=('calls', 'sum'),
+            p50_ms=('ms', lambda x: np.percentile(x, 50)),
+            p95_ms=('ms', lambda x: np.percentile(x, 95)),
+        )
+        out['last_ms'] = last.reindex(out.index)
+        return out.sort_values('p95_ms', ascending=False).reset_index()
+
+@st.cache_resource
+def get_store():
+    return ProfileStore()
+
+def finish_rerun(status='ok'):
+    """Closes the current trace and records it. Returns it (None outside a rerun)."""
+    trace = _current.get()
+    if trace is None:
+        return None
+    _current.set(None)
+    get_store().record(trace.finish(status))
+    return trace
+
+def stop():
+    """st.stop() that records the current trace first."""
+    finish_rerun(status='stopped')
+    st.stop()
+
+def rerun():
+    """st.rerun() that records the current trace first."""
+    finish_rerun(status='rerun')
+    st.rerun()
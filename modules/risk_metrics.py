@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+
+# Rolling risk metrics for value series (one column per portfolio).
+# Pure pandas/NumPy (no Streamlit), so it can be used from scripts as well.
+# Window sums come from one cumulative sum per quantity (of mean-centered values,
+# so variances don't lose precision to E[x²]-E[x]²) and drawdowns from block-wise
+# running max/min scans, so every metric is O(n) in the series length.
+# Everything is vectorized across all columns at once.
+
+TRADING_DAYS = 252
+WINDOWS = {"1M": 21, "3M": 63, "6M": 126, "1Y": 252}
+METRICS = ['volatility', 'sharpe', 'sortino', 'calmar', 'mdd', 'beta']
+
+def _rolling_sum(x, window):
+    """Trailing-window sums of a (T, N) array; NaN until the window is full or if it holds a NaN."""
+    valid = ~np.isnan(x)
+    c = np.cumsum(np.vstack([np.zeros((1, x.shape[1])), np.where(valid, x, 0.0)]), axis=0)
+    n = np.cumsum(np.vstack([np.zeros((1, x.shape[1])), valid]), axis=0)
+    out = np.full(x.shape, np.nan)
+    if len(x) >= window:
+        sums = c[window:] - c[:-window]
+        full = (n[window:] - n[:-window]) == window
+        out[window - 1:] = np.where(full, sums, np.nan)
+    return out
+
+def _rolling_mean(x, window):
+    return _rolling_sum(x, window) / window
+
+def _centered(x):
+    """x minus its per-column mean over the non-NaN values."""
+    valid = ~np.isnan(x)
+    return x - np.where(valid, x, 0.0).sum(axis=0) / np.maximum(valid.sum(axis=0), 1)
+
+def _rolling_cov(x, y, window):
+    """Trailing-window sample covariance (ddof=1, as pandas .cov()) of (T, N) and (T, N or 1) arrays."""
+    dx, dy = _centered(x), _centered(y)
+    sx, sy = _rolling_sum(dx, window), _rolling_sum(dy, window)
+    return (_rolling_sum(dx * dy, window) - sx * sy / window) / (window - 1)
+
+def _rolling_mdd(values, window):
+    """
+    Max drawdown of each trailing window of a (T, N) array, using only the values
+    inside the window (peak and trough both in it). NaN until the window is full
+    or if it holds a NaN.
+    The series is cut into blocks of `window` rows (van Herk/Gil-Werman): a window
+    is the tail of one block plus the head of the next, and the drawdown of two
+    joined segments A, B is min(dd_A, dd_B, min_B / max_A - 1). Heads come from
+    forward running max/min within each block, tails from reversed ones; O(n).
+    """
+    T, N = values.shape
+    out = np.full(values.shape, np.nan)
+    if T < window:
+        return out
+    blocks = -(-T // window)
+    padded = np.full((blocks * window, N), np.nan)
+    padded[:T] = values
+    v = padded.reshape(blocks, window, N)
+    rev = v[:, ::-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Block start -> row: running max/min, worst drawdown with the trough at or before the row
+        head_max = np.maximum.accumulate(v, axis=1)
+        head_min = np.minimum.accumulate(v, axis=1)
+        head_dd = np.minimum.accumulate(v / head_max - 1, axis=1)
+        # Row -> block end: running max/min, worst drawdown with the peak at or after the row
+        tail_max = np.maximum.accumulate(rev, axis=1)[:, ::-1]
+        tail_min = np.minimum.accumulate(rev, axis=1)[:, ::-1]
+        tail_dd = np.minimum.accumulate((tail_min / v - 1)[:, ::-1], axis=1)[:, ::-1]
+
+        head_dd, head_min = head_dd.reshape(-1, N), head_min.reshape(-1, N)
+        tail_dd, tail_max = tail_dd.reshape(-1, N), tail_max.reshape(-1, N)
+        end = np.arange(window - 1, T)
+        start = end - window + 1
+        joined = np.minimum(np.minimum(tail_dd[start], head_dd[end]), head_min[end] / tail_max[start] - 1)
+        # A window starting on a block boundary is exactly that block
+        aligned = (start % window == 0)[:, None]
+        out[window - 1:] = np.where(aligned, head_dd[end], joined)
+    return out
+
+def rolling_risk(prices, window=63, benchmark=None, risk_free=0.0):
+    """
+    prices: DataFrame of values (date index, one column per portfolio).
+    benchmark: column name of prices or a Series of benchmark values (beta is
+    omitted when None). risk_free: annual rate.
+    Returns {metric: DataFrame} for METRICS, each aligned to prices.index:
+      volatility  annualized std of daily returns
+      sharpe      annualized (mean - rf) / std
+      sortino     annualized (mean - rf) / downside deviation
+      calmar      annualized window return / |mdd|
+      mdd         worst peak-to-trough drawdown inside the window (window values)
+      beta        cov(r, r_bench) / var(r_bench)
+    """
+    prices = prices.sort_index()
+    values = prices.to_numpy(dtype='float64')
+    returns = np.full(values.shape, np.nan)
+    returns[1:] = values[1:] / values[:-1] - 1
+    rf = risk_free / TRADING_DAYS
+    ann = np.sqrt(TRADING_DAYS)
+
+    mean = _rolling_mean(returns, window)
+    std = np.sqrt(np.clip(_rolling_cov(returns, returns, window), 0, None)) # sample std, as pandas .std()
+    downside = np.sqrt(_rolling_mean(np.minimum(returns - rf, 0.0) ** 2, window))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = {
+            'volatility': std * ann,
+            'sharpe': (mean - rf) / std * ann,
+            'sortino': (mean - rf) / downside * ann,
+        }
+
+        out['mdd'] = mdd = _rolling_mdd(values, window)
+
+        ann_return = np.full(values.shape, np.nan)
+        ann_return[window:] = (values[window:] / values[:-window]) ** (TRADING_DAYS / window) - 1
+        out['calmar'] = np.where(mdd < 0, ann_return / np.abs(mdd), np.nan)
+
+        if benchmark is not None:
+            bench = prices[benchmark] if isinstance(benchmark, str) else benchmark.reindex(prices.index)
+            b = bench.to_numpy(dtype='float64')
+            rb = np.full(b.shape, np.nan)
+            rb[1:] = b[1:] / b[:-1] - 1
+            rb = rb[:, None]
+            out['beta'] = _rolling_cov(returns, rb, window) / _rolling_cov(rb, rb, window)
+
+    return {k: pd.DataFrame(v, index=prices.index, columns=prices.columns) for k, v in out.items()}
+
+def latest_summary(risk):
+    """Last available value of each metric per column (rows: columns, cols: metrics)."""
+    return pd.DataFrame({k: df.ffill().iloc[-1] if len(df) else pd.Series(dtype='float64')
+                         for k, df in risk.items()})
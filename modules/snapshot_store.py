@@ -0,0 +1,101 @@
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+SNAPSHOT_DIR = ".snapshots"
+
+def is_available():
+    """Snapshots need pyarrow (installed with streamlit); without it the store is a no-op."""
+    return pa is not None
+
+def _path(worksheet):
+    return os.path.join(SNAPSHOT_DIR, f"{worksheet}.arrow")
+
+JSON_COLUMNS_KEY = b'json_columns'
+
+def _json_cell(value):
+    # None -> null, NaN -> NaN: both come back as they went in
+    if isinstance(value, np.generic):
+        value = value.item()
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+def _to_arrow(df):
+    """
+    Converts a cleaned sheet frame to an Arrow table.
+    Sheet columns can mix numbers and text (e.g. tickers '005930' read as ints);
+    Arrow has no type for those, so each cell is stored JSON-encoded and the
+    column is listed under JSON_COLUMNS_KEY, to be decoded back to the same
+    Python values on read.
+    """
+    mixed = []
+    for col in df.columns[df.dtypes == object]:
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            mixed.append(col)
+    if mixed:
+        df = df.copy()
+        for col in mixed:
+            df[col] = pd.Series([_json_cell(v) for v in df[col]], index=df.index, dtype=object)
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    return table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        JSON_COLUMNS_KEY: json.dumps([str(c) for c in mixed]).encode(),
+    })
+
+def write_snapshot(worksheet, df):
+    """
+    Saves a cleaned worksheet frame as an uncompressed Arrow IPC file.
+    Written to a temp file and renamed, so readers never see a partial file.
+    Returns True on success.
+    """
+    if not is_available() or df is None:
+        return False
+    try:
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        table = _to_arrow(df)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            b'saved_at': str(time.time()).encode(),
+        })
+        tmp = _path(worksheet) + ".tmp"
+        with pa.OSFile(tmp, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp, _path(worksheet))
+        return True
+    except Exception as e:
+        print(f"Snapshot write failed ({worksheet}): {e}")
+        return False
+
+def read_snapshot(worksheet):
+    """
+    Loads a worksheet snapshot via a memory map, so processes reading the same
+    file share its pages through the OS cache while it is decoded. The frame is
+    converted into ordinary writable memory, with mixed columns decoded back to
+    their original values, so it behaves like a frame fetched from the network.
+    Returns (df, saved_at) or (None, None) if unavailable.
+    """
+    path = _path(worksheet)
+    if not is_available() or not os.path.exists(path):
+        return None, None
+    try:
+        with pa.memory_map(path, 'r') as source:
+            table = pa.ipc.open_file(source).read_all()
+        metadata = table.schema.metadata or {}
+        saved_at = float(metadata.get(b'saved_at', b'0'))
+        df = table.to_pandas().copy()
+        for col in json.loads(metadata.get(JSON_COLUMNS_KEY, b'[]')):
+            if col in df.columns:
+                df[col] = pd.Series([json.loads(v) for v in df[col]], index=df.index, dtype=object)
+        return df, saved_at
+    except Exception as e:
+        print(f"Snapshot read failed ({worksheet}): {e}")
+        return None, None
@@ -1,24 +1,30 @@
 import streamlit as st
 import pandas as pd
+import time
 from datetime import datetime
-from modules import database, models, migration, data_loader
-from sqlalchemy import func
+from modules import database, models, migration, data_loader, profiler
+
+# Seconds between automatic re-syncs within one session (matches the sheet cache TTL)
+SYNC_INTERVAL = 600
 
 def get_last_synced_row_index(db):
     """
-    Returns the maximum source_row_index from the transaction_log.
+    Returns the last synced sheet row index from the persisted watermark.
     Used to identify where to start scanning for new rows.
     """
-    max_idx = db.query(func.max(models.Transaction.source_row_index)).scalar()
-    return max_idx if max_idx is not None else 0
+    watermark = migration.get_watermark(db)
+    return watermark.get('last_row_index', 0) if watermark else 0
 
+@profiler.timed()
 def auto_sync():
     """
-    Automatically syncs data on app startup.
+    Automatically syncs data on app startup and again every SYNC_INTERVAL seconds.
     Uses efficient caching and incremental checks.
     """
-    # 1. Check if we already synced in this session run (prevent redundant checks on interaction)
-    if "data_synced" in st.session_state and st.session_state.data_synced:
+    # 1. Check if we already synced recently in this session (prevent redundant checks on interaction)
+    # Pages read from the DB mirror, so re-sync once the sheet cache TTL has passed.
+    last_ts = st.session_state.get("last_sync_ts", 0)
+    if st.session_state.get("data_synced") and time.time() - last_ts < SYNC_INTERVAL:
         return
 
     msg_placeholder = st.empty()
@@ -30,51 +36,29 @@ def auto_sync():
         data = data_loader.load_data()
         
         if not data:
-            msg_placeholder.error("Failed to load data from Google Sheets.")
+            st.toast("Failed to load data from Google Sheets.", icon="⚠️")
             return
 
         # 3. Incremental Logic
-        # We assume data_loader returned the full dataset (or what matches the sheet).
-        # We verify if we need to insert anything.
-        
-        db = next(database.get_db())
-        last_idx = get_last_synced_row_index(db)
-        
+        # The watermark in sync_metadata tells the migration where the last sync stopped.
+        # Only rows past it are hashed/upserted; a full reconciliation (which also
+        # prunes rows gone from the sheet) runs when earlier rows were edited or deleted.
         df_txn = data.get('transactions')
         if df_txn is not None and not df_txn.empty:
-            # Check the max index in the new data (approximate by length if index not explicit)
-            # data_loader doesn't return the raw row index explicitly in the dataframe value, 
-            # but migration logic calculates it as idx + 2.
-            # So total rows + 1 should be roughly the max index.
-            
-            estimated_new_rows = len(df_txn) # Total rows in sheet
-            # If we have significantly more rows in sheet than the Max Index in DB, strictly sync.
-            # Or if it's just safer to run the robust deduplication migration every time (since it's fast locally).
-            
-            # For robustness in Phase 2, we RUN the migration logic 
-            # because migration.py now has DUPLICATE DETECTION.
-            # It will quickly skip existing hashes.
-            
-            # Only run if we actually have data
-            success, msg = migration.migrate_google_sheets_to_sqlite()
+            success, msg = migration.migrate_google_sheets_to_sqlite(incremental=True)
             
             if success:
-                msg_placeholder.success(f"Rx: {msg}")
-                # Refresh Streamlit Cache if *something* changed? 
-                # Actually data_loader cache is GSheet side. 
-                # If DB updated, we might need to clear *Query Caches* if we had them.
+                st.toast(f"Rx: {msg}", icon="✅")
             else:
-                msg_placeholder.warning(f"Sync Issue: {msg}")
+                st.toast(f"Sync Issue: {msg}", icon="⚠️")
 
         st.session_state.data_synced = True
+        st.session_state.last_sync_ts = time.time()
         st.session_state.last_sync_time = datetime.now().strftime('%H:%M:%S')
         
     except Exception as e:
-        msg_placeholder.error(f"Auto-sync failed: {e}")
+        st.toast(f"Auto-sync failed: {e}", icon="❌")
         st.session_state.last_sync_time = "Failed"
     finally:
-        db.close()
-        # Fade out message
-        import time
-        time.sleep(1)
+        # Results are shown as toasts (they fade on their own), so nothing blocks the rerun
         msg_placeholder.empty()
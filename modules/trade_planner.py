@@ -0,0 +1,212 @@
+import numpy as np
+import pandas as pd
+from modules import performance, portfolio_logic
+
+# Turns current holdings + target weights into an executable order list:
+# integer lots, per-currency cash (KRW/USD) with FX conversion, fees, and the
+# fewest trades that get tracking error close to the best reachable.
+
+FEE_RATE = 0.0025      # Brokerage fee per trade amount
+FX_FEE_RATE = 0.001    # Spread/fee on KRW <-> USD conversion
+TE_SLACK = 0.001       # Accept tracking error within this of the all-trades optimum
+CASH_TICKERS = {'원화': 'KRW', '달러': 'USD'}
+
+def tracking_error(weights, targets):
+    """Root of summed squared weight deviations."""
+    return float(np.sqrt(np.sum((np.asarray(weights) - np.asarray(targets)) ** 2)))
+
+def plan_trades(df, cash, fx_rate, fee_rate=FEE_RATE, fx_fee_rate=FX_FEE_RATE,
+                te_slack=TE_SLACK, band=0.0, max_trades=None):
+    """
+    df: one row per asset with Ticker, Qty, Price (in its own currency),
+        Currency ('KRW'/'USD'), TargetWeight and optional LotSize (default 1).
+    cash: {'KRW': amount, 'USD': amount}. fx_rate: KRW per USD.
+    Weights are against total equity in KRW (assets + cash).
+
+    1. Ideal integer-lot quantity per asset: round(target value / lot value).
+    2. Candidate trades ranked by squared-deviation reduction; the shortest prefix
+       whose tracking error is within te_slack of taking them all is kept
+       (optionally capped at max_trades; assets within `band` are left alone).
+    3. Sells fund buys per currency; a shortfall is covered by converting the other
+       currency's surplus, and any remaining one scales that currency's buys down
+       to whole lots.
+
+    Returns (orders, summary).
+    """
+    df = df.reset_index(drop=True)
+    qty = df['Qty'].to_numpy(dtype='float64')
+    price = df['Price'].to_numpy(dtype='float64')
+    target = df['TargetWeight'].to_numpy(dtype='float64')
+    lot = df['LotSize'].to_numpy(dtype='float64') if 'LotSize' in df.columns else np.ones(len(df))
+    is_usd = (df['Currency'] == 'USD').to_numpy()
+    to_krw = np.where(is_usd, fx_rate, 1.0)
+
+    cash = {'KRW': float(cash.get('KRW', 0.0)), 'USD': float(cash.get('USD', 0.0))}
+    price_krw = price * to_krw
+    value = qty * price_krw
+    total = value.sum() + cash['KRW'] + cash['USD'] * fx_rate
+    if total <= 0:
+        return pd.DataFrame(), {'te_before': 0.0, 'te_after': 0.0, 'trades': 0,
+                                'fx': {'KRW->USD': 0.0, 'USD->KRW': 0.0}, 'fees_krw': 0.0}
+
+    # 1. Ideal lots
+    lot_value = np.where(price_krw > 0, lot * price_krw, np.inf)
+    ideal = np.maximum(np.round(target * total / lot_value), 0) * lot
+    ideal = np.where(np.isfinite(lot_value), ideal, qty)
+    delta = ideal - qty
+
+    # 2. Fewest trades for (near) minimum tracking error
+    w_before = value / total
+    dev_before = (w_before - target) ** 2
+    dev_after = (ideal * price_krw / total - target) ** 2
+    gain = dev_before - dev_after
+    candidate = (delta != 0) & (gain > 0) & (np.abs(w_before - target) > band)
+
+    order = np.argsort(-np.where(candidate, gain, -np.inf), kind='stable')[:candidate.sum()]
+    te_path = np.sqrt(dev_before.sum() - np.concatenate([[0.0], np.cumsum(gain[order])]))
+    k = int(np.argmax(te_path <= te_path[-1] + te_slack))
+    if max_trades is not None:
+        k = min(k, max_trades)
+    chosen = np.zeros(len(df), dtype=bool)
+    chosen[order[:k]] = True
+    trade = np.where(chosen, delta, 0.0)
+
+    # 3. Cash per currency: sells fund buys, then FX, then scale buys down
+    fx = {'KRW->USD': 0.0, 'USD->KRW': 0.0}
+    for _ in range(2):
+        avail, need = {}, {}
+        for cur, mask in (('KRW', ~is_usd), ('USD', is_usd)):
+            sells = np.where(mask & (trade < 0), -trade * price, 0.0).sum()
+            buys = np.where(mask & (trade > 0), trade * price, 0.0).sum()
+            avail[cur] = cash[cur] + sells * (1 - fee_rate)
+            need[cur] = buys * (1 + fee_rate)
+
+        usd_short = need['USD'] - avail['USD']
+        krw_short = need['KRW'] - avail['KRW']
+        if usd_short > 0 and krw_short < 0:
+            krw = min(usd_short * fx_rate * (1 + fx_fee_rate), -krw_short)
+            fx['KRW->USD'] += krw
+            cash['KRW'] -= krw
+            cash['USD'] += krw / fx_rate / (1 + fx_fee_rate)
+        elif krw_short > 0 and usd_short < 0:
+            usd = min(krw_short / fx_rate * (1 + fx_fee_rate), -usd_short)
+            fx['USD->KRW'] += usd
+            cash['USD'] -= usd
+            cash['KRW'] += usd * fx_rate / (1 + fx_fee_rate)
+        else:
+            break
+
+    for cur, mask in (('KRW', ~is_usd), ('USD', is_usd)):
+        sells = np.where(mask & (trade < 0), -trade * price, 0.0).sum()
+        buy_mask = mask & (trade > 0)
+        buys = np.where(buy_mask, trade * price, 0.0).sum() * (1 + fee_rate)
+        avail = cash[cur] + sells * (1 - fee_rate)
+        if buys > avail + 1e-9:
+            scale = max(avail, 0.0) / buys
+            trade = np.where(buy_mask, np.floor(trade * scale / lot) * lot, trade)
+
+    # Orders + summary
+    new_qty = qty + trade
+    w_after = new_qty * price_krw / total
+    amount = np.abs(trade) * price
+    traded = trade != 0
+    orders = pd.DataFrame({
+        'Ticker': df['Ticker'],
+        'Side': np.where(trade > 0, 'BUY', 'SELL'),
+        'Qty': np.abs(trade),
+        'Price': price,
+        'Currency': df['Currency'],
+        'Amount': amount,
+        'AmountKRW': amount * to_krw,
+        'Fee': amount * fee_rate,
+        'WeightBefore': w_before,
+        'WeightAfter': w_after,
+        'TargetWeight': target,
+    })[traded]
+    orders = orders.iloc[np.argsort(portfolio_logic.order_key(orders['Ticker']), kind='stable')]
+
+    summary = {
+        'te_before': tracking_error(w_before, target),
+        'te_after': tracking_error(w_after, target),
+        'trades': int(traded.sum()),
+        'fx': {k: float(v) for k, v in fx.items()},
+        'fees_krw': float((orders['Fee'] * np.where(orders['Currency'] == 'USD', fx_rate, 1.0)).sum()),
+    }
+    return orders.reset_index(drop=True), summary
+
+def _fallback_fx_rate():
+    """(rate, source) when no USD inventory row implies one: the latest stored rate, else the default."""
+    try:
+        rate = performance.latest_fx_rate()
+    except Exception as e:
+        print(f"FX rate lookup failed: {e}")
+        rate = None
+    if rate is None:
+        return performance.DEFAULT_FX_RATE, "default"
+    return rate, "KRW=X/환전 history"
+
+def holdings_from_inventory(df_inv, portfolio='쇼호 β', targets=None, fx_rate=None):
+    """
+    Builds plan_trades inputs from the '자산종합' inventory rows of one portfolio
+    (종목, 보유주수, 현재가, 평가금액, 화폐), one set per account: rows are grouped
+    by 소유자 and 계좌/계좌명 where the inventory has them, since orders and cash
+    can't be pooled across accounts. Cash rows (원화/달러) become each account's
+    cash dict. Prices come from all of the portfolio's rows, so an account can
+    buy a target it does not hold yet.
+    fx_rate defaults to the KRW/USD rate implied by the USD rows' 평가금액, else
+    the latest stored rate (performance.latest_fx_rate), with a warning.
+    Returns (accounts, fx_rate); accounts is a list of dicts with
+    owner, account, df, cash and warnings (e.g. targets without a price).
+    """
+    targets = targets or portfolio_logic.TARGET_WEIGHTS
+    df = df_inv[df_inv['포트폴리오 구분'].astype(str).str.contains(portfolio, regex=False, na=False)].copy()
+    for c in ['보유주수', '현재가', '평가금액']:
+        df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0)
+    df['Currency'] = np.where(
+        df['화폐'].astype(str).str.strip().str.upper().isin(['USD', '달러', 'DOLLAR']), 'USD', 'KRW'
+    )
+
+    warnings = []
+    if fx_rate is None:
+        usd = df[(df['Currency'] == 'USD') & (df['보유주수'] * df['현재가'] > 0)]
+        implied = usd['평가금액'] / (usd['보유주수'] * usd['현재가'])
+        if implied.empty:
+            fx_rate, source = _fallback_fx_rate()
+            warnings.append(f"No priced USD inventory rows; USD/KRW {fx_rate:,.2f} from {source}.")
+        else:
+            fx_rate = float(implied.median())
+
+    is_cash = df['종목'].isin(list(CASH_TICKERS))
+    prices = (df[~is_cash & (df['현재가'] > 0)]
+              .groupby('종목')
+              .agg(Price=('현재가', 'mean'), Currency=('Currency', 'first')))
+    # Target tickers without an inventory row have no price to plan with
+    missing = [t for t in targets if t not in prices.index and t != 'Cash']
+    if missing:
+        warnings.append(f"No inventory row (price) for {', '.join(missing)}; skipped.")
+
+    keys = [c for c in ('소유자', next((c for c in ('계좌', '계좌명') if c in df.columns), None))
+            if c and c in df.columns]
+    groups = df.groupby(keys, sort=True) if keys else [((), df)]
+    accounts = []
+    for key, rows in groups:
+        key = key if isinstance(key, tuple) else (key,)
+        labels = dict(zip(keys, key))
+        cash = {'KRW': 0.0, 'USD': 0.0}
+        for name, cur in CASH_TICKERS.items():
+            krw_value = float(rows.loc[rows['종목'] == name, '평가금액'].sum())
+            cash[cur] = krw_value / fx_rate if cur == 'USD' else krw_value
+
+        qty = rows[~rows['종목'].isin(list(CASH_TICKERS))].groupby('종목')['보유주수'].sum()
+        tickers = [t for t in prices.index if t in qty.index or t in targets]
+        assets = prices.loc[tickers].reset_index().rename(columns={'종목': 'Ticker'})
+        assets.insert(1, 'Qty', assets['Ticker'].map(qty).fillna(0.0))
+        assets['TargetWeight'] = assets['Ticker'].map(targets).fillna(0.0)
+        accounts.append({
+            'owner': labels.get('소유자'),
+            'account': next((v for k, v in labels.items() if k != '소유자'), None),
+            'df': assets,
+            'cash': cash,
+            'warnings': list(warnings),
+        })
+    return accounts, fx_rate
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+# Treemap styling for the Asset Details page, computed for the whole pivot at once.
+# Return-rate colors come from lookup tables sampled once per scale; a rate is
+# mapped to the nearest sample with np.digitize instead of interpolating per row.
+
+RATE_RANGE = (-30.0, 30.0)   # Rates beyond this are clamped (same as the tiles)
+RATE_STEP = 0.1              # LUT resolution in %-points
+USD_NAMES = ['USD', '달러', 'DOLLAR']
+
+def _hex(rgb):
+    r, g, b = (int(round(c)) for c in rgb)
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+def _lerp_hex(stops, positions):
+    """Linear RGB interpolation between evenly spaced hex stops (d3.scaleLinear)."""
+    rgb = np.array([[int(h[i:i + 2], 16) for i in (1, 3, 5)] for h in stops], dtype='float64')
+    anchors = np.linspace(0, 1, len(stops))
+    channels = np.column_stack([np.interp(positions, anchors, rgb[:, c]) for c in range(3)])
+    return [_hex(c) for c in channels]
+
+def _rgb_to_hex(color):
+    if color.startswith('#'):
+        return color
+    return _hex(float(c) for c in color[color.index('(') + 1:color.index(')')].split(','))
+
+_RATES = np.round(np.arange(RATE_RANGE[0], RATE_RANGE[1] + RATE_STEP / 2, RATE_STEP), 10)
+_NORM = (_RATES - RATE_RANGE[0]) / (RATE_RANGE[1] - RATE_RANGE[0])
+_EDGES = (_RATES[:-1] + _RATES[1:]) / 2  # Nearest LUT sample via np.digitize
+
+COLOR_SCALES = {
+    # Plotly treemap tiles (px 'RdYlGn')
+    'plotly': np.array([_rgb_to_hex(c) for c in px.colors.sample_colorscale('RdYlGn', list(_NORM))]),
+    # D3 treemap tiles (red / dark gray / green, as colorScale in the D3 template)
+    'd3': np.array(_lerp_hex(["#f63538", "#303030", "#30cc5a"], _NORM)),
+}
+
+def rate_colors(rates, scale='plotly'):
+    """Hex color per return rate (%), clamped to RATE_RANGE; NaN counts as 0."""
+    r = np.clip(np.nan_to_num(np.asarray(rates, dtype='float64')), *RATE_RANGE)
+    return COLOR_SCALES[scale][np.digitize(r, _EDGES)]
+
+def text_colors(rates, threshold=10.0):
+    """Black text on the pale middle of the scale (|rate| < threshold), white otherwise."""
+    return np.where(np.abs(np.asarray(rates, dtype='float64')) < threshold, 'black', 'white')
+
+def rate_labels(rates):
+    """'+1.23%' / '-4.56%' labels."""
+    r = np.nan_to_num(np.asarray(rates, dtype='float64'))
+    return np.char.add(np.where(r > 0, '+', ''), np.char.add(np.char.mod('%.2f', r), '%'))
+
+def currency_symbols(currencies):
+    """'$' for USD/달러/DOLLAR, '₩' otherwise."""
+    s = pd.Series(currencies).astype(str).str.strip().str.upper()
+    return np.where(s.isin(USD_NAMES), '$', '₩')
+
+def return_rates(invested, value):
+    """(평가금액 / 매입금액 - 1) * 100, 0 where nothing was invested."""
+    invested = np.asarray(invested, dtype='float64')
+    value = np.asarray(value, dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(invested != 0, (value / invested - 1) * 100, 0.0)
+
+def style_pivot(df_pivot, port_col='포트폴리오', value_col='평가금액', rate_col='ReturnRate'):
+    """
+    Styling columns for every row of the Asset Details pivot. Font sizes are
+    relative to the row's portfolio (group min/max/total via transform).
+    Returns a DataFrame aligned to df_pivot:
+      Color / D3Color   tile color for the Plotly / D3 treemap
+      TextColor         'black' or 'white'
+      RateLabel         '+1.23%'
+      TargetFontSize    14-80 px by min-max scaled value (24 when all equal)
+      FontSize          20-180 px by share of the portfolio (int)
+    """
+    rates = df_pivot[rate_col].to_numpy(dtype='float64')
+    values = df_pivot[value_col].astype('float64')
+    groups = values.groupby(df_pivot[port_col], sort=False)
+    lo, hi, total = (groups.transform(f).to_numpy() for f in ('min', 'max', 'sum'))
+    v = values.to_numpy()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        target = np.where(hi == lo, 24.0, 14 + (v - lo) / (hi - lo) * 66)
+        share = np.where(total == 0, 20.0, np.clip(v / total * 450, 20, 180))
+
+    return pd.DataFrame({
+        'Color': rate_colors(rates, 'plotly'),
+        'D3Color': rate_colors(rates, 'd3'),
+        'TextColor': text_colors(rates),
+        'RateLabel': rate_labels(rates),
+        'TargetFontSize': target,
+        'FontSize': share.astype('int64'),
+    }, index=df_pivot.index)
@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+from sqlalchemy.orm import sessionmaker
+from modules import database, db_manager, migration
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Migrated temp store; the app's engines point at it. Returns a writer sessionmaker."""
+    path = str(tmp_path / 'store.db')
+    conn = db_manager.connect(path)
+    db_manager.migrate(conn)
+    conn.close()
+    read_engine, write_engine = database.create_read_engine(path), database.create_write_engine(path)
+    monkeypatch.setattr(database, 'engine', read_engine)
+    monkeypatch.setattr(database, 'write_engine', write_engine)
+    yield sessionmaker(bind=write_engine)
+    read_engine.dispose()
+    write_engine.dispose()
+
+
+TXN_COLUMNS = ['날짜', '소유자', '계좌', '종목', '거래구분', '통화', '거래금액', '수량', '비고']
+
+
+@pytest.fixture
+def ledger():
+    """Sheet-shaped frames for two owners / three accounts, covering every holdings rule."""
+    accounts = pd.DataFrame([
+        ['111', '박행자', '연금', 'KB', '쇼호 β'],
+        ['222', '박행자', '일반', 'NH', '일반'],
+        ['333', '홍길동', 'ISA', 'KB', '쇼호 β'],
+    ], columns=['계좌번호', '소유자', '계좌명', '증권사', '포트폴리오 구분'])
+    assets = pd.DataFrame([
+        ['SPY', 'SPY', 'USD'], ['069500', '069500.KS', 'KRW'], ['원화', '', 'KRW'], ['달러', '', 'USD'],
+    ], columns=['종목명', '티커', '통화'])
+    transactions = pd.DataFrame([
+        ['2024-01-02', '박행자', '연금', '원화', '입금', '₩', 10_000_000, 10_000_000, ''],
+        ['2024-01-03', '박행자', '연금', '달러', '환전', '₩', 1_300_000, 1_000, ''],
+        ['2024-01-03', '박행자', '연금', '원화', '환전', '₩', 1_300_000, -1_300_000, ''],
+        ['2024-01-04', '박행자', '연금', 'SPY', '매수', '$', 475.5, 1, ''],
+        ['2024-01-05', '박행자', '연금', '069500', '매수', '₩', 350_000, 10, ''],
+        ['2024-01-10', '박행자', '일반', '원화', '입금', '₩', 2_000_000, 2_000_000, ''],
+        ['2024-01-11', '박행자', '일반', '069500', '매수', '₩', 700_000, 20, ''],
+        ['2024-02-01', '홍길동', 'ISA', '원화', '입금', '₩', 5_000_000, 5_000_000, ''],
+        ['2024-02-02', '홍길동', 'ISA', '069500', '매수', '₩', 1_050_000, 30, 'Pending'],
+        ['2024-03-04', '박행자', '연금', '달러', '배당금', '$', 1.8, 0, ''],
+        ['2024-03-05', '박행자', '일반', '069500', '매도', '₩', 360_000, 10, ''],
+        ['2024-03-05', '박행자', '일반', '069500', '확정손익', '₩', 10_000, 0, ''],
+        ['2024-03-06', '홍길동', 'ISA', '069500', '매도', '₩', 400_000, 10, ''],
+        ['2024-03-07', '박행자', '연금', 'SPY', '매도', '$', 500.0, 1, ''],
+    ], columns=TXN_COLUMNS)
+    return {'account_master': accounts, 'asset_master': assets, 'transactions': transactions}
+
+
+@pytest.fixture
+def sync(store):
+    """sync(data, incremental=False) -> counts: migration.sync_dataframes on the temp store, committed."""
+    def run(data, incremental=False):
+        db = store()
+        try:
+            counts = migration.sync_dataframes(db, data, incremental=incremental)
+            db.commit()
+            return counts
+        finally:
+            db.close()
+    return run
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+from modules import analytics
+
+
+def history(days=130, seed=1):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2024-01-02', periods=days)
+    values = 1e8 * np.cumprod(1 + 0.01 * rng.standard_normal((days, 2)), axis=0)
+    df = pd.DataFrame({'날짜': dates, '요일': dates.day_name(), '박행자': values[:, 0], '홍길동': values[:, 1]})
+    df.loc[[10, 11, 70], '홍길동'] = np.nan # gaps, as in the sheet
+    df['박행자_idx'] = df['박행자'] / df['박행자'].iloc[0] * 100
+    return df
+
+
+def assert_same(a, b):
+    pd.testing.assert_frame_equal(a.frame, b.frame)
+    pd.testing.assert_frame_equal(a.returns, b.returns)
+    pd.testing.assert_frame_equal(a.running_max, b.running_max)
+    pd.testing.assert_frame_equal(a.drawdown, b.drawdown)
+    pd.testing.assert_series_equal(a.max_drawdown, b.max_drawdown)
+    for rule in analytics.RESAMPLE_RULES.values():
+        pd.testing.assert_frame_equal(a.resampled[rule], b.resampled[rule])
+    for freq in ['Daily', *analytics.RESAMPLE_RULES]:
+        pd.testing.assert_frame_equal(a.chart_frame(freq), b.chart_frame(freq))
+    assert a.version == b.version
+
+
+# Splits mid-week, on a Friday, at a month end and one row before the end
+@pytest.mark.parametrize('split', [3, 9, 22, 60, 129])
+def test_extended_equals_full_recompute(split):
+    df = history()
+    cache = analytics.AnalyticsCache()
+    cache.get(df.iloc[:split])
+    extended = cache.get(df)
+    assert cache.stats == {'hit': 0, 'extend': 1, 'full': 1}
+
+    frame = df.set_index('날짜').sort_index(kind='stable')
+    assert_same(extended, analytics.HistoryAnalytics(frame, analytics._row_hashes(frame)))
+
+
+def test_changed_row_forces_full_recompute():
+    df = history()
+    cache = analytics.AnalyticsCache()
+    cache.get(df.iloc[:50])
+    edited = df.copy()
+    edited.loc[5, '박행자'] += 1
+    cache.get(edited)
+    assert cache.stats == {'hit': 0, 'extend': 0, 'full': 2}
+    assert cache.get(edited) is cache.get(edited.copy())
@@ -0,0 +1,51 @@
+import os
+import pytest
+import yaml
+from modules import auth_manager
+
+
+@pytest.fixture
+def hash_calls(monkeypatch):
+    """Counts stauth.Hasher.hash calls; the process-wide caches start empty."""
+    calls = []
+    def fake_hash(password):
+        calls.append(password)
+        return f"hashed:{password}"
+    monkeypatch.setattr(auth_manager.stauth.Hasher, 'hash', staticmethod(fake_hash))
+    auth_manager.hash_password.clear()
+    auth_manager._cached_credentials.clear()
+    yield calls
+    auth_manager.hash_password.clear()
+    auth_manager._cached_credentials.clear()
+
+
+def test_fallback_password_hashed_once(hash_calls, tmp_path):
+    path = str(tmp_path / 'missing.yaml')
+    first = auth_manager.get_credentials('secret', path=path)
+    second = auth_manager.get_credentials('secret', path=path)
+
+    assert hash_calls == ['secret']
+    assert first == second
+    assert first['usernames']['admin']['password'] == 'hashed:secret'
+
+
+def test_plain_text_file_hashed_once_until_changed(hash_calls, tmp_path):
+    path = tmp_path / 'auth.yaml'
+    path.write_text(yaml.safe_dump({'usernames': {'park': {'name': '박행자', 'password': 'pw'}}}), encoding='utf-8')
+
+    auth_manager.get_credentials(path=str(path))
+    creds = auth_manager.get_credentials(path=str(path))
+    assert hash_calls == ['pw']
+    assert creds['usernames']['park']['password'] == 'hashed:pw'
+
+    # A new mtime means a new file version; its passwords are already cached per value
+    stat = path.stat()
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+    auth_manager.get_credentials(path=str(path))
+    assert hash_calls == ['pw']
+
+
+def test_returned_credentials_are_copies(hash_calls, tmp_path):
+    path = str(tmp_path / 'missing.yaml')
+    auth_manager.get_credentials('secret', path=path)['usernames']['admin']['logged_in'] = True
+    assert 'logged_in' not in auth_manager.get_credentials('secret', path=path)['usernames']['admin']
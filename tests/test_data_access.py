@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+from modules import data_access, migration
+
+SHEET = pd.DataFrame([
+    ['2024-01-02', '박행자', '연금', 'SPY', '매수', 'USD', 500.0, 1.0, 'Pending'],
+    ['2024. 1. 3', '박행자', '연금', 'SPY', '매수', np.nan, 510.0, 1.0, np.nan],
+    ['2024-01-03', '박행자', '연금', 'SPY', '매수', np.nan, 510.0, 1.0, np.nan],   # other date text, so its own hash
+    ['2024-01-04', '홍길동', '일반', 'QQQ', '매수', 'USD', 400.0, 2.0, ''],
+    ['2024-01-04', '홍길동', '일반', 'QQQ', '매수', 'USD', 400.0, 2.0, ''],        # identical row
+    ['not a date', '홍길동', '일반', 'QQQ', '매도', 'USD', 410.0, 1.0, ''],
+], columns=['날짜', '소유자', '계좌', '종목', '거래구분', '통화', '거래금액', '수량', '비고'])
+
+
+def sync(Session, df):
+    db = Session()
+    try:
+        migration.sync_dataframes(db, {'transactions': df})
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_transactions_match_sheet_shape(store):
+    sync(store, SHEET)
+    df = data_access.get_transactions()
+
+    assert list(df.columns) == list(SHEET.columns)
+    # Documented differences: ISO dates, unparseable dates dropped, identical rows once
+    assert df['날짜'].tolist() == ['2024-01-02', '2024-01-03', '2024-01-03', '2024-01-04']
+    # Blank text cells are NULL in every text column, not the sync's 'nan'
+    for col in ['소유자', '계좌', '종목', '거래구분', '통화', '비고']:
+        assert not df[col].isin(['nan', 'None', '']).any(), col
+    assert df['통화'].isna().tolist() == [False, True, True, False]
+    assert df['비고'].tolist()[0] == 'Pending'
+    assert df['비고'].isna().tolist()[1:] == [True, True, True]
+
+
+def test_transactions_owner_scope(store):
+    sync(store, SHEET)
+    assert set(data_access.get_transactions('홍길동')['소유자']) == {'홍길동'}
+    assert data_access.get_transactions('nobody').empty
+
+
+def fake_sheets(monkeypatch):
+    """Replaces data_loader.load_data; returns the list of key lists it was asked for."""
+    calls = []
+    def load_data(keys=None):
+        calls.append(sorted(keys))
+        return {k: pd.DataFrame({'소유자': ['박행자', '홍길동']}) for k in keys}
+    monkeypatch.setattr(data_access.data_loader, 'load_data', load_data)
+    return calls
+
+
+def test_never_synced_store_falls_back_to_sheets(store, monkeypatch):
+    calls = fake_sheets(monkeypatch)
+    data = data_access.load_dashboard_data()
+    assert calls[-1] == sorted(data_access.DB_KEYS)
+    assert len(data['transactions']) == 2
+
+
+def test_restricted_owner_never_falls_back(store, monkeypatch):
+    calls = fake_sheets(monkeypatch)
+    data = data_access.load_dashboard_data(owner='박행자')
+    assert len(calls) == 1 # sheet-only frames
+    assert all(data[k].empty for k in data_access.DB_KEYS)
+
+
+def test_synced_store_keeps_empty_tables_empty(store, monkeypatch):
+    sync(store, SHEET)
+    calls = fake_sheets(monkeypatch)
+    data = data_access.load_dashboard_data()
+    assert len(calls) == 1
+    assert data['account_master'].empty
+    assert len(data['transactions']) == 4
@@ -0,0 +1,65 @@
+import pandas as pd
+from sqlalchemy import text
+from modules import holdings
+
+
+def snapshot(store):
+    db = store()
+    try:
+        return pd.DataFrame(db.execute(text(f"""
+            SELECT owner, account_name, asset_name, current_qty, net_book_value_amount, last_transaction_date
+            FROM {holdings.HOLDINGS_TABLE} ORDER BY owner, account_name, asset_name
+        """)).fetchall(), columns=['owner', 'account_name', 'asset_name', 'qty', 'book', 'last_date'])
+    finally:
+        db.close()
+
+
+def dollars_held(store):
+    df = snapshot(store)
+    return df.query("owner == '박행자' and account_name == '연금' and asset_name == '달러'")['qty'].item()
+
+
+def rebuilt(store):
+    db = store()
+    try:
+        holdings.rebuild_holdings(db)
+        db.commit()
+    finally:
+        db.close()
+    return snapshot(store)
+
+
+def test_incremental_appends_equal_rebuild(store, sync, ledger):
+    txn = ledger['transactions']
+    sync(dict(ledger, transactions=txn.iloc[:5]), incremental=True)
+    for end in (9, 12, len(txn)):
+        counts = sync(dict(ledger, transactions=txn.iloc[:end]), incremental=True)
+        assert counts['mode'] == 'incremental'
+        assert not counts['holdings']['rebuilt']
+
+    incremental = snapshot(store)
+    assert len(incremental) == 8
+    pd.testing.assert_frame_equal(incremental, rebuilt(store))
+
+
+def test_currency_edit_is_reversed_not_rebuilt(store, sync, ledger):
+    sync(ledger, incremental=True)
+    edited = ledger['transactions'].copy()
+    assert dollars_held(store) == 1_000 + 1.8
+    edited.loc[9, '통화'] = '₩' # 달러 dividend re-labelled: no longer counts towards 달러
+    counts = sync(dict(ledger, transactions=edited), incremental=True)
+    assert counts['transactions']['updated'] == 1
+    assert not counts['holdings']['rebuilt']
+
+    incremental = snapshot(store)
+    pd.testing.assert_frame_equal(incremental, rebuilt(store))
+    assert dollars_held(store) == 1_000
+
+
+def test_consistent_with_view(store, sync, ledger):
+    sync(ledger)
+    db = store()
+    try:
+        assert holdings.check_consistency(db).empty
+    finally:
+        db.close()
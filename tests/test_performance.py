@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+from modules import performance
+
+T0 = pd.Timestamp('2023-01-01')
+
+
+def day(n):
+    return T0 + pd.Timedelta(days=n)
+
+
+def npv_root(amounts, years, lo=-0.99, hi=10.0):
+    """Reference IRR by bisection."""
+    npv = lambda r: sum(a * (1 + r) ** -t for a, t in zip(amounts, years))
+    for _ in range(200):
+        mid = (lo + hi) / 2
+        lo, hi = (mid, hi) if npv(lo) * npv(mid) > 0 else (lo, mid)
+    return (lo + hi) / 2
+
+
+def test_no_flows_one_year():
+    values = pd.DataFrame({'A': [100.0, 105.0, 110.0]}, index=[day(0), day(200), day(365)])
+    row = performance.returns_summary(values).loc['A']
+    assert row['TWR'] == pytest.approx(0.10)
+    assert row['TWR_Ann'] == pytest.approx(0.10)
+    assert row['XIRR'] == pytest.approx(0.10)
+    assert row['NetFlow'] == 0
+
+
+def test_deposit_mid_period():
+    # +10%, deposit 50 (no growth that day), +10%
+    values = pd.DataFrame({'A': [100.0, 110.0, 160.0, 176.0]}, index=[day(0), day(181), day(182), day(365)])
+    flows = pd.DataFrame({'A': [50.0]}, index=[day(182)])
+    row = performance.returns_summary(values, flows).loc['A']
+
+    assert row['TWR'] == pytest.approx(1.1 * 1.1 - 1)
+    assert row['NetFlow'] == 50
+    expected = npv_root([-100, -50, 176], [0, 182 / 365, 1])
+    assert row['XIRR'] == pytest.approx(expected, abs=1e-9)
+
+
+def test_flows_move_to_next_value_date():
+    values = pd.DataFrame({'A': [100.0, 90.0, 99.0]}, index=[day(0), day(10), day(20)])
+    flows = pd.DataFrame({'A': [1000.0, -20.0]}, index=[day(-5), day(7)]) # before history / between values
+    index = performance.twr_index(values, flows)['A'].to_numpy()
+    # The first flow is already in the first value; the withdrawal counts on day 10
+    np.testing.assert_allclose(index, [1.0, 90 / 80, 90 / 80 * 1.1])
+
+
+def test_withdrawal_and_columns_without_data():
+    values = pd.DataFrame({
+        'A': [200.0, 220.0, 110.0],
+        'B': [np.nan, np.nan, np.nan],
+    }, index=[day(0), day(100), day(365)])
+    flows = pd.DataFrame({'A': [-110.0]}, index=[day(365)])
+    df = performance.returns_summary(values, flows)
+    assert list(df.index) == ['A']
+    row = df.loc['A']
+    assert row['TWR'] == pytest.approx(1.1 * 110 / (220 - 110) - 1)
+    assert row['XIRR'] == pytest.approx(npv_root([-200, 110 + 110], [0, 1]), abs=1e-9)
+
+
+def test_xirr_needs_both_signs():
+    rates = performance.xirr([[-100, 110], [100, 10], [-100, -10]], [0, 1])
+    assert rates[0] == pytest.approx(0.10)
+    assert np.isnan(rates[1:]).all()
+
+
+def test_cash_flows_convert_usd_and_net_transfers():
+    txn = pd.DataFrame([
+        ['2023-01-02', '박행자', '연금', '입금', '$', 100.0],
+        ['2023-01-03', '박행자', '연금', '출금', '₩', 50_000.0],
+        ['2023-01-03', '박행자', '일반', '입금', '₩', 50_000.0],   # transfer inside 쇼호 β
+        ['2023-01-04', '박행자', '연금', '매수', '₩', 1_000.0],    # not a flow
+    ], columns=['date', 'owner', 'account_name', 'type', 'currency', 'amount'])
+    accounts = pd.DataFrame([['박행자', '연금', '쇼호 β'], ['박행자', '일반', '쇼호 β']],
+                            columns=['owner', 'account_name', 'portfolio'])
+    fx = pd.Series([1300.0, 1350.0], index=pd.to_datetime(['2022-12-30', '2023-01-03']))
+
+    flows = performance.cash_flows(txn, accounts, by='portfolio', fx_rate=fx)
+    assert flows['쇼호 β'].tolist() == [130_000.0, 0.0]
+
+    by_owner = performance.cash_flows(txn, accounts, by='owner', fx_rate=1000.0)
+    assert by_owner['박행자'].tolist() == [100_000.0, 0.0]
+
+
+def test_exchange_rates_and_lookup():
+    txn = pd.DataFrame([
+        ['2023-01-02', '환전', '₩', 1_300_000.0, 1_000.0],   # KRW -> USD
+        ['2023-01-09', '환전', '$', 1_000.0, 1_350_000.0],   # USD -> KRW
+        ['2023-01-09', '입금', '₩', 5.0, 5.0],
+    ], columns=['date', 'type', 'currency', 'amount', 'qty'])
+    rates = performance.exchange_rates(txn)
+    assert rates.tolist() == [1300.0, 1350.0]
+
+    lookup = performance.rates_on(pd.to_datetime(['2022-12-01', '2023-01-05', '2023-02-01']), rates)
+    assert lookup.tolist() == [1300.0, 1300.0, 1350.0]
+    assert performance.rates_on([T0], pd.Series(dtype='float64')).tolist() == [performance.DEFAULT_FX_RATE]
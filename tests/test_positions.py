@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+from sqlalchemy import text
+from modules import database, holdings, positions
+
+
+@pytest.fixture
+def engine_for(store, sync, ledger):
+    sync(ledger)
+    positions._build_engine.clear()
+    yield positions.get_position_engine
+    positions._build_engine.clear()
+
+
+def read(sql, **params):
+    with database.engine.connect() as conn:
+        return pd.read_sql(text(sql), conn, params=params)
+
+
+def by_key(df):
+    return (df.rename(columns={'current_qty': 'qty'})[['owner', 'asset_name', 'qty', 'net_book_value_amount']]
+              .sort_values(['owner', 'asset_name']).reset_index(drop=True))
+
+
+def test_latest_positions_match_view(engine_for):
+    result = engine_for().holdings_as_of('2099-12-31', include_zero=True)
+    view = read("SELECT owner, asset_name, current_qty, net_book_value_amount FROM view_asset_inventory")
+    pd.testing.assert_frame_equal(by_key(result), by_key(view), check_dtype=False)
+
+
+@pytest.mark.parametrize('as_of', ['2024-01-03', '2024-02-01', '2024-03-05'])
+def test_positions_as_of_match_holdings_rules(engine_for, as_of):
+    expected = read(f"""
+        SELECT t.owner, t.asset_name, SUM({holdings._QTY_SQL}) AS qty, SUM({holdings._BOOK_SQL}) AS net_book_value_amount
+        FROM transaction_log t LEFT JOIN asset_master am ON t.asset_name = am.asset_name
+        WHERE t.date <= :as_of
+        GROUP BY t.owner, t.asset_name
+    """, as_of=as_of)
+    result = by_key(engine_for().holdings_as_of(as_of, include_zero=True))
+    # The engine lists every key; ones without a transaction yet are zero
+    expected = result[['owner', 'asset_name']].merge(expected, how='left').fillna(0)
+    pd.testing.assert_frame_equal(result, by_key(expected), check_dtype=False)
+
+
+def test_owner_engine_and_series(engine_for):
+    scoped = engine_for('홍길동').holdings_as_of('2099-12-31')
+    assert set(scoped['owner']) == {'홍길동'}
+    assert scoped.set_index('asset_name').loc['069500', 'qty'] == 20
+
+    series = engine_for().position_series('069500')
+    assert series.loc['2024-01-11'] == 30
+    assert series.iloc[-1] == 10 + 20 - 10 + 30 - 10
+    assert engine_for().holdings_as_of('2023-12-31').empty
@@ -0,0 +1,124 @@
+import time
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+import pytest
+from modules import db_manager, price_store
+from modules.price_store import FixturePriceSource, PriceSource, PriceStore
+
+
+def closes(start, end, first=100.0):
+    idx = pd.bdate_range(start, end)
+    return pd.Series(first + np.arange(len(idx), dtype='float64'), index=idx)
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    path = str(tmp_path / 'prices.db')
+    conn = db_manager.connect(path)
+    db_manager.migrate(conn)
+    conn.close()
+    return path
+
+
+def make_store(db_file, source):
+    return PriceStore(source, db_file, max_workers=2, retries=0, backoff=0)
+
+
+def coverage(db_file, ticker):
+    conn = db_manager.connect(db_file)
+    try:
+        return conn.execute(
+            "SELECT start_date, end_date FROM price_coverage WHERE ticker = ?;", (ticker,)
+        ).fetchone()
+    finally:
+        conn.close()
+
+
+def test_price_source_is_abstract():
+    with pytest.raises(TypeError):
+        PriceSource()
+
+
+def test_second_read_is_served_from_store(db_file):
+    source = FixturePriceSource({'SPY': closes('2024-01-01', '2024-03-29')})
+    store = make_store(db_file, source)
+    start, end = date(2024, 1, 1), date(2024, 3, 29)
+
+    first, failed = store.get_closes(['SPY'], start, end)
+    second, _ = store.get_closes(['SPY'], start, end)
+
+    assert failed == {}
+    assert len(source.calls) == 1
+    pd.testing.assert_frame_equal(first, second)
+    assert first['SPY'].iloc[0] == 100.0
+
+
+def test_only_missing_ranges_are_fetched(db_file):
+    source = FixturePriceSource({'SPY': closes('2023-12-01', '2024-04-30')})
+    store = make_store(db_file, source)
+    store.update('SPY', date(2024, 2, 1), date(2024, 2, 29))
+    source.calls.clear()
+
+    fetched = store.update('SPY', date(2024, 1, 1), date(2024, 3, 29))
+
+    assert source.calls == [
+        ('SPY', date(2024, 1, 1), date(2024, 1, 31)),
+        ('SPY', date(2024, 2, 29), date(2024, 3, 29)),
+    ]
+    assert fetched > 0
+    assert coverage(db_file, 'SPY') == ('2024-01-01', '2024-03-29')
+
+
+def test_coverage_ends_at_last_returned_date(db_file):
+    # Source has nothing after Friday 2024-03-08 yet
+    source = FixturePriceSource({'SPY': closes('2024-01-01', '2024-03-08')})
+    store = make_store(db_file, source)
+    store.update('SPY', date(2024, 1, 1), date(2024, 3, 15))
+    assert coverage(db_file, 'SPY') == ('2024-01-01', '2024-03-08')
+
+    # Later the rest is published; only the days after the coverage are asked for
+    source.closes['SPY'] = closes('2024-01-01', '2024-03-15')
+    source.calls.clear()
+    store.update('SPY', date(2024, 1, 1), date(2024, 3, 15))
+    assert source.calls == [('SPY', date(2024, 3, 8), date(2024, 3, 15))]
+    assert coverage(db_file, 'SPY') == ('2024-01-01', '2024-03-15')
+
+
+def test_empty_reply_leaves_coverage_unchanged(db_file):
+    source = FixturePriceSource({'SPY': closes('2024-01-01', '2024-01-31')})
+    store = make_store(db_file, source)
+    store.update('SPY', date(2024, 1, 1), date(2024, 1, 31))
+
+    source.closes.clear()  # Throttled: every reply is empty
+    assert store.update('SPY', date(2024, 1, 1), date(2024, 2, 29)) == 0
+    assert coverage(db_file, 'SPY') == ('2024-01-01', '2024-01-31')
+
+    assert store.update('NOPE', date(2024, 1, 1), date(2024, 1, 31)) == 0
+    assert coverage(db_file, 'NOPE') is None
+
+
+def test_stale_tail_is_refetched():
+    store = PriceStore(FixturePriceSource({}))
+    today = date.today()
+    cov = ((today - timedelta(days=30)).isoformat(), today.isoformat(), time.time())
+    assert store._missing_ranges(cov, today - timedelta(days=30), today) == []
+
+    stale = cov[:2] + (time.time() - price_store.REFRESH_TTL - 1,)
+    assert store._missing_ranges(stale, today - timedelta(days=30), today) == [(today, today)]
+
+
+def test_failed_tickers_are_reported(db_file):
+    class FlakySource(FixturePriceSource):
+        def fetch(self, ticker, start, end):
+            if ticker == 'BAD':
+                raise ConnectionError("down")
+            return super().fetch(ticker, start, end)
+
+    source = FlakySource({'SPY': closes('2024-01-01', '2024-01-31')})
+    store = make_store(db_file, source)
+    got, failed = store.get_closes(['SPY', 'BAD', 'NONE'], date(2024, 1, 1), date(2024, 1, 31))
+
+    assert list(got.columns) == ['SPY']
+    assert failed == {'BAD': 'down', 'NONE': 'no data'}
+    assert coverage(db_file, 'BAD') is None
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+from modules import risk_metrics
+
+
+def prices(T=600, N=3, seed=0, drift=0.0004, vol=0.01):
+    rng = np.random.default_rng(seed)
+    idx = pd.bdate_range('2020-01-01', periods=T)
+    returns = drift + vol * rng.standard_normal((T, N))
+    return pd.DataFrame(100 * np.cumprod(1 + returns, axis=0), index=idx, columns=[f"p{i}" for i in range(N)])
+
+
+def window_mdd(x):
+    return (x / np.maximum.accumulate(x) - 1).min()
+
+
+@pytest.mark.parametrize('window', [5, 21, 63])
+def test_volatility_and_beta_match_pandas(window):
+    df = prices()
+    risk = risk_metrics.rolling_risk(df, window, benchmark='p0')
+    r = df.pct_change()
+
+    expected_vol = r.rolling(window).std() * np.sqrt(risk_metrics.TRADING_DAYS)
+    pd.testing.assert_frame_equal(risk['volatility'], expected_vol, rtol=1e-9)
+
+    expected_beta = r.rolling(window).cov(r['p0']).div(r['p0'].rolling(window).var(), axis=0)
+    pd.testing.assert_frame_equal(risk['beta'], expected_beta, rtol=1e-9)
+
+
+def test_volatility_keeps_precision_for_tiny_spread():
+    # Returns of ~1% with a 1e-7 spread: E[x²]-E[x]² cancels almost every digit here
+    df = prices(T=400, N=2, drift=0.01, vol=1e-7)
+    risk = risk_metrics.rolling_risk(df, 21)
+    expected = df.pct_change().rolling(21).std() * np.sqrt(risk_metrics.TRADING_DAYS)
+    pd.testing.assert_frame_equal(risk['volatility'], expected, rtol=1e-6)
+
+
+@pytest.mark.parametrize('T, window', [(600, 21), (600, 63), (250, 250), (257, 50), (30, 63)])
+def test_mdd_matches_windowed_reference(T, window):
+    df = prices(T=T, vol=0.03)
+    expected = df.rolling(window).apply(window_mdd, raw=True)
+    result = pd.DataFrame(risk_metrics._rolling_mdd(df.to_numpy(), window), index=df.index, columns=df.columns)
+    pd.testing.assert_frame_equal(result, expected, rtol=1e-12)
+
+
+def test_mdd_nan_inside_window():
+    df = prices(T=120, N=2, vol=0.03)
+    df.iloc[50, 1] = np.nan
+    expected = df.rolling(21).apply(window_mdd, raw=True)
+    result = risk_metrics._rolling_mdd(df.to_numpy(), 21)
+    np.testing.assert_allclose(result, expected.to_numpy(), rtol=1e-12)
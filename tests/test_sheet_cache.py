@@ -0,0 +1,25 @@
+import pandas as pd
+import pytest
+from modules import data_loader
+from modules.data_loader import SheetCache
+
+HISTORY_SHEET = next(ws for ws, spec in data_loader.SHEET_SPECS.items() if spec[0] == 'history')
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = SheetCache()
+    monkeypatch.setattr(data_loader, '_sheet_cache', lambda: cache)
+    return cache
+
+
+def test_callers_get_their_own_copy(cache):
+    cache.put(HISTORY_SHEET, pd.DataFrame({'날짜': ['2024-01-02'], '쇼호 α': [100.0]}))
+
+    first = data_loader._load_sheets([HISTORY_SHEET])[HISTORY_SHEET]
+    first.loc[0, '쇼호 α'] = -1.0
+    first['extra'] = 1
+    second = data_loader._load_sheets([HISTORY_SHEET])[HISTORY_SHEET]
+
+    assert second.loc[0, '쇼호 α'] == 100.0
+    assert 'extra' not in second.columns
@@ -0,0 +1,170 @@
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from modules import data_loader
+from modules.data_loader import AppendBatch, AppendConflictError, GSheetsWriter
+
+HEADER = ['날짜', '계좌명', '구분', '종목코드', '수량', '단가']
+
+
+class FakeWorksheet:
+    """gspread worksheet stand-in: values[0] is the header row."""
+
+    def __init__(self, header):
+        self.values = [list(header)]
+        self.calls = []
+
+    def row_values(self, row):
+        self.calls.append('row_values')
+        return list(self.values[row - 1])
+
+    def col_values(self, col):
+        self.calls.append('col_values')
+        return [r[col - 1] for r in self.values if len(r) >= col]
+
+    def append_rows(self, rows, value_input_option=None):
+        self.calls.append('append_rows')
+        self.values.extend(list(r) for r in rows)
+
+    def batch_update(self, data, value_input_option=None):
+        self.calls.append('batch_update')
+        self.updates = data
+
+
+class FakeClient:
+    def __init__(self, worksheets):
+        self.worksheets = worksheets
+        self.opened = []
+
+    def _select_worksheet(self, worksheet):
+        self.opened.append(worksheet)
+        return self.worksheets[worksheet]
+
+
+class FakeConnection:
+    def __init__(self, worksheets):
+        self.client = FakeClient(worksheets)
+
+
+class FakeWriter:
+    """In-memory writer with the GSheetsWriter interface."""
+
+    def __init__(self, header, rows=()):
+        self._header = list(header)
+        self.rows = [list(r) for r in rows]
+        self.appends = []
+        self.updates = []
+
+    def header(self, worksheet):
+        return list(self._header)
+
+    def row_count(self, worksheet):
+        return len(self.rows)
+
+    def append_rows(self, worksheet, rows):
+        self.appends.append((worksheet, rows))
+        self.rows.extend(rows)
+
+    def batch_update(self, worksheet, data):
+        self.updates.append((worksheet, data))
+
+
+@pytest.fixture(autouse=True)
+def no_cache_invalidation(monkeypatch):
+    invalidated = []
+    monkeypatch.setattr(data_loader, 'invalidate_sheet', invalidated.append)
+    return invalidated
+
+
+def test_writer_reuses_worksheet_handle():
+    ws = FakeWorksheet(HEADER)
+    conn = FakeConnection({data_loader.TXN_SHEET: ws})
+    writer = GSheetsWriter(conn)
+
+    assert writer.header(data_loader.TXN_SHEET) == HEADER
+    assert writer.row_count(data_loader.TXN_SHEET) == 0
+    writer.append_rows(data_loader.TXN_SHEET, [['2024-01-02', 'A', '매수', 'SPY', 1, 500]])
+    assert writer.row_count(data_loader.TXN_SHEET) == 1
+    assert conn.client.opened == [data_loader.TXN_SHEET]
+
+
+def test_append_batch_sends_rows_in_one_call(no_cache_invalidation):
+    writer = FakeWriter(HEADER)
+    batch = AppendBatch(data_loader.TXN_SHEET, expected_row_count=0)
+    batch.add({'날짜': pd.Timestamp('2024-01-02'), '계좌명': 'A', '구분': '매수', '수량': np.int64(3), '단가': 1.5})
+    batch.add({'날짜': '2024-01-03', '계좌명': 'A', '구분': '매도', '수량': 1, '단가': np.nan, 'extra': 'x'})
+
+    assert len(batch) == 2
+    assert batch.flush(writer) == 2
+    assert len(batch) == 0
+    assert writer.appends == [(data_loader.TXN_SHEET, [
+        ['2024-01-02', 'A', '매수', '', 3, 1.5],
+        ['2024-01-03', 'A', '매도', '', 1, ''],
+    ])]
+    assert no_cache_invalidation == [data_loader.TXN_SHEET]
+
+
+def test_to_cell_formats_dates():
+    assert data_loader._to_cell(date(2024, 1, 2)) == '2024-01-02'
+    assert data_loader._to_cell(datetime(2024, 1, 2, 15, 30)) == '2024-01-02'
+    assert data_loader._to_cell(pd.Timestamp('2024-01-02')) == '2024-01-02'
+
+
+def test_append_batch_empty_is_noop():
+    writer = FakeWriter(HEADER)
+    assert AppendBatch(data_loader.TXN_SHEET).flush(writer) == 0
+    assert writer.appends == []
+
+
+def test_append_batch_conflict_keeps_rows():
+    writer = FakeWriter(HEADER, rows=[['2024-01-01', 'A', '입금', '', '', '']])
+    batch = AppendBatch(data_loader.TXN_SHEET, expected_row_count=0).add({'계좌명': 'A'})
+
+    with pytest.raises(AppendConflictError):
+        batch.flush(writer)
+    assert writer.appends == []
+    assert len(batch) == 1
+
+
+def test_append_through_gsheets_writer():
+    ws = FakeWorksheet(HEADER)
+    writer = GSheetsWriter(FakeConnection({data_loader.TXN_SHEET: ws}))
+
+    sent = data_loader.append_transaction_rows([{'계좌명': 'A', '종목코드': 'QQQ'}], expected_row_count=0, conn=writer)
+    assert sent == 1
+    assert ws.values[1] == ['', 'A', '', 'QQQ', '', '']
+    assert ws.calls.count('append_rows') == 1
+
+
+def test_patch_sends_changed_cells_and_appends():
+    original = pd.DataFrame([
+        ['2024-01-02', 'A', '매수', 'SPY', 1, 500],
+        ['2024-01-03', 'A', '매수', 'QQQ', 2, 400],
+    ], columns=HEADER)
+    edited = original.copy()
+    edited.loc[1, '수량'] = 5
+    edited.loc[2] = ['2024-01-04', 'B', '매도', 'SPY', 1, 510]
+    writer = FakeWriter(HEADER, rows=original.values.tolist())
+
+    assert data_loader.patch_transaction_log(original, edited, conn=writer)
+    [(sheet, data)] = writer.updates
+    assert sheet == data_loader.TXN_SHEET
+    assert data == [
+        {'range': 'E3:E3', 'values': [[5]]},
+        {'range': 'A4:F4', 'values': [['2024-01-04', 'B', '매도', 'SPY', 1, 510]]},
+    ]
+
+
+def test_patch_refuses_when_sheet_changed(monkeypatch):
+    warnings = []
+    monkeypatch.setattr(data_loader.st, 'warning', warnings.append)
+    original = pd.DataFrame([['2024-01-02', 'A', '매수', 'SPY', 1, 500]], columns=HEADER)
+    edited = original.copy()
+    edited.loc[0, '단가'] = 505
+    writer = FakeWriter(HEADER, rows=original.values.tolist() * 2)
+
+    assert not data_loader.patch_transaction_log(original, edited, conn=writer)
+    assert writer.updates == []
+    assert len(warnings) == 1
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+from modules import data_loader, snapshot_store
+from modules.data_loader import SheetCache
+
+
+@pytest.fixture(autouse=True)
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot_store, 'SNAPSHOT_DIR', str(tmp_path))
+    return tmp_path
+
+
+def sheet_frame():
+    """Shaped like a cleaned network read: mixed ticker column, gaps, numbers and text."""
+    return pd.DataFrame({
+        '날짜': pd.to_datetime(['2024-01-02', '2024-01-03', '2024-01-04']),
+        '평가금액': [1.0, 2.0, np.nan],
+        '수량': [1, 2, 3],
+        '종목': ['SPY', 5930, None],
+        '비고': [1.5, 'x', np.nan],
+        '계좌': ['A', None, 'B'],
+    }, index=[3, 4, 5])
+
+
+def test_round_trip_keeps_values_and_dtypes():
+    df = sheet_frame()
+    assert snapshot_store.write_snapshot('자산종합', df)
+    restored, saved_at = snapshot_store.read_snapshot('자산종합')
+
+    pd.testing.assert_frame_equal(restored, df)
+    assert restored.loc[4, '종목'] == 5930
+    assert saved_at > 0
+
+
+def test_snapshot_frame_is_writable():
+    snapshot_store.write_snapshot('자산종합', sheet_frame())
+    restored, _ = snapshot_store.read_snapshot('자산종합')
+
+    restored.loc[3, '평가금액'] = 5.0
+    restored.loc[3, '수량'] = 7
+    assert restored.loc[3, '수량'] == 7
+
+
+def test_cold_start_serves_snapshot(monkeypatch):
+    ws = '자산종합'
+    cache = SheetCache()
+    monkeypatch.setattr(data_loader, '_sheet_cache', lambda: cache)
+    monkeypatch.setattr(data_loader.st, 'connection', lambda *a, **k: None)
+    refreshed = []
+    monkeypatch.setattr(data_loader, '_refresh_in_background', lambda conn, sheets: refreshed.extend(sheets))
+    snapshot_store.write_snapshot(ws, sheet_frame())
+
+    df = data_loader._load_sheets([ws])[ws]
+
+    pd.testing.assert_frame_equal(df, sheet_frame())
+    df.loc[3, '평가금액'] = 9.0
+    assert refreshed == [ws]
+    assert cache.stats().set_index('sheet').loc[ws, 'last'] == 'snapshot'
@@ -0,0 +1,30 @@
+import pandas as pd
+import pytest
+from modules import performance, trade_planner
+
+COLUMNS = ['포트폴리오 구분', '소유자', '계좌', '종목', '보유주수', '현재가', '평가금액', '화폐']
+
+
+def inventory(rows):
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+def test_fx_rate_implied_by_usd_rows(monkeypatch):
+    monkeypatch.setattr(performance, 'latest_fx_rate', lambda owner=None: pytest.fail("no lookup needed"))
+    df = inventory([['쇼호 β', 'A', '연금', 'SPY', 2, 500.0, 1_400_000, 'USD']])
+    accounts, fx_rate = trade_planner.holdings_from_inventory(df, targets={'SPY': 1.0})
+    assert fx_rate == pytest.approx(1400.0)
+    assert accounts[0]['warnings'] == []
+
+
+@pytest.mark.parametrize('stored, expected', [(1385.5, 1385.5), (None, performance.DEFAULT_FX_RATE)])
+def test_fx_fallback_warns(monkeypatch, stored, expected):
+    monkeypatch.setattr(performance, 'latest_fx_rate', lambda owner=None: stored)
+    df = inventory([
+        ['쇼호 β', 'A', '연금', '069500', 10, 35_000, 350_000, 'KRW'],
+        ['쇼호 β', 'A', '연금', '달러', 0, 0, 1_000_000, 'USD'],
+    ])
+    accounts, fx_rate = trade_planner.holdings_from_inventory(df, targets={'069500': 1.0})
+    assert fx_rate == expected
+    assert accounts[0]['cash']['USD'] == pytest.approx(1_000_000 / expected)
+    assert any('USD/KRW' in w for w in accounts[0]['warnings'])
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import pytest
+from benchmark_treemap_style import check, make_pivot, style_per_row, style_vectorized
+from modules import treemap_style
+
+
+@pytest.mark.parametrize('rows, seed', [(1, 0), (7, 1), (50, 2), (500, 3)])
+def test_matches_per_row_helpers(rows, seed):
+    df = make_pivot(rows, seed)
+    assert check(style_per_row(df), style_vectorized(df)) <= 1 # RGB channel difference
+
+
+def test_edge_cases_match_per_row_helpers():
+    df = pd.DataFrame({
+        '포트폴리오': ['same', 'same', 'empty', 'empty', 'wide', 'wide', 'wide'],
+        '종목': list('ABCDEFG'),
+        '매입금액': [100.0, 100.0, 0.0, 0.0, 100.0, 100.0, 0.0],
+        '평가금액': [150.0, 150.0, 0.0, 0.0, 10.0, 500.0, 80.0], # -90% / +400% clamp, nothing invested
+        '화폐': [' usd ', '달러', 'Dollar', '원화', 'KRW', None, 'USD'],
+    })
+    old, new = style_per_row(df), style_vectorized(df)
+    assert check(old, new) <= 1
+    assert new['TargetFontSize'].tolist()[:4] == [24.0] * 4
+    assert new['FontSize'].tolist()[2:4] == [20, 20]
+    assert new['CurSymbol'].tolist() == ['$', '$', '$', '₩', '₩', '₩', '$']
+
+
+def test_labels_and_d3_scale():
+    rates = [-45.0, -30.0, -1.234, 0.0, 12.5, 30.0, np.nan]
+    assert treemap_style.rate_labels(rates).tolist() == ['-45.00%', '-30.00%', '-1.23%', '0.00%', '+12.50%', '+30.00%', '0.00%']
+    # Endpoints and middle of the D3 template's colorScale
+    assert treemap_style.rate_colors([-45.0, 0.0, 30.0, np.nan], 'd3').tolist() == ['#f63538', '#303030', '#30cc5a', '#303030']